@@ -1,28 +1,64 @@
-from typing import Optional
-from redis import Redis
+import hashlib
+import warnings
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Optional
+from redis.asyncio import Redis
+from redis.asyncio.client import Pipeline
+from redis.exceptions import NoScriptError
+from app.core.settings import settings
+
+# Удаляет ключ, только если его значение равно ARGV[1] (снятие блокировки
+# владельцем: чужая блокировка, захваченная после истечения нашей, остается)
+DELETE_IF_EQUALS_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
 
 class BaseRedisStorage():
     """
     Базовый класс для работы с Redis.
 
+    Все команды выполняются асинхронным клиентом (redis.asyncio) и не
+    блокируют цикл событий. Клиент и пул соединений общие для процесса
+    (создаются в lifespan), хранилища создаются на запрос поверх них.
+
     Attributes:
-        _redis: Экземпляр Redis.
+        _redis: Асинхронный клиент Redis.
 
     Methods:
         set: Записывает значение в Redis.
+        setnx: Записывает значение, только если ключа еще нет.
         get: Получает значение из Redis.
-        delete: Удаляет значение из Redis.
+        mget: Получает значения нескольких ключей одним запросом.
+        mset_with_ttl: Записывает несколько значений с временем жизни одним запросом.
+        delete: Удаляет ключи из Redis.
+        delete_if_equals: Удаляет ключ, если его значение совпадает с ожидаемым.
         sadd: Добавляет значение в множество Redis.
         srem: Удаляет значение из множества Redis.
         smembers: Получает все значения из множества Redis.
-        keys: Возвращает список всех ключей в Redis.
+        spop: Извлекает случайные значения из множества Redis.
+        rpush: Добавляет значения в конец списка Redis.
+        lrange: Получает диапазон элементов списка Redis.
+        keys: Возвращает список всех ключей в Redis (устарел, блокирует Redis).
+        scan_iter: Перебирает ключи по паттерну курсором SCAN.
+        scan_batches: Перебирает ключи по паттерну пачками.
+        delete_matching: Удаляет ключи по паттерну пачками.
+        expire_matching: Задает время жизни ключам по паттерну пачками.
+        incr: Увеличивает числовое значение ключа.
+        zadd: Добавляет элементы в сортированное множество Redis.
+        zcard: Возвращает размер сортированного множества Redis.
+        zpopmin: Извлекает элементы с наименьшим весом из сортированного множества.
+        eval: Выполняет Lua скрипт атомарно на стороне Redis.
+        pipeline: Собирает несколько команд в один запрос к Redis.
     """
     def __init__(self, redis: Redis):
         """
-        Инициализация хранилища с готовым Redis-соединением.
+        Инициализация хранилища с готовым клиентом Redis.
 
         Args:
-            redis: Готовое подключение к Redis
+            redis: Асинхронный клиент Redis (общий пул соединений)
         """
         self._redis = redis
 
@@ -38,7 +74,27 @@ class BaseRedisStorage():
         Returns:
             None
         """
-        self._redis.set(key, value, ex=expires)
+        await self._redis.set(key, value, ex=expires)
+
+    async def setnx(self, key: str, value: str, expires: int = None) -> bool:
+        """
+        Записывает значение, только если ключа еще нет (SET NX).
+
+        Args:
+            key: Ключ для записи
+            value: Значение для записи
+            expires: Время жизни ключа в секундах
+
+        Returns:
+            bool: True, если значение записано
+
+        Usage:
+            >>> redis_storage.setnx('lock', 'owner1', expires=10)
+            True
+            >>> redis_storage.setnx('lock', 'owner2', expires=10)
+            False
+        """
+        return bool(await self._redis.set(key, value, ex=expires, nx=True))
 
     async def get(self, key: str) -> Optional[str]:
         """
@@ -58,28 +114,93 @@ class BaseRedisStorage():
             >>> redis_storage.get('non_existent_key')
             None
         """
-        return self._redis.get(key)
+        return await self._redis.get(key)
 
-    async def delete(self, key: str) -> None:
+    async def mget(self, keys: list[str]) -> list[Optional[bytes]]:
         """
-        Удаляет ключ из Redis.
+        Получает значения нескольких ключей одним запросом (MGET)
 
         Args:
-            key: Ключ для удаления
+            keys: Ключи для получения
 
         Returns:
-            None
+            list[Optional[bytes]]: Значения в порядке ключей (None для отсутствующих)
+
+        Usage:
+            >>> redis_storage.set('key1', 'value1')
+            >>> redis_storage.mget(['key1', 'key2'])
+            [b'value1', None]
+        """
+        if not keys:
+            return []
+        return await self._redis.mget(keys)
+
+    async def mset_with_ttl(self, mapping: dict[str, str], expires: int) -> None:
+        """
+        Записывает несколько значений с одинаковым временем жизни
+
+        MSET не умеет задавать TTL, поэтому отправляются SET EX для каждого
+        ключа в одной транзакции (один запрос к Redis).
+
+        Args:
+            mapping: Ключи и значения
+            expires: Время жизни ключей в секундах
+
+        Usage:
+            >>> redis_storage.mset_with_ttl({'key1': 'value1', 'key2': 'value2'}, 60)
+        """
+        if not mapping:
+            return
+        async with self.pipeline() as pipe:
+            for key, value in mapping.items():
+                pipe.set(key, value, ex=expires)
+
+    async def delete(self, *keys: str) -> int:
+        """
+        Удаляет ключи из Redis одной командой DEL.
+
+        Args:
+            keys: Ключи для удаления
+
+        Returns:
+            int: Количество удаленных ключей
 
         Usage:
             >>> redis_storage = RedisStorage(redis_client)
             >>> redis_storage.set('my_key', 'my_value')
             >>> redis_storage.get('my_key')
             'my_value'
-            >>> redis_storage.delete('my_key')
+            >>> redis_storage.delete('my_key', 'other_key')
+            1
             >>> redis_storage.get('my_key')
             None
         """
-        self._redis.delete(key)
+        if not keys:
+            return 0
+        return await self._redis.delete(*keys)
+
+    async def delete_if_equals(self, key: str, value: str) -> bool:
+        """
+        Атомарно удаляет ключ, если его значение совпадает с ожидаемым.
+
+        Проверка и удаление выполняются одним Lua скриптом, поэтому ключ,
+        перезаписанный другим клиентом между ними, не удаляется.
+
+        Args:
+            key: Ключ
+            value: Ожидаемое значение (например, токен владельца блокировки)
+
+        Returns:
+            bool: True, если ключ удален
+
+        Usage:
+            >>> redis_storage.setnx('lock', 'token', expires=10)
+            >>> redis_storage.delete_if_equals('lock', 'other')
+            False
+            >>> redis_storage.delete_if_equals('lock', 'token')
+            True
+        """
+        return bool(await self.eval(DELETE_IF_EQUALS_SCRIPT, [key], [value]))
 
     async def sadd(self, key: str, value: str) -> None:
         """
@@ -98,9 +219,9 @@ class BaseRedisStorage():
             >>> redis_storage.sadd('my_set', 'value2')
             >>> redis_storage.sadd('my_set', 'value3')
         """
-        self._redis.sadd(key, value)
+        await self._redis.sadd(key, value)
 
-    async def srem(self, key: str, value: str) -> None:
+    async def srem(self, key: str, value: str) -> int:
         """
         Удаляет значение из множества в Redis.
 
@@ -109,7 +230,7 @@ class BaseRedisStorage():
             value: Значение для удаления
 
         Returns:
-            None
+            int: Количество удаленных элементов (0, если значения не было)
 
         Usage:
         >>> redis_storage = RedisStorage(redis_client)
@@ -120,12 +241,15 @@ class BaseRedisStorage():
         >>> redis_storage.smembers('my_set')
         ['value1', 'value3']
         """
-        self._redis.srem(key, value)
+        return await self._redis.srem(key, value)
 
     async def keys(self, pattern: str) -> list[bytes]:
         """
         Получает ключи по паттерну
 
+        Устарел: KEYS проходит по всем ключам базы за одну команду и на это
+        время блокирует Redis для всех клиентов. Используйте scan_iter.
+
         Args:
             pattern: Паттерн для поиска ключей
 
@@ -139,7 +263,129 @@ class BaseRedisStorage():
             >>> redis_storage.keys('key*')
             ['key1', 'key2', 'key3']
         """
-        return self._redis.keys(pattern)
+        warnings.warn(
+            "BaseRedisStorage.keys блокирует Redis, используйте scan_iter",
+            DeprecationWarning,
+            stacklevel=2,
+        )
+        return await self._redis.keys(pattern)
+
+    async def scan_iter(
+        self, pattern: str, count: Optional[int] = None, type_: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """
+        Перебирает ключи по паттерну курсором SCAN
+
+        Каждый вызов SCAN просматривает около count слотов и быстро
+        возвращает управление, поэтому Redis между вызовами обслуживает
+        других клиентов. Ключ может встретиться больше одного раза, ключи,
+        созданные или удаленные во время обхода, могут не попасть в него.
+
+        Args:
+            pattern: Паттерн ключей (MATCH)
+            count: Подсказка SCAN COUNT (по умолчанию REDIS_SCAN_COUNT)
+            type_: Тип ключей (TYPE), например string, list, set
+
+        Yields:
+            str: Ключ
+
+        Usage:
+            >>> async for key in redis_storage.scan_iter('chat_history:*', type_='string'):
+            ...     print(key)
+            chat_history:42
+        """
+        async for key in self._redis.scan_iter(
+            match=pattern, count=count or settings.REDIS_SCAN_COUNT, _type=type_
+        ):
+            yield key.decode() if isinstance(key, bytes) else key
+
+    async def scan_batches(
+        self, pattern: str, count: Optional[int] = None, type_: Optional[str] = None
+    ) -> AsyncIterator[list[str]]:
+        """
+        Перебирает ключи по паттерну пачками не больше count ключей
+
+        Args:
+            pattern: Паттерн ключей (MATCH)
+            count: Размер пачки и подсказка SCAN COUNT (по умолчанию REDIS_SCAN_COUNT)
+            type_: Тип ключей (TYPE)
+
+        Yields:
+            list[str]: Пачка ключей
+
+        Usage:
+            >>> async for batch in redis_storage.scan_batches('chat_history:*', count=500):
+            ...     values = await redis_storage.mget(batch)
+        """
+        count = count or settings.REDIS_SCAN_COUNT
+        batch: list[str] = []
+        async for key in self.scan_iter(pattern, count, type_):
+            batch.append(key)
+            if len(batch) >= count:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    async def delete_matching(
+        self, pattern: str, count: Optional[int] = None, type_: Optional[str] = None
+    ) -> int:
+        """
+        Удаляет ключи по паттерну пачками
+
+        Ключи перебираются SCAN, каждая пачка удаляется одной командой
+        UNLINK (память освобождается в фоне, без блокировки Redis).
+
+        Args:
+            pattern: Паттерн ключей (MATCH)
+            count: Размер пачки (по умолчанию REDIS_SCAN_COUNT)
+            type_: Тип ключей (TYPE)
+
+        Returns:
+            int: Количество удаленных ключей
+
+        Usage:
+            >>> await redis_storage.delete_matching('completion_cache:*', type_='string')
+            1520
+        """
+        deleted = 0
+        async for batch in self.scan_batches(pattern, count, type_):
+            deleted += await self._redis.unlink(*batch)
+        return deleted
+
+    async def expire_matching(
+        self,
+        pattern: str,
+        expires: int,
+        count: Optional[int] = None,
+        type_: Optional[str] = None,
+    ) -> int:
+        """
+        Задает время жизни ключам по паттерну пачками
+
+        Ключи перебираются SCAN, EXPIRE для пачки отправляются одним
+        запросом (pipeline без транзакции).
+
+        Args:
+            pattern: Паттерн ключей (MATCH)
+            expires: Время жизни в секундах
+            count: Размер пачки (по умолчанию REDIS_SCAN_COUNT)
+            type_: Тип ключей (TYPE)
+
+        Returns:
+            int: Количество ключей, которым задано время жизни
+
+        Usage:
+            >>> await redis_storage.expire_matching('chat_history:*', 3600)
+            42
+        """
+        updated = 0
+        async for batch in self.scan_batches(pattern, count, type_):
+            async with self.pipeline(transaction=False) as pipe:
+                for key in batch:
+                    pipe.expire(key, expires)
+                updated += sum(1 for result in await pipe.execute() if result)
+        return updated
 
     async def smembers(self, key: str) -> list[str]:
         """
@@ -158,5 +404,186 @@ class BaseRedisStorage():
             >>> redis_storage.smembers('my_set')
             ['value1', 'value2', 'value3']
         """
-        result = self._redis.smembers(key)
+        result = await self._redis.smembers(key)
         return [member.decode() for member in result] if result else []
+
+    async def spop(self, key: str, count: int = 1) -> list[str]:
+        """
+        Извлекает (удаляет и возвращает) случайные элементы множества
+
+        Args:
+            key: Ключ множества
+            count: Максимальное количество элементов
+
+        Returns:
+            list[str]: Извлеченные элементы (пустой список, если множество пусто)
+
+        Usage:
+            >>> redis_storage.sadd('my_set', 'value1')
+            >>> redis_storage.spop('my_set', 10)
+            ['value1']
+        """
+        result = await self._redis.spop(key, count)
+        return [member.decode() for member in result] if result else []
+
+    async def rpush(self, key: str, *values: str) -> int:
+        """
+        Добавляет значения в конец списка
+
+        Args:
+            key: Ключ списка
+            values: Добавляемые значения
+
+        Returns:
+            int: Длина списка после добавления
+
+        Usage:
+            >>> redis_storage.rpush('my_list', 'value1', 'value2')
+            2
+        """
+        return await self._redis.rpush(key, *values)
+
+    async def lrange(self, key: str, start: int = 0, end: int = -1) -> list[bytes]:
+        """
+        Получает элементы списка в диапазоне (включительно)
+
+        Args:
+            key: Ключ списка
+            start: Индекс первого элемента (отрицательный - от конца)
+            end: Индекс последнего элемента (-1 - до конца)
+
+        Returns:
+            list[bytes]: Элементы (пустой список, если ключа нет)
+
+        Usage:
+            >>> redis_storage.rpush('my_list', 'value1', 'value2', 'value3')
+            >>> redis_storage.lrange('my_list', -2)
+            [b'value2', b'value3']
+        """
+        return await self._redis.lrange(key, start, end)
+
+    async def incr(self, key: str, amount: int = 1) -> int:
+        """
+        Увеличивает числовое значение ключа
+
+        Args:
+            key: Ключ счетчика
+            amount: Величина увеличения
+
+        Returns:
+            int: Новое значение счетчика
+
+        Usage:
+            >>> redis_storage.incr('counter')
+            1
+            >>> redis_storage.incr('counter', 5)
+            6
+        """
+        return await self._redis.incr(key, amount)
+
+    async def zadd(self, key: str, mapping: dict[str, float]) -> int:
+        """
+        Добавляет элементы в сортированное множество (или обновляет их вес)
+
+        Args:
+            key: Ключ сортированного множества
+            mapping: Элементы и их веса
+
+        Returns:
+            int: Количество новых элементов
+
+        Usage:
+            >>> redis_storage.zadd('my_zset', {'value1': 1.0, 'value2': 2.0})
+            2
+        """
+        return await self._redis.zadd(key, mapping)
+
+    async def zcard(self, key: str) -> int:
+        """
+        Возвращает количество элементов сортированного множества
+
+        Args:
+            key: Ключ сортированного множества
+
+        Returns:
+            int: Количество элементов
+        """
+        return await self._redis.zcard(key)
+
+    async def zpopmin(self, key: str, count: int = 1) -> list[tuple[str, float]]:
+        """
+        Извлекает элементы с наименьшим весом из сортированного множества
+
+        Args:
+            key: Ключ сортированного множества
+            count: Количество элементов
+
+        Returns:
+            list[tuple[str, float]]: Извлеченные элементы и их веса
+
+        Usage:
+            >>> redis_storage.zadd('my_zset', {'value1': 1.0, 'value2': 2.0})
+            >>> redis_storage.zpopmin('my_zset')
+            [('value1', 1.0)]
+        """
+        result = await self._redis.zpopmin(key, count)
+        return [
+            (member.decode() if isinstance(member, bytes) else member, score)
+            for member, score in result
+        ]
+
+    async def eval(self, script: str, keys: list[str], args: list[Any]) -> Any:
+        """
+        Выполняет Lua скрипт атомарно на стороне Redis
+
+        Скрипт вызывается по SHA1 (EVALSHA), текст скрипта отправляется
+        только если Redis его еще не знает.
+
+        Args:
+            script: Текст Lua скрипта
+            keys: Ключи (KEYS в скрипте)
+            args: Аргументы (ARGV в скрипте)
+
+        Returns:
+            Any: Результат скрипта
+
+        Usage:
+            >>> redis_storage.eval("return redis.call('GET', KEYS[1])", ['my_key'], [])
+            b'my_value'
+        """
+        sha = hashlib.sha1(script.encode()).hexdigest()
+        try:
+            return await self._redis.evalsha(sha, len(keys), *keys, *args)
+        except NoScriptError:
+            return await self._redis.eval(script, len(keys), *keys, *args)
+
+    @asynccontextmanager
+    async def pipeline(self, transaction: bool = True) -> AsyncIterator[Pipeline]:
+        """
+        Собирает команды в один запрос к Redis
+
+        Команды копятся в буфере и отправляются одним запросом при выходе
+        из блока (или раньше - явным await pipe.execute(), если нужны
+        результаты). При transaction=True команды оборачиваются в
+        MULTI/EXEC и выполняются атомарно. При исключении в блоке буфер
+        сбрасывается и ничего не отправляется.
+
+        Args:
+            transaction: Выполнять команды атомарно (MULTI/EXEC)
+
+        Yields:
+            Pipeline: Буфер команд redis.asyncio
+
+        Usage:
+            >>> async with redis_storage.pipeline() as pipe:
+            ...     pipe.set('key1', 'value1', ex=60)
+            ...     pipe.sadd('my_set', 'key1')
+            >>> async with redis_storage.pipeline(transaction=False) as pipe:
+            ...     pipe.get('key1')
+            ...     pipe.zcard('my_zset')
+            ...     value, size = await pipe.execute()
+        """
+        async with self._redis.pipeline(transaction=transaction) as pipe:
+            yield pipe
+            if len(pipe):
+                await pipe.execute()
@@ -1,37 +1,418 @@
 import json
-from typing import List
+import uuid
+from typing import Dict, List, Optional, Tuple
 
+from redis.asyncio.client import Pipeline
+
+from app.core.settings import settings
 from app.schemas import Message
 
 from .base import BaseRedisStorage
+from .near_cache import HistoryNearCache, get_history_near_cache
+
+# Заменяет начало истории кратким содержанием, только если история все еще
+# начинается с пересказанных сообщений (пока модель писала пересказ,
+# история могла измениться). Оставшееся время жизни ключа сохраняется.
+REPLACE_PREFIX_SCRIPT = """
+local current = redis.call('GET', KEYS[1])
+if not current then
+    return 0
+end
+local prefix = ARGV[1]
+if string.sub(current, 1, #prefix) ~= prefix then
+    return 0
+end
+local ttl = redis.call('TTL', KEYS[1])
+redis.call('SET', KEYS[1], ARGV[2] .. string.sub(current, #prefix + 1))
+if ttl > 0 then
+    redis.call('EXPIRE', KEYS[1], ttl)
+end
+return 1
+"""
+
+# То же для истории-списка: первые элементы сравниваются с пересказанными
+# сообщениями и заменяются одним элементом. LTRIM/LPUSH не меняют TTL.
+REPLACE_LIST_PREFIX_SCRIPT = """
+local count = #ARGV - 1
+local current = redis.call('LRANGE', KEYS[1], 0, count - 1)
+if #current ~= count then
+    return 0
+end
+for i = 1, count do
+    if current[i] ~= ARGV[i] then
+        return 0
+    end
+end
+redis.call('LTRIM', KEYS[1], count, -1)
+redis.call('LPUSH', KEYS[1], ARGV[count + 1])
+return 1
+"""
+
+# Дописывает сообщения в историю-список за один вызов:
+# - обновляет ARGV[5] прежних элементов (тройки индекс, прежнее значение,
+#   новое значение с ARGV[6]), только если элемент не изменился (LSET);
+# - дописывает остальные аргументы (RPUSH), обрезает список до ARGV[1]
+#   последних сообщений (0 - без ограничения), продлевает TTL (ARGV[2]);
+# - публикует инвалидацию ARGV[4] в канал ARGV[3] (если он задан).
+# Возвращает длину списка после RPUSH (до обрезки) и число пропущенных
+# обновлений. Пока не перенесена история в старом формате (KEYS[2]),
+# ничего не пишет и возвращает длину -1.
+APPEND_SCRIPT = """
+if redis.call('EXISTS', KEYS[2]) == 1 then
+    return {-1, 0}
+end
+local updates = tonumber(ARGV[5])
+local skipped = 0
+for i = 0, updates - 1 do
+    local base = 6 + i * 3
+    local index = tonumber(ARGV[base])
+    if redis.call('LINDEX', KEYS[1], index) == ARGV[base + 1] then
+        redis.call('LSET', KEYS[1], index, ARGV[base + 2])
+    else
+        skipped = skipped + 1
+    end
+end
+local length = redis.call('RPUSH', KEYS[1], unpack(ARGV, 6 + updates * 3))
+local max_messages = tonumber(ARGV[1])
+if max_messages > 0 then
+    redis.call('LTRIM', KEYS[1], -max_messages, -1)
+end
+redis.call('EXPIRE', KEYS[1], tonumber(ARGV[2]))
+if ARGV[3] ~= '' then
+    redis.call('PUBLISH', ARGV[3], ARGV[4])
+end
+return {length, skipped}
+"""
+
+# Сколько раз дописывание повторяет перенос истории из формата blob, если
+# ее одновременно меняет другой воркер
+MIGRATE_ATTEMPTS = 3
+
+# Обновления прежних сообщений истории: индекс -> (прочитанное, новое)
+HistoryUpdates = Dict[int, Tuple[Message, Message]]
+
+# Переносит историю из JSON (KEYS[2]) в список (KEYS[1]) с сохранением
+# TTL, если JSON с момента чтения не изменился (ARGV[1]). Элементы
+# подготовлены на стороне приложения (ARGV[3..]), ARGV[2] - длина списка.
+MIGRATE_SCRIPT = """
+if redis.call('GET', KEYS[2]) ~= ARGV[1] then
+    return 0
+end
+local ttl = redis.call('TTL', KEYS[2])
+redis.call('DEL', KEYS[1], KEYS[2])
+if #ARGV > 2 then
+    redis.call('RPUSH', KEYS[1], unpack(ARGV, 3))
+    local max_messages = tonumber(ARGV[2])
+    if max_messages > 0 then
+        redis.call('LTRIM', KEYS[1], -max_messages, -1)
+    end
+    if ttl > 0 then
+        redis.call('EXPIRE', KEYS[1], ttl)
+    end
+end
+return 1
+"""
+
 
 class ChatRedisStorage(BaseRedisStorage):
     """
     Redis хранилище для истории чата с AI
+
+    Формат задается CHAT_HISTORY_STORAGE:
+
+    * blob - вся история одним JSON массивом под chat_history:{user_id};
+      каждая реплика читает, дополняет и перезаписывает его целиком;
+    * list - список Redis под chat_messages:{user_id}, элемент - JSON
+      одного сообщения; новые сообщения дописываются (RPUSH), длина
+      ограничена (LTRIM), TTL продлевается тем же вызовом. Стоимость
+      реплики не зависит от длины диалога.
+
+    В режиме list история в формате blob переносится в список при первом
+    чтении или записи.
+
+    С CHAT_HISTORY_NEAR_CACHE_ENABLED чтения обслуживает ближний кэш
+    процесса (HistoryNearCache), а каждая запись публикует инвалидацию
+    для остальных процессов в том же запросе к Redis.
     """
 
+    COMPACTION_PENDING_KEY = "chat_compaction:pending"
+
+    @staticmethod
+    def _blob_key(user_id: int) -> str:
+        return f"chat_history:{user_id}"
+
+    @staticmethod
+    def _list_key(user_id: int) -> str:
+        return f"chat_messages:{user_id}"
+
+    @property
+    def list_mode(self) -> bool:
+        """История хранится списком"""
+        return settings.CHAT_HISTORY_STORAGE == "list"
+
+    @property
+    def near_cache(self) -> Optional[HistoryNearCache]:
+        """Ближний кэш истории процесса (None, если выключен)"""
+        return get_history_near_cache()
+
+    def _invalidation(self, user_id: int) -> List[str]:
+        """Канал и сообщение инвалидации (пустой канал - кэш выключен)"""
+        near_cache = self.near_cache
+        if near_cache is None:
+            return ["", ""]
+        return [settings.CHAT_HISTORY_INVALIDATION_CHANNEL, f"{near_cache.origin}:{user_id}"]
+
+    def _queue_invalidation(self, pipe: Pipeline, user_id: int) -> None:
+        """Добавляет публикацию инвалидации к командам записи"""
+        channel, message = self._invalidation(user_id)
+        if channel:
+            pipe.publish(channel, message)
+
+    @staticmethod
+    def _dump_message(message: Message) -> dict:
+        """
+        Сериализует сообщение вместе с закэшированным количеством токенов
+        """
+        data = message.model_dump()
+        if message.tokens is not None:
+            data["tokens"] = message.tokens
+            if message.tokens_model is not None:
+                data["tokens_model"] = message.tokens_model
+        return data
+
+    @classmethod
+    def _encode_message(cls, message: Message) -> str:
+        """Элемент истории-списка"""
+        return json.dumps(cls._dump_message(message))
+
+    @staticmethod
+    def _parse_blob(history: str) -> List[Message]:
+        return [Message.model_validate(msg) for msg in json.loads(history)]
+
+    async def _migrate(self, user_id: int, history: str) -> List[Message]:
+        """
+        Переносит историю из формата blob в список
+
+        Args:
+            user_id: Идентификатор пользователя
+            history: JSON истории, прочитанный из blob
+
+        Returns:
+            List[Message]: История (последние CHAT_HISTORY_MAX_MESSAGES сообщений)
+        """
+        messages = self._parse_blob(history)
+        migrated = await self.eval(
+            MIGRATE_SCRIPT,
+            [self._list_key(user_id), self._blob_key(user_id)],
+            [history, settings.CHAT_HISTORY_MAX_MESSAGES]
+            + [self._encode_message(msg) for msg in messages],
+        )
+        if migrated:
+            async with self.pipeline(transaction=False) as pipe:
+                self._queue_invalidation(pipe, user_id)
+        if settings.CHAT_HISTORY_MAX_MESSAGES > 0:
+            messages = messages[-settings.CHAT_HISTORY_MAX_MESSAGES:]
+        return messages
+
     async def save_chat_history(self, user_id: int, messages: List[Message]) -> None:
         """
-        Сохраняет историю чата пользователя
+        Сохраняет историю чата пользователя целиком (заменяет прежнюю)
         """
-        key = f"chat_history:{user_id}"
-        messages_json = json.dumps([msg.model_dump() for msg in messages])
-        await self.set(key, messages_json, expires=3600)  # Храним 1 час
+        if not self.list_mode:
+            messages_json = json.dumps([self._dump_message(msg) for msg in messages])
+            async with self.pipeline() as pipe:
+                pipe.set(self._blob_key(user_id), messages_json, ex=settings.CHAT_HISTORY_TTL)
+                self._queue_invalidation(pipe, user_id)
+            if self.near_cache is not None:
+                self.near_cache.write(user_id, messages)
+            return
+
+        await self.clear_chat_history(user_id)
+        if messages:
+            await self.append_messages(user_id, messages)
+
+    async def append_messages(
+        self,
+        user_id: int,
+        messages: List[Message],
+        updates: Optional[HistoryUpdates] = None,
+    ) -> None:
+        """
+        Дописывает сообщения в конец истории чата пользователя
+
+        В режиме list - один вызов Redis независимо от длины истории,
+        в режиме blob - чтение и перезапись всей истории.
+
+        Args:
+            user_id: Идентификатор пользователя
+            messages: Новые сообщения
+            updates: Прежние сообщения с новыми данными (счетчиками токенов):
+                индекс в прочитанной истории -> (прочитанное, новое).
+                Сообщение заменяется, только если оно с момента чтения не
+                изменилось (иначе обновление пропускается)
+
+        Raises:
+            RuntimeError: Если историю в формате blob не удалось перенести
+                за MIGRATE_ATTEMPTS попыток (ее непрерывно меняют)
+        """
+        updates = updates or {}
+        if not self.list_mode:
+            history = await self.get_chat_history(user_id)
+            for index, (old, new) in updates.items():
+                if index < len(history) and self._encode_message(
+                    history[index]
+                ) == self._encode_message(old):
+                    history[index] = new
+            await self.save_chat_history(user_id, history + messages)
+            return
+
+        args = (
+            [settings.CHAT_HISTORY_MAX_MESSAGES, settings.CHAT_HISTORY_TTL]
+            + self._invalidation(user_id)
+            + [len(updates)]
+        )
+        for index, (old, new) in updates.items():
+            args.extend([index, self._encode_message(old), self._encode_message(new)])
+        args.extend(self._encode_message(msg) for msg in messages)
+        keys = [self._list_key(user_id), self._blob_key(user_id)]
+
+        for _ in range(MIGRATE_ATTEMPTS):
+            length, skipped = await self.eval(APPEND_SCRIPT, keys, args)
+            if length != -1:
+                break
+            # История еще в старом формате: переносим и повторяем
+            history = await self.get(self._blob_key(user_id))
+            if history:
+                await self._migrate(user_id, history)
+        else:
+            raise RuntimeError(
+                f"не удалось перенести историю пользователя {user_id} в список"
+            )
+
+        if self.near_cache is None:
+            return
+        if skipped:
+            # Часть прежних сообщений изменил другой воркер: запись устарела
+            self.near_cache.invalidate(user_id)
+            return
+        self.near_cache.extend(
+            user_id,
+            messages,
+            length,
+            settings.CHAT_HISTORY_MAX_MESSAGES,
+            {index: new for index, (_, new) in updates.items()},
+        )
 
     async def get_chat_history(self, user_id: int) -> List[Message]:
         """
-        Получает историю чата пользователя
+        Получает историю чата пользователя (из ближнего кэша, если он включен)
         """
-        key = f"chat_history:{user_id}"
-        history = await self.get(key)
-        if not history:
-            return []
-        messages_data = json.loads(history)
-        return [Message.model_validate(msg) for msg in messages_data]
+        near_cache = self.near_cache
+        if near_cache is None:
+            return await self._read_history(user_id)
+
+        messages = near_cache.get(user_id)
+        if messages is None:
+            generation = near_cache.generation
+            messages = await self._read_history(user_id)
+            near_cache.put(user_id, messages, generation)
+        return messages
+
+    async def _read_history(self, user_id: int) -> List[Message]:
+        """Читает историю чата пользователя из Redis"""
+        if not self.list_mode:
+            history = await self.get(self._blob_key(user_id))
+            return self._parse_blob(history) if history else []
+
+        # Список и история в старом формате читаются одним запросом. Список
+        # читается целиком: его длину уже ограничивает LTRIM при записи, а
+        # индексы обновлений (append_messages) и пересказ начала истории
+        # (replace_history_prefix) считаются от его начала
+        async with self.pipeline(transaction=False) as pipe:
+            pipe.lrange(self._list_key(user_id), 0, -1)
+            pipe.get(self._blob_key(user_id))
+            items, history = await pipe.execute()
+        if items:
+            return [Message.model_validate_json(item) for item in items]
+        if history:
+            return await self._migrate(user_id, history)
+        return []
 
     async def clear_chat_history(self, user_id: int) -> None:
         """
         Очищает историю чата пользователя
         """
-        key = f"chat_history:{user_id}"
-        await self.delete(key)
+        async with self.pipeline() as pipe:
+            pipe.delete(self._blob_key(user_id), self._list_key(user_id))
+            self._queue_invalidation(pipe, user_id)
+        if self.near_cache is not None:
+            self.near_cache.write(user_id, [])
+
+    async def request_compaction(self, user_id: int) -> None:
+        """
+        Ставит историю пользователя в очередь фонового сжатия
+        """
+        await self.sadd(self.COMPACTION_PENDING_KEY, str(user_id))
+
+    async def pop_compaction_requests(self, count: int) -> List[int]:
+        """
+        Забирает пользователей из очереди сжатия (каждого получает один воркер)
+        """
+        return [int(user_id) for user_id in await self.spop(self.COMPACTION_PENDING_KEY, count)]
+
+    async def lock_compaction(self, user_id: int) -> Optional[str]:
+        """
+        Захватывает сжатие истории пользователя (защита от двойного пересказа)
+
+        Returns:
+            Optional[str]: Токен владельца или None, если сжатие уже идет
+        """
+        token = uuid.uuid4().hex
+        if await self.setnx(
+            f"chat_compaction:lock:{user_id}", token, expires=settings.CHAT_COMPACTION_LOCK_TTL
+        ):
+            return token
+        return None
+
+    async def unlock_compaction(self, user_id: int, token: str) -> None:
+        """
+        Снимает блокировку сжатия, если она все еще принадлежит владельцу
+        токена (пересказ мог идти дольше CHAT_COMPACTION_LOCK_TTL)
+        """
+        await self.delete_if_equals(f"chat_compaction:lock:{user_id}", token)
+
+    async def replace_history_prefix(
+        self, user_id: int, prefix: List[Message], summary: Message
+    ) -> bool:
+        """
+        Атомарно заменяет первые сообщения истории одним сообщением
+
+        Args:
+            user_id: Идентификатор пользователя
+            prefix: Заменяемые сообщения (начало истории на момент чтения)
+            summary: Сообщение с кратким содержанием
+
+        Returns:
+            bool: False, если история с тех пор изменилась в начале или удалена
+        """
+        if self.list_mode:
+            replaced = await self.eval(
+                REPLACE_LIST_PREFIX_SCRIPT,
+                [self._list_key(user_id)],
+                [self._encode_message(msg) for msg in prefix] + [self._encode_message(summary)],
+            )
+        else:
+            # История хранится JSON массивом, поэтому начало массива из prefix
+            # совпадает с началом сохраненной строки байт в байт
+            prefix_json = json.dumps([self._dump_message(msg) for msg in prefix])[:-1]
+            summary_json = "[" + json.dumps(self._dump_message(summary))
+            replaced = await self.eval(
+                REPLACE_PREFIX_SCRIPT, [self._blob_key(user_id)], [prefix_json, summary_json]
+            )
+
+        if replaced:
+            async with self.pipeline(transaction=False) as pipe:
+                self._queue_invalidation(pipe, user_id)
+            if self.near_cache is not None:
+                self.near_cache.invalidate(user_id)
+        return bool(replaced)
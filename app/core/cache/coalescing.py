@@ -0,0 +1,76 @@
+import asyncio
+import uuid
+from typing import Optional
+
+from app.core.settings import settings
+
+from .base import BaseRedisStorage
+
+
+class CoalescingRedisStorage(BaseRedisStorage):
+    """
+    Redis хранилище для объединения одинаковых запросов между воркерами
+
+    Первый воркер захватывает короткую блокировку по хэшу запроса и
+    выполняет вызов, остальные ждут, пока он опубликует результат.
+    Результат живет несколько секунд - только чтобы его успели забрать
+    ожидающие воркеры.
+    """
+
+    @staticmethod
+    def _lock_key(key: str) -> str:
+        return f"singleflight:lock:{key}"
+
+    @staticmethod
+    def _result_key(key: str) -> str:
+        return f"singleflight:result:{key}"
+
+    async def acquire(self, key: str) -> Optional[str]:
+        """
+        Пытается захватить блокировку запроса
+
+        Args:
+            key: Хэш запроса
+
+        Returns:
+            Optional[str]: Токен владельца или None, если блокировка занята
+        """
+        token = uuid.uuid4().hex
+        if await self.setnx(self._lock_key(key), token, expires=settings.COALESCING_LOCK_TTL):
+            return token
+        return None
+
+    async def release(self, key: str, token: str) -> None:
+        """
+        Снимает блокировку, если она все еще принадлежит владельцу токена
+
+        Проверка владельца и удаление атомарны: блокировку, которую после
+        истечения нашей захватил другой воркер, снять нельзя.
+        """
+        await self.delete_if_equals(self._lock_key(key), token)
+
+    async def publish(self, key: str, result: str) -> None:
+        """
+        Публикует результат для ожидающих воркеров
+        """
+        await self.set(self._result_key(key), result, expires=settings.COALESCING_RESULT_TTL)
+
+    async def wait_result(self, key: str) -> Optional[str]:
+        """
+        Ждет результат, пока держится блокировка владельца
+
+        Returns:
+            Optional[str]: Результат или None, если владелец снял блокировку
+            без результата (ошибка) или истекло время блокировки
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.COALESCING_LOCK_TTL
+        while loop.time() < deadline:
+            # Результат и блокировка читаются одним MGET: владелец публикует
+            # результат до снятия блокировки, поэтому без блокировки в том же
+            # снимке результата уже не будет
+            result, lock = await self.mget([self._result_key(key), self._lock_key(key)])
+            if result is not None or lock is None:
+                return result
+            await asyncio.sleep(settings.COALESCING_POLL_INTERVAL)
+        return None
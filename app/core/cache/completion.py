@@ -0,0 +1,109 @@
+import time
+from typing import Optional
+
+from app.core.settings import settings
+from app.schemas import ChatRequest, ChatResponse
+
+from .base import BaseRedisStorage
+
+
+class CompletionCacheRedisStorage(BaseRedisStorage):
+    """
+    Redis кэш ответов модели для детерминированных запросов
+
+    Ключ - канонический хэш запроса (ChatRequest.fingerprint) из modelUri,
+    сообщений и настроек генерации, поэтому одинаковые запросы получают
+    один и тот же ответ без обращения к модели. Размер кэша ограничен: порядок использования записей хранится
+    в сортированном множестве, при переполнении вытесняются самые давние.
+    Запросы с температурой выше порога в кэш не попадают.
+    """
+
+    KEY_PREFIX = "completion_cache"
+    INDEX_KEY = "completion_cache:index"
+    HITS_KEY = "completion_cache:stats:hits"
+    MISSES_KEY = "completion_cache:stats:misses"
+
+    @staticmethod
+    def is_cacheable(chat_request: ChatRequest) -> bool:
+        """
+        Проверяет, можно ли кэшировать ответ на запрос
+
+        Args:
+            chat_request: Запрос к AI модели
+
+        Returns:
+            bool: True, если кэш включен и температура не выше порога
+        """
+        return (
+            settings.COMPLETION_CACHE_ENABLED
+            and chat_request.completionOptions.temperature
+            <= settings.COMPLETION_CACHE_MAX_TEMPERATURE
+        )
+
+    def _key(self, fingerprint: str) -> str:
+        return f"{self.KEY_PREFIX}:{fingerprint}"
+
+    async def get_response(self, fingerprint: str) -> Optional[ChatResponse]:
+        """
+        Получает закэшированный ответ
+
+        Args:
+            fingerprint: Хэш запроса
+
+        Returns:
+            Optional[ChatResponse]: Ответ из кэша или None
+        """
+        cached = await self.get(self._key(fingerprint))
+        if not cached:
+            await self.incr(self.MISSES_KEY)
+            return None
+
+        async with self.pipeline(transaction=False) as pipe:
+            pipe.incr(self.HITS_KEY)
+            pipe.zadd(self.INDEX_KEY, {fingerprint: time.time()})
+        return ChatResponse.model_validate_json(cached).model_copy(
+            update={"cached": True}
+        )
+
+    async def save_response(self, fingerprint: str, response: ChatResponse) -> None:
+        """
+        Сохраняет ответ в кэш и вытесняет давние записи при переполнении
+
+        Args:
+            fingerprint: Хэш запроса
+            response: Ответ модели
+        """
+        async with self.pipeline() as pipe:
+            pipe.set(
+                self._key(fingerprint),
+                response.model_dump_json(),
+                ex=settings.COMPLETION_CACHE_TTL,
+            )
+            pipe.zadd(self.INDEX_KEY, {fingerprint: time.time()})
+            pipe.zcard(self.INDEX_KEY)
+            *_, size = await pipe.execute()
+
+        overflow = size - settings.COMPLETION_CACHE_MAX_ENTRIES
+        if overflow > 0:
+            evicted = await self.zpopmin(self.INDEX_KEY, overflow)
+            await self.delete(*(self._key(member) for member, _ in evicted))
+
+    async def get_stats(self) -> dict:
+        """
+        Возвращает счетчики попаданий и промахов кэша
+
+        Returns:
+            dict: hits, misses, hit_rate и текущее количество записей
+        """
+        async with self.pipeline(transaction=False) as pipe:
+            pipe.mget(self.HITS_KEY, self.MISSES_KEY)
+            pipe.zcard(self.INDEX_KEY)
+            (hits, misses), size = await pipe.execute()
+        hits, misses = int(hits or 0), int(misses or 0)
+        total = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / total if total else 0.0,
+            "size": size,
+        }
@@ -0,0 +1,341 @@
+"""
+Ближний кэш истории чата в памяти процесса.
+
+Реплики одного пользователя часто попадают в один и тот же воркер с
+интервалом в секунды, а каждая реплика заново читала и разбирала всю
+историю из Redis. Ближний кэш хранит разобранные списки Message в LRU
+процесса с ограничением по числу записей, объему текста и времени жизни.
+
+Согласованность между процессами - через pub/sub канал: каждая запись
+истории (ChatRedisStorage) в том же запросе к Redis публикует
+"<origin>:<user_id>", подписчик в каждом процессе удаляет запись
+пользователя. Свои записи процесс не удаляет, а обновляет локально.
+Кэш отвечает, только пока подписка активна: при обрыве соединения он
+очищается и выключается до переподписки. Счетчик поколений защищает от
+гонки чтения с записью: история, прочитанная из Redis до инвалидации,
+в кэш не попадает.
+
+Example:
+    >>> cache = HistoryNearCache(max_entries=10000, max_bytes=64 << 20, ttl=30)
+    >>> generation = cache.generation
+    >>> messages = await read_from_redis(42)
+    >>> cache.put(42, messages, generation)
+    >>> cache.get(42)
+    [Message(...), ...]
+"""
+
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from redis.asyncio import Redis
+
+from app.core.settings import settings
+from app.schemas import Message
+
+logger = logging.getLogger(__name__)
+
+# Оценка памяти сообщения сверх длины текста (объект pydantic, строки)
+MESSAGE_OVERHEAD = 200
+
+
+class _Entry(NamedTuple):
+    messages: List[Message]
+    size: int
+    expires_at: float
+
+
+class HistoryNearCache:
+    """
+    LRU разобранных историй чата с ограничением по числу записей, объему
+    и времени жизни
+
+    Attributes:
+        max_entries: Максимум пользователей в кэше
+        max_bytes: Оценочный максимум объема (текст + MESSAGE_OVERHEAD на сообщение)
+        ttl: Время жизни записи, секунды
+        origin: Идентификатор процесса в сообщениях инвалидации
+        active: Процесс подписан на инвалидацию и кэш отвечает
+        generation: Счетчик инвалидаций (растет при каждой записи и сбросе)
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl: float) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.origin = uuid.uuid4().hex
+        self.active = False
+        self.generation = 0
+
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _size(messages: List[Message]) -> int:
+        return sum(len(message.text) + MESSAGE_OVERHEAD for message in messages)
+
+    @staticmethod
+    def _copy(messages: List[Message]) -> List[Message]:
+        """Копии сообщений: объекты записи не разделяются с вызывающим кодом"""
+        return [message.model_copy() for message in messages]
+
+    def _remove(self, user_id: int) -> bool:
+        entry = self._entries.pop(user_id, None)
+        if entry is None:
+            return False
+        self._bytes -= entry.size
+        return True
+
+    def _store(self, user_id: int, messages: List[Message]) -> None:
+        self._remove(user_id)
+        size = self._size(messages)
+        if size > self.max_bytes:
+            return
+        self._entries[user_id] = _Entry(self._copy(messages), size, time.monotonic() + self.ttl)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.size
+            self.evictions += 1
+
+    def _forget(self, user_id: int) -> Optional[_Entry]:
+        """Удаляет запись и завершает поколение (незаконченные чтения не кэшируются)"""
+        self.generation += 1
+        entry = self._entries.get(user_id)
+        self._remove(user_id)
+        return entry
+
+    def get(self, user_id: int) -> Optional[List[Message]]:
+        """
+        Возвращает копию истории пользователя
+
+        Сообщения тоже копируются: изменение полученных объектов (например,
+        счетчиков токенов) не меняет запись, которая должна совпадать с Redis.
+
+        Returns:
+            Optional[List[Message]]: История или None (нет записи, истекла,
+            кэш не активен)
+        """
+        if not self.active:
+            return None
+        entry = self._entries.get(user_id)
+        if entry is None or entry.expires_at <= time.monotonic():
+            if entry is not None:
+                self._remove(user_id)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(user_id)
+        self.hits += 1
+        return self._copy(entry.messages)
+
+    def put(self, user_id: int, messages: List[Message], generation: int) -> None:
+        """
+        Кладет историю, прочитанную из Redis
+
+        Args:
+            user_id: Идентификатор пользователя
+            messages: История
+            generation: Значение generation до начала чтения; если с тех пор
+                была инвалидация, история могла устареть и не кэшируется
+        """
+        if self.active and generation == self.generation:
+            self._store(user_id, messages)
+
+    def write(self, user_id: int, messages: List[Message]) -> None:
+        """Обновляет запись после записи истории этим процессом"""
+        self._forget(user_id)
+        if self.active:
+            self._store(user_id, messages)
+
+    def extend(
+        self,
+        user_id: int,
+        messages: List[Message],
+        length: int,
+        max_messages: int = 0,
+        updates: Optional[Dict[int, Message]] = None,
+    ) -> None:
+        """
+        Дописывает сообщения в запись после RPUSH этим процессом
+
+        Запись обновляется, только если она совпадает с Redis по длине
+        (length - длина списка после RPUSH, до обрезки), иначе удаляется.
+
+        Args:
+            user_id: Идентификатор пользователя
+            messages: Дописанные сообщения
+            length: Длина списка в Redis после RPUSH
+            max_messages: Ограничение длины истории (0 - без ограничения)
+            updates: Прежние сообщения, замененные той же записью (индекс ->
+                новое сообщение)
+        """
+        entry = self._forget(user_id)
+        if (
+            not self.active
+            or entry is None
+            or entry.expires_at <= time.monotonic()
+            or len(entry.messages) + len(messages) != length
+        ):
+            return
+        history = list(entry.messages)
+        for index, message in (updates or {}).items():
+            if index >= len(history):
+                return
+            history[index] = message
+        history += messages
+        if max_messages > 0:
+            history = history[-max_messages:]
+        self._store(user_id, history)
+
+    def invalidate(self, user_id: int) -> None:
+        """Удаляет запись: история изменилась в Redis (другим процессом или сжатием)"""
+        if self._forget(user_id) is not None:
+            self.invalidations += 1
+
+    def activate(self) -> None:
+        """Включает кэш (подписка на инвалидацию установлена)"""
+        self.clear()
+        self.active = True
+
+    def deactivate(self) -> None:
+        """Выключает и очищает кэш (подписка потеряна)"""
+        self.active = False
+        self.clear()
+
+    def clear(self) -> None:
+        """Удаляет все записи"""
+        self.generation += 1
+        self._entries.clear()
+        self._bytes = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Возвращает счетчики кэша процесса
+
+        Returns:
+            dict: active, hits, misses, hit_rate, entries, bytes, evictions,
+            invalidations
+        """
+        total = self.hits + self.misses
+        return {
+            "active": self.active,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+class HistoryInvalidationListener:
+    """
+    Фоновая подписка процесса на канал инвалидации истории
+
+    Кэш включается после подтверждения подписки и выключается при ее
+    потере; переподписка - через retry_delay секунд.
+
+    Attributes:
+        redis: Клиент Redis (подписка занимает одно соединение пула)
+        cache: Ближний кэш процесса
+        channel: Канал инвалидации
+        retry_delay: Пауза перед переподпиской, секунды
+    """
+
+    def __init__(
+        self,
+        redis: Redis,
+        cache: HistoryNearCache,
+        channel: str = "chat_history:invalidate",
+        retry_delay: float = 1.0,
+    ) -> None:
+        self.redis = redis
+        self.cache = cache
+        self.channel = channel
+        self.retry_delay = retry_delay
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Запускает фоновую подписку"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="history-invalidation")
+            logger.info("Ближний кэш истории чата запущен")
+
+    async def stop(self) -> None:
+        """Останавливает подписку и выключает кэш"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            logger.info("Ближний кэш истории чата остановлен")
+
+    async def _run(self) -> None:
+        while True:
+            pubsub = self.redis.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                while True:
+                    message = await pubsub.get_message(timeout=1.0)
+                    if message is not None:
+                        self._handle(message)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Потеряна подписка на инвалидацию истории: %s", str(e))
+            finally:
+                self.cache.deactivate()
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+
+            await asyncio.sleep(self.retry_delay)
+
+    def _handle(self, message: Dict[str, Any]) -> None:
+        if message["type"] == "subscribe":
+            self.cache.activate()
+            return
+        if message["type"] != "message":
+            return
+
+        data = message["data"]
+        origin, _, user_id = (data.decode() if isinstance(data, bytes) else data).partition(":")
+        if origin != self.cache.origin:
+            self.cache.invalidate(int(user_id))
+
+
+_history_near_cache: Optional[HistoryNearCache] = None
+
+
+def get_history_near_cache() -> Optional[HistoryNearCache]:
+    """
+    Возвращает ближний кэш истории процесса
+
+    Returns:
+        Optional[HistoryNearCache]: Кэш или None, если он выключен
+        (CHAT_HISTORY_NEAR_CACHE_ENABLED)
+    """
+    global _history_near_cache
+    if not settings.CHAT_HISTORY_NEAR_CACHE_ENABLED:
+        return None
+    if _history_near_cache is None:
+        _history_near_cache = HistoryNearCache(
+            settings.CHAT_HISTORY_NEAR_CACHE_MAX_ENTRIES,
+            settings.CHAT_HISTORY_NEAR_CACHE_MAX_BYTES,
+            settings.CHAT_HISTORY_NEAR_CACHE_TTL,
+        )
+    return _history_near_cache
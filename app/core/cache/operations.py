@@ -0,0 +1,224 @@
+import json
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.settings import settings
+from app.schemas import (ChatOperationResponse, Message, OperationStatus,
+                         Result)
+
+from .base import BaseRedisStorage
+
+# Захватывает до ARGV[2] операций, срок проверки которых (вес в KEYS[1])
+# наступил к ARGV[1]: вес сдвигается на время аренды ARGV[3], поэтому
+# другие воркеры их не получат, пока захвативший не перенесет проверку
+# (или аренда не истечет, если он упал).
+# Возвращает ближайший срок проверки после захвата ('' - операций нет) и
+# пары (операция, текущий интервал опроса из KEYS[2] или '').
+CLAIM_DUE_SCRIPT = """
+local due = redis.call(
+    'ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[2])
+)
+local lease_until = tonumber(ARGV[1]) + tonumber(ARGV[3])
+local claimed = {}
+for _, operation_id in ipairs(due) do
+    redis.call('ZADD', KEYS[1], lease_until, operation_id)
+    table.insert(claimed, operation_id)
+    table.insert(claimed, redis.call('HGET', KEYS[2], operation_id) or '')
+end
+local nearest = redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+return {nearest[2] or '', claimed}
+"""
+
+# Переносит следующую проверку операции ARGV[1] на ARGV[2] и запоминает
+# интервал ARGV[3], если операция еще не завершена
+RESCHEDULE_SCRIPT = """
+if not redis.call('ZSCORE', KEYS[1], ARGV[1]) then
+    return 0
+end
+redis.call('ZADD', KEYS[1], ARGV[2], ARGV[1])
+redis.call('HSET', KEYS[2], ARGV[1], ARGV[3])
+return 1
+"""
+
+# Снимает операцию ARGV[1] с расписания, возвращает число удаленных
+# элементов (0 - ее уже завершил другой воркер)
+COMPLETE_SCRIPT = """
+local removed = redis.call('ZREM', KEYS[1], ARGV[1])
+redis.call('HDEL', KEYS[2], ARGV[1])
+return removed
+"""
+
+
+class OperationRedisStorage(BaseRedisStorage):
+    """
+    Redis хранилище отложенных (асинхронных) операций генерации
+
+    Запись операции хранит публичный статус (ChatOperationResponse) и служебные
+    данные: пользователя и его сообщение, которые добавляются в историю чата
+    после завершения операции, и модель для учета расхода токенов.
+    Идентификаторы незавершенных операций лежат в общем расписании
+    (сортированное множество, вес - срок следующей проверки), из которого
+    воркеры захватывают наступившие проверки, так что каждую операцию в
+    каждый момент опрашивает один воркер.
+    """
+
+    SCHEDULE_KEY = "chat_operations:schedule"
+    INTERVALS_KEY = "chat_operations:intervals"
+
+    @classmethod
+    def _schedule_keys(cls) -> List[str]:
+        return [cls.SCHEDULE_KEY, cls.INTERVALS_KEY]
+
+    @staticmethod
+    def _key(operation_id: str) -> str:
+        return f"chat_operation:{operation_id}"
+
+    async def _save_record(self, record: Dict[str, Any], pending: bool = False) -> None:
+        """
+        Сохраняет запись операции; с pending=True в той же транзакции
+        ставит операцию в расписание опроса (первая проверка через
+        YANDEX_OPERATION_POLL_MIN_INTERVAL)
+        """
+        operation_id = record["operation"]["id"]
+        async with self.pipeline() as pipe:
+            pipe.set(
+                self._key(operation_id),
+                json.dumps(record),
+                ex=settings.YANDEX_OPERATION_RESULT_TTL,
+            )
+            if pending:
+                pipe.zadd(
+                    self.SCHEDULE_KEY,
+                    {operation_id: time.time() + settings.YANDEX_OPERATION_POLL_MIN_INTERVAL},
+                )
+
+    async def add_pending(
+        self,
+        operation_id: str,
+        user_id: int,
+        message: Message,
+        model: Optional[str] = None,
+    ) -> ChatOperationResponse:
+        """
+        Сохраняет новую операцию и ставит ее в очередь опроса
+
+        Args:
+            operation_id: Идентификатор операции Yandex
+            user_id: Идентификатор пользователя
+            message: Сообщение пользователя, отправленное в модель
+            model: Имя модели (для учета расхода токенов)
+
+        Returns:
+            ChatOperationResponse: Операция в статусе pending
+        """
+        operation = ChatOperationResponse(
+            id=operation_id, status=OperationStatus.PENDING
+        )
+        await self._save_record(
+            {
+                "operation": operation.model_dump(mode="json"),
+                "user_id": user_id,
+                "message": message.model_dump(mode="json"),
+                "model": model,
+            },
+            pending=True,
+        )
+        return operation
+
+    async def get_record(self, operation_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Получает запись операции вместе со служебными данными
+        """
+        record = await self.get(self._key(operation_id))
+        if not record:
+            return None
+        return json.loads(record)
+
+    async def get_operation(self, operation_id: str) -> Optional[ChatOperationResponse]:
+        """
+        Получает публичный статус операции
+        """
+        record = await self.get_record(operation_id)
+        if not record:
+            return None
+        return ChatOperationResponse.model_validate(record["operation"])
+
+    async def claim_due(
+        self, now: float, count: int, lease: float
+    ) -> Tuple[List[Tuple[str, Optional[float]]], Optional[float]]:
+        """
+        Захватывает операции, срок проверки которых наступил
+
+        Захват атомарен: одну операцию получает один воркер, остальные -
+        только после переноса проверки (reschedule) или истечения аренды.
+
+        Args:
+            now: Текущее время (time.time())
+            count: Максимум операций
+            lease: Время аренды, секунды (больше времени одной проверки)
+
+        Returns:
+            Tuple: Операции с текущим интервалом опроса (None - первая
+            проверка) и ближайший срок проверки в расписании (None - пусто)
+        """
+        nearest, claimed = await self.eval(
+            CLAIM_DUE_SCRIPT, self._schedule_keys(), [now, count, lease]
+        )
+        claimed = [item.decode() if isinstance(item, bytes) else item for item in claimed]
+        operations = [
+            (operation_id, float(interval) if interval else None)
+            for operation_id, interval in zip(claimed[::2], claimed[1::2])
+        ]
+        return operations, float(nearest) if nearest else None
+
+    async def reschedule(self, operation_id: str, next_check: float, interval: float) -> None:
+        """
+        Переносит следующую проверку незавершенной операции
+
+        Args:
+            operation_id: Идентификатор операции Yandex
+            next_check: Срок следующей проверки (time.time())
+            interval: Текущий интервал опроса операции
+        """
+        await self.eval(
+            RESCHEDULE_SCRIPT, self._schedule_keys(), [operation_id, next_check, interval]
+        )
+
+    async def complete_operation(
+        self,
+        operation_id: str,
+        result: Optional[Result] = None,
+        error: Optional[str] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Фиксирует завершение операции
+
+        Снятие операции с расписания служит атомарным захватом: если
+        операцию уже завершил другой воркер, возвращается None и запись
+        не перезаписывается.
+
+        Args:
+            operation_id: Идентификатор операции Yandex
+            result: Результат генерации
+            error: Текст ошибки
+
+        Returns:
+            Optional[Dict[str, Any]]: Обновленная запись или None
+        """
+        if not await self.eval(COMPLETE_SCRIPT, self._schedule_keys(), [operation_id]):
+            return None
+
+        record = await self.get_record(operation_id)
+        if not record:
+            return None
+
+        operation = ChatOperationResponse(
+            success=error is None,
+            id=operation_id,
+            status=OperationStatus.DONE if error is None else OperationStatus.FAILED,
+            result=result,
+            error=error,
+        )
+        record["operation"] = operation.model_dump(mode="json")
+        await self._save_record(record)
+        return record
@@ -0,0 +1,101 @@
+from typing import List, Optional, Tuple
+
+from .base import BaseRedisStorage
+
+# Окно квоты: (ключ счетчиков, лимит токенов, лимит запросов, unix-время
+# окончания окна). Лимит 0 - без ограничения.
+Window = Tuple[str, int, int, int]
+
+# Проверяет все окна и, только если ни одно не исчерпано, списывает из
+# каждого резерв токенов и один запрос. Возвращает пустую строку при
+# успехе, иначе "<номер окна>:tokens" или "<номер окна>:requests".
+RESERVE_SCRIPT = """
+local tokens = tonumber(ARGV[1])
+local count = #KEYS
+
+for i = 1, count do
+    local token_limit = tonumber(ARGV[(i - 1) * 3 + 2])
+    local request_limit = tonumber(ARGV[(i - 1) * 3 + 3])
+    local state = redis.call('HMGET', KEYS[i], 'tokens', 'requests')
+    local used_tokens = tonumber(state[1]) or 0
+    local used_requests = tonumber(state[2]) or 0
+    if request_limit > 0 and used_requests + 1 > request_limit then
+        return i .. ':requests'
+    end
+    if token_limit > 0 and used_tokens + tokens > token_limit then
+        return i .. ':tokens'
+    end
+end
+
+for i = 1, count do
+    redis.call('HINCRBY', KEYS[i], 'tokens', tokens)
+    redis.call('HINCRBY', KEYS[i], 'requests', 1)
+    redis.call('EXPIREAT', KEYS[i], tonumber(ARGV[(i - 1) * 3 + 4]))
+end
+return ''
+"""
+
+# Уточняет расход токенов во всех окнах резерва (отрицательное значение -
+# возврат). Истекшие окна не воскрешаются.
+CHARGE_SCRIPT = """
+for i = 1, #KEYS do
+    if redis.call('EXISTS', KEYS[i]) == 1 then
+        redis.call('HINCRBY', KEYS[i], 'tokens', tonumber(ARGV[1]))
+    end
+end
+return 1
+"""
+
+
+class QuotaRedisStorage(BaseRedisStorage):
+    """
+    Redis хранилище квот пользователей
+
+    Расход пользователя за окно (день, месяц) - хэш с полями tokens
+    и requests, ключ живет до конца окна. Проверка и списание - один Lua
+    скрипт на все окна, атомарный для всего кластера.
+    """
+
+    KEY_PREFIX = "quota"
+
+    def key(self, user_id: int, period: str) -> str:
+        """Ключ счетчиков пользователя за окно, например quota:42:day:20250101"""
+        return f"{self.KEY_PREFIX}:{user_id}:{period}"
+
+    async def try_reserve(self, windows: List[Window], tokens: int) -> Optional[Tuple[int, str]]:
+        """
+        Проверяет квоты и списывает резерв токенов и один запрос
+
+        Args:
+            windows: Окна квоты
+            tokens: Резерв токенов
+
+        Returns:
+            Optional[Tuple[int, str]]: None, если списание прошло, иначе
+            номер исчерпанного окна и что исчерпано (tokens/requests)
+
+        Usage:
+            >>> await storage.try_reserve([("quota:42:day:20250101", 1000, 10, 1735776000)], 300)
+            None
+        """
+        keys = [window[0] for window in windows]
+        args: List[int] = [tokens]
+        for _, token_limit, request_limit, expire_at in windows:
+            args.extend([token_limit, request_limit, expire_at])
+        result = await self.eval(RESERVE_SCRIPT, keys, args)
+        if isinstance(result, bytes):
+            result = result.decode()
+        if not result:
+            return None
+        index, kind = result.split(":")
+        return int(index) - 1, kind
+
+    async def charge(self, keys: List[str], tokens: int) -> None:
+        """
+        Уточняет расход токенов после ответа
+
+        Args:
+            keys: Ключи окон резерва
+            tokens: Разница между фактическим расходом и резервом
+        """
+        await self.eval(CHARGE_SCRIPT, keys, [tokens])
@@ -0,0 +1,114 @@
+from typing import List, Tuple
+
+from .base import BaseRedisStorage
+
+# Корзина: (ключ, емкость, скорость пополнения в единицах/сек)
+Bucket = Tuple[str, float, float]
+
+# Все корзины пополняются по времени Redis и списываются атомарно:
+# либо списание проходит во всех корзинах, либо ни в одной. Возвращает
+# 0, если списание прошло, иначе время ожидания в секундах (строкой -
+# Lua обрезает дробные числа при возврате).
+ACQUIRE_SCRIPT = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+local count = #KEYS
+local levels = {}
+local wait = 0
+
+for i = 1, count do
+    local capacity = tonumber(ARGV[(i - 1) * 3 + 1])
+    local rate = tonumber(ARGV[(i - 1) * 3 + 2])
+    local cost = math.min(tonumber(ARGV[(i - 1) * 3 + 3]), capacity)
+    local state = redis.call('HMGET', KEYS[i], 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+    levels[i] = tokens
+    if tokens < cost then
+        wait = math.max(wait, (cost - tokens) / rate)
+    end
+end
+
+for i = 1, count do
+    local capacity = tonumber(ARGV[(i - 1) * 3 + 1])
+    local rate = tonumber(ARGV[(i - 1) * 3 + 2])
+    local cost = math.min(tonumber(ARGV[(i - 1) * 3 + 3]), capacity)
+    local tokens = levels[i]
+    if wait == 0 then
+        tokens = tokens - cost
+    end
+    redis.call('HSET', KEYS[i], 'tokens', tokens, 'ts', now)
+    redis.call('EXPIRE', KEYS[i], math.ceil(capacity / rate) + 1)
+end
+
+return tostring(wait)
+"""
+
+# Безусловное списание (или возврат при отрицательном amount). Корзина
+# может уйти в минус - тогда следующие запросы ждут, пока долг погасится.
+CHARGE_SCRIPT = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local amount = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+tokens = math.max(-capacity, math.min(capacity, tokens - amount))
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return tostring(tokens)
+"""
+
+
+class RateLimitRedisStorage(BaseRedisStorage):
+    """
+    Redis хранилище корзин токенов (token bucket) для ограничения частоты
+
+    Состояние корзины - хэш с уровнем и временем последнего обновления,
+    пополнение считается по времени Redis, поэтому часы воркеров не
+    важны. Все операции - Lua скрипты, атомарные для всего кластера.
+    """
+
+    KEY_PREFIX = "rate_limit"
+
+    def key(self, name: str) -> str:
+        """Ключ корзины по имени"""
+        return f"{self.KEY_PREFIX}:{name}"
+
+    async def try_acquire(self, buckets: List[Tuple[Bucket, float]]) -> float:
+        """
+        Пытается списать стоимость запроса сразу из нескольких корзин
+
+        Args:
+            buckets: Корзины и стоимость списания из каждой
+
+        Returns:
+            float: 0, если списание прошло, иначе сколько секунд ждать
+
+        Usage:
+            >>> await storage.try_acquire([(("rate_limit:requests", 10, 10), 1)])
+            0.0
+        """
+        keys = [bucket[0] for bucket, _ in buckets]
+        args = []
+        for (_, capacity, rate), cost in buckets:
+            args.extend([capacity, rate, cost])
+        return float(await self.eval(ACQUIRE_SCRIPT, keys, args))
+
+    async def charge(self, bucket: Bucket, amount: float) -> float:
+        """
+        Списывает из корзины (или возвращает в нее) без ожидания
+
+        Args:
+            bucket: Корзина
+            amount: Сколько списать (отрицательное значение - вернуть)
+
+        Returns:
+            float: Уровень корзины после списания
+        """
+        key, capacity, rate = bucket
+        return float(await self.eval(CHARGE_SCRIPT, [key], [capacity, rate, amount]))
@@ -0,0 +1,67 @@
+from typing import Optional
+
+from app.core.settings import settings
+from app.schemas import ChatResponse
+
+from .base import BaseRedisStorage
+
+
+class SemanticCacheRedisStorage(BaseRedisStorage):
+    """
+    Redis хранилище ответов семантического кэша
+
+    Векторы вопросов хранятся в индексе на диске (VectorIndex), здесь -
+    ответы по ключу записи индекса и счетчики попаданий. Ответы общие для
+    всего кластера и живут SEMANTIC_CACHE_TTL.
+    """
+
+    KEY_PREFIX = "semantic_cache"
+    HITS_KEY = "semantic_cache:stats:hits"
+    MISSES_KEY = "semantic_cache:stats:misses"
+
+    def _key(self, key: str) -> str:
+        return f"{self.KEY_PREFIX}:{key}"
+
+    async def get_response(self, key: str) -> Optional[ChatResponse]:
+        """
+        Получает ответ по ключу записи индекса
+
+        Args:
+            key: Ключ записи индекса
+
+        Returns:
+            Optional[ChatResponse]: Ответ или None, если он устарел
+        """
+        cached = await self.get(self._key(key))
+        if not cached:
+            return None
+        return ChatResponse.model_validate_json(cached).model_copy(update={"cached": True})
+
+    async def save_response(self, key: str, response: ChatResponse) -> None:
+        """
+        Сохраняет ответ на вопрос
+
+        Args:
+            key: Ключ записи индекса
+            response: Ответ модели
+        """
+        await self.set(
+            self._key(key), response.model_dump_json(), expires=settings.SEMANTIC_CACHE_TTL
+        )
+
+    async def record_lookup(self, hit: bool) -> None:
+        """Учитывает попадание или промах"""
+        await self.incr(self.HITS_KEY if hit else self.MISSES_KEY)
+
+    async def get_stats(self) -> dict:
+        """
+        Возвращает счетчики попаданий и промахов
+
+        Returns:
+            dict: hits, misses и hit_rate
+        """
+        hits, misses = (
+            int(value or 0) for value in await self.mget([self.HITS_KEY, self.MISSES_KEY])
+        )
+        total = hits + misses
+        return {"hits": hits, "misses": misses, "hit_rate": hits / total if total else 0.0}
@@ -0,0 +1,60 @@
+import json
+from typing import List
+
+from app.schemas import TokenUsageRecord
+
+from .base import BaseRedisStorage
+
+# Забирает из начала списка не больше ARGV[1] записей одной атомарной
+# операцией: запись получает ровно один воркер
+POP_BATCH_SCRIPT = """
+local items = redis.call('LRANGE', KEYS[1], 0, tonumber(ARGV[1]) - 1)
+if #items > 0 then
+    redis.call('LTRIM', KEYS[1], #items, -1)
+end
+return items
+"""
+
+
+class UsageRedisStorage(BaseRedisStorage):
+    """
+    Redis буфер учета расхода токенов
+
+    Вызовы модели добавляются в общий список, фоновая задача (UsageFlusher)
+    забирает их пакетами и записывает в БД. Если БД недоступна, пакет
+    возвращается в буфер и будет записан следующим проходом.
+    """
+
+    BUFFER_KEY = "usage:buffer"
+
+    async def record(self, record: TokenUsageRecord) -> None:
+        """
+        Добавляет вызов модели в буфер
+
+        Args:
+            record: Расход токенов вызовом
+        """
+        await self.rpush(self.BUFFER_KEY, record.model_dump_json())
+
+    async def pop_batch(self, count: int) -> List[TokenUsageRecord]:
+        """
+        Забирает пакет вызовов из буфера
+
+        Args:
+            count: Максимальный размер пакета
+
+        Returns:
+            List[TokenUsageRecord]: Вызовы в порядке добавления
+        """
+        items = await self.eval(POP_BATCH_SCRIPT, [self.BUFFER_KEY], [count])
+        return [TokenUsageRecord.model_validate(json.loads(item)) for item in items]
+
+    async def restore(self, records: List[TokenUsageRecord]) -> None:
+        """
+        Возвращает пакет в буфер (запись в БД не удалась)
+
+        Args:
+            records: Вызовы из pop_batch
+        """
+        if records:
+            await self.rpush(self.BUFFER_KEY, *(record.model_dump_json() for record in records))
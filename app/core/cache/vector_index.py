@@ -0,0 +1,188 @@
+"""
+Индекс векторов вопросов для семантического кэша (NumPy, memory-mapped).
+
+Файл индекса - кольцевой буфер фиксированной емкости:
+
+    заголовок | векторы float32[capacity, dim] | scope uint64[capacity]
+              | created float64[capacity] | key S64[capacity]
+
+Запись добавляется в позицию count % capacity (самая давняя вытесняется),
+индекс растет инкрементально и не перестраивается целиком. Файл отображен
+в память всеми воркерами узла: добавленные одним воркером записи сразу
+видны остальным через общий page cache, а после перезапуска индекс
+читается с диска без пересчета эмбеддингов. Добавление сериализуется
+блокировкой файла <path>.lock (fcntl), где она доступна.
+
+Поиск - полный перебор: скалярное произведение нормированных векторов
+(косинусное сходство) по всем живым записям. Для десятков тысяч записей
+это единицы миллисекунд.
+
+Example:
+    >>> index = VectorIndex("data/semantic_cache.idx", dimension=256, capacity=50000)
+    >>> index.add(vector, scope=42, key="3f2a...")
+    >>> index.search(vector, scope=42, threshold=0.9, max_age=86400)
+    ('3f2a...', 1.0)
+"""
+
+import logging
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: один процесс разработки
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+MAGIC = 0x5345_4D49_4458_3031  # "SEMIDX01"
+HEADER_SIZE = 64
+KEY_SIZE = 64
+
+# Поля заголовка (int64)
+_MAGIC, _DIMENSION, _CAPACITY, _COUNT = range(4)
+
+
+class VectorIndex:
+    """
+    Кольцевой индекс нормированных векторов в файле
+
+    Attributes:
+        path: Путь к файлу индекса
+        dimension: Размерность векторов
+        capacity: Максимальное число записей
+    """
+
+    def __init__(self, path: str, dimension: int, capacity: int) -> None:
+        self.path = Path(path)
+        self.dimension = dimension
+        self.capacity = capacity
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock_path = self.path.with_name(self.path.name + ".lock")
+        with self._locked():
+            # Под блокировкой: воркеры, стартующие одновременно, не должны
+            # создать каждый свой файл
+            if not self._is_compatible():
+                self._create()
+
+        offset = HEADER_SIZE
+        self._header = np.memmap(self.path, dtype=np.int64, mode="r+", shape=(4,))
+        self._vectors = np.memmap(
+            self.path, dtype=np.float32, mode="r+", offset=offset, shape=(capacity, dimension)
+        )
+        offset += self._vectors.nbytes
+        self._scopes = np.memmap(
+            self.path, dtype=np.uint64, mode="r+", offset=offset, shape=(capacity,)
+        )
+        offset += self._scopes.nbytes
+        self._created = np.memmap(
+            self.path, dtype=np.float64, mode="r+", offset=offset, shape=(capacity,)
+        )
+        offset += self._created.nbytes
+        self._keys = np.memmap(
+            self.path, dtype=f"S{KEY_SIZE}", mode="r+", offset=offset, shape=(capacity,)
+        )
+
+    def _file_size(self) -> int:
+        row = self.dimension * 4 + 8 + 8 + KEY_SIZE
+        return HEADER_SIZE + self.capacity * row
+
+    def _is_compatible(self) -> bool:
+        """Файл есть и создан с теми же размерностью и емкостью"""
+        if not self.path.exists() or self.path.stat().st_size != self._file_size():
+            return False
+        header = np.fromfile(self.path, dtype=np.int64, count=4)
+        return (
+            int(header[_MAGIC]) == MAGIC
+            and int(header[_DIMENSION]) == self.dimension
+            and int(header[_CAPACITY]) == self.capacity
+        )
+
+    def _create(self) -> None:
+        """Создает пустой индекс (прежний файл с другими параметрами заменяется)"""
+        logger.info(
+            "Создание индекса семантического кэша %s (%d x %d)",
+            self.path,
+            self.capacity,
+            self.dimension,
+        )
+        tmp_path = self.path.with_name(self.path.name + f".{os.getpid()}.tmp")
+        with open(tmp_path, "wb") as f:
+            f.truncate(self._file_size())
+            f.write(np.array([MAGIC, self.dimension, self.capacity, 0], dtype=np.int64).tobytes())
+        os.replace(tmp_path, self.path)
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        if fcntl is None:
+            yield
+            return
+        with open(self._lock_path, "ab") as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def __len__(self) -> int:
+        return min(int(self._header[_COUNT]), self.capacity)
+
+    def add(self, vector: np.ndarray, scope: int, key: str) -> None:
+        """
+        Добавляет вектор, вытесняя самую давнюю запись при заполнении
+
+        Args:
+            vector: Нормированный вектор длины dimension
+            scope: Область кэша (записи другой области при поиске не видны)
+            key: Ключ ответа (не длиннее 64 байт)
+        """
+        with self._locked():
+            count = int(self._header[_COUNT])
+            slot = count % self.capacity
+            # Пока запись не дописана, поиск ее пропускает (created = 0)
+            self._created[slot] = 0.0
+            self._vectors[slot] = vector
+            self._scopes[slot] = scope
+            self._keys[slot] = key.encode()
+            self._created[slot] = time.time()
+            self._header[_COUNT] = count + 1
+
+    def search(
+        self, vector: np.ndarray, scope: int, threshold: float, max_age: float
+    ) -> Optional[Tuple[str, float]]:
+        """
+        Ищет ближайшую по косинусному сходству запись
+
+        Args:
+            vector: Нормированный вектор запроса
+            scope: Область кэша
+            threshold: Минимальное сходство
+            max_age: Максимальный возраст записи, секунды
+
+        Returns:
+            Optional[Tuple[str, float]]: Ключ и сходство или None
+        """
+        size = len(self)
+        if not size:
+            return None
+
+        scores = self._vectors[:size] @ vector
+        alive = (self._scopes[:size] == scope) & (
+            self._created[:size] >= time.time() - max_age
+        )
+        scores = np.where(alive, scores, -np.inf)
+        best = int(np.argmax(scores))
+        if scores[best] < threshold:
+            return None
+        return self._keys[best].decode(), float(scores[best])
+
+    def flush(self) -> None:
+        """Сбрасывает изменения на диск"""
+        for array in (self._vectors, self._scopes, self._created, self._keys, self._header):
+            array.flush()
@@ -1,22 +1,36 @@
 import logging
 from typing import Any
-from redis import Redis, from_url
+from redis.asyncio import BlockingConnectionPool, Redis
 from app.core.settings import settings
 from .base import BaseClient, BaseContextManager
 
 logger = logging.getLogger(__name__)
 
 class RedisClient(BaseClient):
-    """Клиент для работы с Redis"""
+    """
+    Клиент для работы с Redis
+
+    Создает асинхронный клиент с собственным пулом соединений. В приложении
+    клиент один на процесс (lifespan), хранилища и запросы используют его
+    пул: при занятом пуле команда ждет свободного соединения, а не
+    открывает новое.
+    """
 
     def __init__(self, _settings: Any = settings) -> None:
         super().__init__()
         self._redis_params = _settings.redis_params
 
     async def connect(self) -> Redis:
-        """Создает подключение к Redis"""
+        """Создает пул соединений и проверяет доступность Redis"""
         logger.debug("Подключение к Redis...")
-        self._client = from_url(**self._redis_params)
+        params = dict(self._redis_params)
+        pool = BlockingConnectionPool.from_url(params.pop("url"), **params)
+        self._client = Redis(connection_pool=pool)
+        try:
+            await self._client.ping()
+        except Exception:
+            await self.close()
+            raise
         logger.info("Подключение к Redis установлено")
         return self._client
 
@@ -24,7 +38,8 @@ class RedisClient(BaseClient):
         """Закрывает подключение к Redis"""
         if self._client:
             logger.debug("Закрытие подключения к Redis...")
-            self._client.close()
+            await self._client.aclose()
+            await self._client.connection_pool.disconnect()
             self._client = None
             logger.info("Подключение к Redis закрыто")
 
@@ -2,17 +2,31 @@ import logging
 from typing import Any, Dict
 import json
 import aiohttp
+from app.core.settings import settings
 from .base import BaseClient, BaseContextManager
 
 logger = logging.getLogger(__name__)
 
 class HttpClient(BaseClient):
-    """HTTP клиент"""
+    """
+    HTTP клиент с общим пулом соединений.
+
+    Сессия создается один раз (в lifespan приложения) и переиспользуется
+    всеми запросами: keep-alive соединения и кэш DNS сохраняются между
+    запросами, поэтому TCP/TLS рукопожатие не повторяется на каждый вызов.
+    """
+
+    def __init__(self, _settings: Any = settings) -> None:
+        super().__init__()
+        self._settings = _settings
 
     async def connect(self) -> aiohttp.ClientSession:
-        """Создает HTTP сессию"""
+        """Создает HTTP сессию с пулом соединений"""
         logger.debug("Создание HTTP сессии...")
-        self._client = aiohttp.ClientSession()
+        connector = aiohttp.TCPConnector(**self._settings.http_connector_params)
+        timeout = aiohttp.ClientTimeout(**self._settings.http_timeout_params)
+        self._client = aiohttp.ClientSession(connector=connector, timeout=timeout)
+        logger.info("HTTP сессия создана")
         return self._client
 
     async def close(self) -> None:
@@ -21,6 +35,7 @@ class HttpClient(BaseClient):
             logger.debug("Закрытие HTTP сессии...")
             await self._client.close()
             self._client = None
+            logger.info("HTTP сессия закрыта")
 
 class HttpContextManager(BaseContextManager):
     """Контекстный менеджер для HTTP запросов"""
@@ -0,0 +1,15 @@
+from typing import Optional
+
+from fastapi import Request
+
+from app.core.integrations.yandex_gpt.auth import IAMTokenManager
+
+
+def get_iam_token_manager(request: Request) -> Optional[IAMTokenManager]:
+    """
+    Предоставляет менеджер IAM токена Yandex Cloud.
+
+    Менеджер создается в lifespan при YANDEX_AUTH_TYPE=iam и общий для всех
+    запросов процесса, иначе None (авторизация по API ключу).
+    """
+    return getattr(request.app.state, "iam_token_manager", None)
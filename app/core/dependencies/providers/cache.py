@@ -1,15 +1,22 @@
-from typing import AsyncGenerator
-from fastapi import Depends
-from redis import Redis
+from fastapi import Depends, Request
+from redis.asyncio import Redis
 from app.core.cache.base import BaseRedisStorage
 from app.core.cache.chat import ChatRedisStorage
-from app.core.dependencies.connections.cache import RedisClient
+from app.core.cache.coalescing import CoalescingRedisStorage
+from app.core.cache.completion import CompletionCacheRedisStorage
+from app.core.cache.operations import OperationRedisStorage
+from app.core.cache.quota import QuotaRedisStorage
+from app.core.cache.rate_limit import RateLimitRedisStorage
+from app.core.cache.semantic import SemanticCacheRedisStorage
+from app.core.cache.usage import UsageRedisStorage
 
-async def get_session() -> AsyncGenerator[Redis, None]:
-    client = RedisClient()
-    redis = await client.connect()
-    yield redis
-    await client.close()
+def get_session(request: Request) -> Redis:
+    """
+    Предоставляет клиент Redis процесса.
+
+    Клиент и пул соединений создаются в lifespan и общие для всех запросов.
+    """
+    return request.app.state.redis
 
 def get_redis_storage(redis: Redis = Depends(get_session)) -> BaseRedisStorage:
     """Предоставляет готовое хранилище Redis с соединением."""
@@ -17,4 +24,38 @@ def get_redis_storage(redis: Redis = Depends(get_session)) -> BaseRedisStorage:
 
 def get_chat_redis_storage(redis: Redis = Depends(get_session)) -> ChatRedisStorage:
     """Предоставляет хранилище Redis для чата с соединением."""
-    return ChatRedisStorage(redis)
\ No newline at end of file
+    return ChatRedisStorage(redis)
+
+def get_operation_redis_storage(redis: Redis = Depends(get_session)) -> OperationRedisStorage:
+    """Предоставляет хранилище Redis для отложенных операций с соединением."""
+    return OperationRedisStorage(redis)
+
+
+def get_completion_cache_storage(redis: Redis = Depends(get_session)) -> CompletionCacheRedisStorage:
+    """Предоставляет Redis кэш ответов модели с соединением."""
+    return CompletionCacheRedisStorage(redis)
+
+
+def get_coalescing_storage(redis: Redis = Depends(get_session)) -> CoalescingRedisStorage:
+    """Предоставляет хранилище Redis для объединения одинаковых запросов."""
+    return CoalescingRedisStorage(redis)
+
+
+def get_rate_limit_storage(redis: Redis = Depends(get_session)) -> RateLimitRedisStorage:
+    """Предоставляет хранилище Redis для ограничения частоты запросов к AI."""
+    return RateLimitRedisStorage(redis)
+
+
+def get_semantic_cache_storage(redis: Redis = Depends(get_session)) -> SemanticCacheRedisStorage:
+    """Предоставляет Redis хранилище ответов семантического кэша."""
+    return SemanticCacheRedisStorage(redis)
+
+
+def get_usage_storage(redis: Redis = Depends(get_session)) -> UsageRedisStorage:
+    """Предоставляет Redis буфер учета расхода токенов."""
+    return UsageRedisStorage(redis)
+
+
+def get_quota_storage(redis: Redis = Depends(get_session)) -> QuotaRedisStorage:
+    """Предоставляет Redis хранилище квот пользователей."""
+    return QuotaRedisStorage(redis)
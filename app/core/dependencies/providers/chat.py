@@ -0,0 +1,61 @@
+from typing import Optional
+
+import aiohttp
+from fastapi import Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache.chat import ChatRedisStorage
+from app.core.cache.coalescing import CoalescingRedisStorage
+from app.core.cache.completion import CompletionCacheRedisStorage
+from app.core.cache.operations import OperationRedisStorage
+from app.core.cache.quota import QuotaRedisStorage
+from app.core.cache.rate_limit import RateLimitRedisStorage
+from app.core.cache.semantic import SemanticCacheRedisStorage
+from app.core.cache.usage import UsageRedisStorage
+from app.core.dependencies.providers.auth import get_iam_token_manager
+from app.core.dependencies.providers.cache import (get_chat_redis_storage,
+                                                   get_coalescing_storage,
+                                                   get_completion_cache_storage,
+                                                   get_operation_redis_storage,
+                                                   get_quota_storage,
+                                                   get_rate_limit_storage,
+                                                   get_semantic_cache_storage,
+                                                   get_usage_storage)
+from app.core.dependencies.providers.database import get_session
+from app.core.dependencies.providers.http import get_session as get_http_session
+from app.core.integrations.yandex_gpt.auth import IAMTokenManager
+from app.services import ChatService
+
+
+def get_chat_service(
+    db_session: AsyncSession = Depends(get_session),
+    chat_redis_storage: ChatRedisStorage = Depends(get_chat_redis_storage),
+    operation_storage: OperationRedisStorage = Depends(get_operation_redis_storage),
+    completion_cache: CompletionCacheRedisStorage = Depends(get_completion_cache_storage),
+    coalescing_storage: CoalescingRedisStorage = Depends(get_coalescing_storage),
+    http_session: aiohttp.ClientSession = Depends(get_http_session),
+    iam_token_manager: Optional[IAMTokenManager] = Depends(get_iam_token_manager),
+    rate_limit_storage: RateLimitRedisStorage = Depends(get_rate_limit_storage),
+    semantic_cache_storage: SemanticCacheRedisStorage = Depends(get_semantic_cache_storage),
+    usage_storage: UsageRedisStorage = Depends(get_usage_storage),
+    quota_storage: QuotaRedisStorage = Depends(get_quota_storage),
+) -> ChatService:
+    """
+    Предоставляет сервис чата со всеми зависимостями.
+
+    Клиент Redis (пул соединений), HTTP сессия и менеджер IAM токена
+    общие для процесса (создаются в lifespan).
+    """
+    return ChatService(
+        db_session,
+        chat_redis_storage,
+        http_session,
+        operation_storage=operation_storage,
+        completion_cache=completion_cache,
+        coalescing_storage=coalescing_storage,
+        iam_token_manager=iam_token_manager,
+        rate_limit_storage=rate_limit_storage,
+        semantic_cache_storage=semantic_cache_storage,
+        usage_storage=usage_storage,
+        quota_storage=quota_storage,
+    )
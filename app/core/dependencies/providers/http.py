@@ -1,8 +1,12 @@
-from typing import AsyncGenerator
-from app.core.dependencies.connections.http import HttpClient
+import aiohttp
+from fastapi import Request
 
-async def get_session() -> AsyncGenerator[HttpClient, None]:
-    client = HttpClient()
-    await client.connect()
-    yield client
-    await client.close()
+
+def get_session(request: Request) -> aiohttp.ClientSession:
+    """
+    Предоставляет общую HTTP сессию приложения.
+
+    Сессия создается в lifespan и живет все время работы приложения,
+    поэтому соединения к внешним API переиспользуются между запросами.
+    """
+    return request.app.state.http_session
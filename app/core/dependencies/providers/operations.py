@@ -0,0 +1,12 @@
+from fastapi import Request
+
+from app.core.integrations.yandex_gpt.operations import OperationPoller
+
+
+def get_operation_poller(request: Request) -> OperationPoller:
+    """
+    Предоставляет фоновый поллер отложенных операций.
+
+    Поллер создается в lifespan и общий для всех запросов процесса.
+    """
+    return request.app.state.operation_poller
@@ -0,0 +1,12 @@
+from fastapi import Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.dependencies.providers.database import get_session
+from app.services.v1.usage import UsageService
+
+
+def get_usage_service(db_session: AsyncSession = Depends(get_session)) -> UsageService:
+    """
+    Предоставляет сервис отчетов о расходе токенов.
+    """
+    return UsageService(db_session)
@@ -12,7 +12,10 @@ from .v1.base import BaseAPIException, DatabaseError, ValueNotFoundError
 from .v1.security import (TokenExpiredError, TokenInvalidError,
                                TokenMissingError)
 from .v1.auth import AuthenticationError, InvalidCredentialsError
-from .v1.chat import ChatAuthError, ChatCompletionError
+from .v1.chat import (ChatAuthError, ChatBatchTooLargeError, ChatCompletionError,
+                      ChatDeadlineExceededError, ChatOperationNotFoundError,
+                      ChatQuotaExceededError, ChatRateLimitError,
+                      ChatUpstreamUnavailableError)
 __all__ = [
     "BaseAPIException",
     "DatabaseError",
@@ -23,5 +26,11 @@ __all__ = [
     "AuthenticationError",
     "InvalidCredentialsError",
     "ChatAuthError",
-    "ChatCompletionError"
+    "ChatBatchTooLargeError",
+    "ChatCompletionError",
+    "ChatDeadlineExceededError",
+    "ChatOperationNotFoundError",
+    "ChatQuotaExceededError",
+    "ChatRateLimitError",
+    "ChatUpstreamUnavailableError",
 ]
@@ -1,3 +1,5 @@
+from typing import Optional
+
 from app.core.exceptions.v1.base import BaseAPIException
 
 
@@ -20,6 +22,84 @@ class ChatCompletionError(ChatError):
         )
 
 
+class ChatUpstreamUnavailableError(ChatError):
+    """
+    Upstream AI временно недоступен: исчерпаны повторы или разомкнут
+    circuit breaker. История чата при этой ошибке не сбрасывается.
+    """
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(
+            message=f"AI сервис временно недоступен: {message}",
+            error_type="ai_upstream_unavailable",
+            status_code=503,
+            extra={"retry_after": retry_after} if retry_after is not None else None,
+        )
+        self.retry_after = retry_after
+
+
+class ChatRateLimitError(ChatError):
+    """
+    Превышено время ожидания квоты Yandex API (ограничитель частоты
+    запросов кластера). Запрос к модели не отправлялся.
+    """
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(
+            message=f"Превышен лимит запросов к AI: {message}",
+            error_type="ai_rate_limited",
+            status_code=429,
+            extra={"retry_after": retry_after} if retry_after is not None else None,
+        )
+        self.retry_after = retry_after
+
+
+class ChatQuotaExceededError(ChatError):
+    """
+    Исчерпана квота пользователя (токены или запросы за день/месяц).
+    Запрос к модели не отправлялся, история не сбрасывается.
+    """
+
+    def __init__(self, period: str, kind: str, limit: int, retry_after: Optional[float] = None):
+        super().__init__(
+            message=(
+                f"Исчерпана квота пользователя: {'токены' if kind == 'tokens' else 'запросы'} "
+                f"за {'день' if period == 'day' else 'месяц'} (лимит {limit})"
+            ),
+            error_type="ai_quota_exceeded",
+            status_code=429,
+            extra={
+                "period": period,
+                "limit_type": kind,
+                "limit": limit,
+                "retry_after": retry_after,
+            },
+        )
+        self.period = period
+        self.kind = kind
+        self.limit = limit
+        self.retry_after = retry_after
+
+
+class ChatDeadlineExceededError(ChatError):
+    """
+    Модель не ответила за YANDEX_FALLBACK_DEADLINE: вызов отменен.
+    Сервис повторяет запрос на более легкой модели, наружу ошибка
+    попадает, только если не уложилась и она. История не сбрасывается.
+    """
+
+    def __init__(self, model: str, deadline: float, fallback_model: Optional[str] = None):
+        super().__init__(
+            message=f"Модель {model} не ответила за {deadline:g} с",
+            error_type="ai_deadline_exceeded",
+            status_code=504,
+            extra={"model": model, "deadline": deadline},
+        )
+        self.model = model
+        self.deadline = deadline
+        self.fallback_model = fallback_model
+
+
 class ChatConfigError(ChatError):
     def __init__(self, message: str, extra: dict = None):
         super().__init__(
@@ -33,3 +113,23 @@ class ChatConfigError(ChatError):
 class ChatAuthError(ChatError):
     def __init__(self, message: str = "Ошибка авторизации в API"):
         super().__init__(message=message, error_type="ai_auth_error", status_code=401)
+
+
+class ChatOperationNotFoundError(ChatError):
+    def __init__(self, operation_id: str):
+        super().__init__(
+            message=f"Операция {operation_id} не найдена или устарела",
+            error_type="ai_operation_not_found",
+            status_code=404,
+            extra={"operation_id": operation_id},
+        )
+
+
+class ChatBatchTooLargeError(ChatError):
+    def __init__(self, size: int, max_size: int):
+        super().__init__(
+            message=f"Слишком много запросов в пакете: {size} (максимум {max_size})",
+            error_type="ai_batch_too_large",
+            status_code=413,
+            extra={"size": size, "max_size": max_size},
+        )
@@ -1,13 +1,23 @@
 import json
 import logging
-from typing import Any, Dict, Optional
+from typing import Any, AsyncIterator, Dict, Optional
 
 import aiohttp
 
 
 class BaseHttpClient:
-    def __init__(self) -> None:
-        self._session: Optional[aiohttp.ClientSession] = None
+    """
+    Базовый HTTP клиент для внешних API.
+
+    Если при создании передана общая сессия (из lifespan приложения),
+    клиент только использует ее и никогда не закрывает: пул соединений
+    принадлежит приложению. Без переданной сессии клиент создает
+    собственную и закрывает ее после каждого запроса, как раньше.
+    """
+
+    def __init__(self, session: Optional[aiohttp.ClientSession] = None) -> None:
+        self._session: Optional[aiohttp.ClientSession] = session
+        self._owns_session = session is None
         self.logger = logging.getLogger(self.__class__.__name__)
 
     async def __aenter__(self) -> "BaseHttpClient":
@@ -17,7 +27,7 @@ class BaseHttpClient:
         await self.close()
 
     async def close(self) -> None:
-        if self._session:
+        if self._session and self._owns_session:
             await self._session.close()
             self._session = None
             self.logger.debug("Сессия закрыта")
@@ -27,6 +37,24 @@ class BaseHttpClient:
             self._session = aiohttp.ClientSession()
         return self._session
 
+    @staticmethod
+    async def _raise_for_status(resp: aiohttp.ClientResponse) -> None:
+        """
+        Выбрасывает ClientResponseError для ответов с кодом 4xx/5xx
+
+        В отличие от resp.raise_for_status() сохраняет тело ответа в message
+        и заголовки (в т.ч. Retry-After) для классификации ошибки.
+        """
+        if resp.status >= 400:
+            body = await resp.text()
+            raise aiohttp.ClientResponseError(
+                resp.request_info,
+                resp.history,
+                status=resp.status,
+                message=body or (resp.reason or ""),
+                headers=resp.headers,
+            )
+
     async def get(
         self,
         url: str,
@@ -37,6 +65,7 @@ class BaseHttpClient:
             session = await self._get_session()
             self.logger.debug("GET запрос к %s", url)
             async with session.get(url, headers=headers, params=params) as resp:
+                await self._raise_for_status(resp)
                 return await resp.json()
         finally:
             await self.close()
@@ -46,15 +75,32 @@ class BaseHttpClient:
         url: str,
         data: Optional[Dict[str, Any]] = None,
         headers: Optional[Dict[str, Any]] = None,
+        body: Optional[bytes] = None,
     ) -> Dict[str, Any]:
+        """
+        POST запрос с JSON ответом.
+
+        Args:
+            url: Адрес запроса
+            data: Тело запроса (JSON или форма по Content-Type)
+            headers: Заголовки запроса
+            body: Готовое JSON тело в байтах - отправляется как есть, без
+                повторной сериализации (data при этом не используется)
+        """
         try:
-            self.logger.debug("POST request body: %s", json.dumps(data, indent=2))
+            session = await self._get_session()
+            if body is not None:
+                self.logger.debug("POST запрос к %s (%d байт)", url, len(body))
+                async with session.post(url, data=body, headers=headers) as resp:
+                    await self._raise_for_status(resp)
+                    return await resp.json()
+
             if data:
                 # Фильтруем None значения из параметров
                 data = {k: v for k, v in data.items() if v is not None}
 
-            session = await self._get_session()
-            self.logger.debug("POST запрос к %s с данными %s", url, data)
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug("POST запрос к %s с данными %s", url, json.dumps(data, indent=2))
             # Проверяем Content-Type
             if (
                 headers
@@ -62,10 +108,52 @@ class BaseHttpClient:
             ):
                 # Для OAuth используем data как есть
                 async with session.post(url, data=data, headers=headers) as resp:
+                    await self._raise_for_status(resp)
                     return await resp.json()
             else:
                 # Для остальных запросов используем json
                 async with session.post(url, json=data, headers=headers) as resp:
+                    await self._raise_for_status(resp)
                     return await resp.json()
         finally:
             await self.close()
+
+    async def post_stream(
+        self,
+        url: str,
+        data: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, Any]] = None,
+        body: Optional[bytes] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        POST запрос с потоковым ответом.
+
+        Ответ читается построчно по мере поступления: каждая непустая строка
+        тела - отдельный JSON объект (newline-delimited JSON).
+
+        Args:
+            url: Адрес запроса
+            data: Тело запроса в виде словаря
+            headers: Заголовки запроса
+            body: Готовое JSON тело в байтах (вместо data)
+
+        Yields:
+            Dict[str, Any]: Очередной JSON объект из потока
+        """
+        try:
+            if body is None and data:
+                # Фильтруем None значения из параметров
+                data = {k: v for k, v in data.items() if v is not None}
+
+            session = await self._get_session()
+            self.logger.debug("POST (stream) запрос к %s", url)
+            payload = {"data": body} if body is not None else {"json": data}
+            async with session.post(url, headers=headers, **payload) as resp:
+                await self._raise_for_status(resp)
+                async for line in resp.content:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    yield json.loads(line)
+        finally:
+            await self.close()
@@ -0,0 +1,121 @@
+"""
+Объединение одинаковых одновременных запросов к upstream (single-flight).
+
+Если несколько клиентов одновременно отправляют одинаковый запрос,
+к модели уходит только один вызов, остальные получают его результат.
+В пределах процесса запросы объединяются через общий asyncio.Task,
+между воркерами - через короткую блокировку в Redis с публикацией результата.
+"""
+
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Generic, Optional, TypeVar
+
+from app.core.cache.coalescing import CoalescingRedisStorage
+from app.core.settings import settings
+from app.schemas import ChatResponse
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class SingleFlight(Generic[T]):
+    """
+    Объединение одинаковых вызовов в пределах процесса
+
+    Вызов выполняется в отдельной задаче, поэтому отмена запроса того
+    клиента, который его инициировал, не отменяет его для остальных.
+
+    Attributes:
+        calls: Количество выполненных вызовов
+        coalesced: Количество запросов, получивших результат чужого вызова
+    """
+
+    def __init__(self) -> None:
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, func: Callable[[], Awaitable[T]]) -> T:
+        """
+        Выполняет вызов или присоединяется к уже выполняющемуся
+
+        Args:
+            key: Ключ вызова (хэш запроса)
+            func: Фабрика корутины вызова
+
+        Returns:
+            T: Результат вызова
+        """
+        task = self._tasks.get(key)
+        if task is None:
+            self.calls += 1
+            task = asyncio.ensure_future(func())
+            self._tasks[key] = task
+            task.add_done_callback(lambda done, key=key: self._forget(key, done))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        # Помечаем исключение полученным, даже если все ожидающие отменены
+        if not task.cancelled():
+            task.exception()
+
+
+_completion_flights: SingleFlight[ChatResponse] = SingleFlight()
+
+
+class CompletionCoalescer:
+    """
+    Объединение одинаковых запросов к модели
+
+    Attributes:
+        storage: Redis хранилище для объединения между воркерами
+            (если None - только в пределах процесса)
+    """
+
+    def __init__(self, storage: Optional[CoalescingRedisStorage] = None) -> None:
+        self.storage = storage
+
+    async def run(
+        self, key: str, func: Callable[[], Awaitable[ChatResponse]]
+    ) -> ChatResponse:
+        """
+        Выполняет запрос к модели, объединяя его с одинаковыми одновременными
+
+        Args:
+            key: Хэш запроса (ChatRequest.fingerprint)
+            func: Фабрика корутины запроса к модели
+
+        Returns:
+            ChatResponse: Ответ модели
+        """
+        if not settings.COALESCING_ENABLED:
+            return await func()
+        return await _completion_flights.do(key, lambda: self._run_distributed(key, func))
+
+    async def _run_distributed(
+        self, key: str, func: Callable[[], Awaitable[ChatResponse]]
+    ) -> ChatResponse:
+        if self.storage is None or not settings.COALESCING_DISTRIBUTED:
+            return await func()
+
+        token = await self.storage.acquire(key)
+        if token is None:
+            result = await self.storage.wait_result(key)
+            if result is not None:
+                logger.debug("Результат запроса %s получен от другого воркера", key)
+                return ChatResponse.model_validate_json(result)
+            # Владелец не получил результат - выполняем запрос сами
+            return await func()
+
+        try:
+            response = await func()
+            await self.storage.publish(key, response.model_dump_json())
+            return response
+        finally:
+            await self.storage.release(key, token)
@@ -0,0 +1,138 @@
+"""
+Векторные представления (эмбеддинги) текста для семантического кэша.
+
+Эмбеддер переводит текст в L2-нормированный вектор float32, поэтому
+косинусное сходство двух текстов - скалярное произведение векторов.
+
+Реализации:
+- HashingEmbedder - локальный, без запросов к API: хэширование слов и
+  символьных триграмм (feature hashing). Ловит перефразирование с теми же
+  словами и опечатки, но не синонимы;
+- YandexEmbedder - Yandex text embedding API (модель text-search-query),
+  понимает смысл, но стоит запроса к API на каждый вопрос.
+
+Свой эмбеддер - подкласс BaseEmbedder с методом embed.
+
+Example:
+    >>> embedder = HashingEmbedder(dimension=256)
+    >>> vector = await embedder.embed("Как развернуть список в Python?")
+    >>> vector.shape
+    (256,)
+"""
+
+import re
+import zlib
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+from app.core.settings import settings
+
+from .yandex_gpt.text import ChatHttpClient
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def normalize(vector: np.ndarray) -> np.ndarray:
+    """L2-нормирует вектор (нулевой вектор возвращается как есть)"""
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm else vector
+
+
+class BaseEmbedder(ABC):
+    """
+    Базовый эмбеддер
+
+    Attributes:
+        dimension: Размерность векторов
+    """
+
+    def __init__(self, dimension: int) -> None:
+        self.dimension = dimension
+
+    @abstractmethod
+    async def embed(self, text: str) -> np.ndarray:
+        """
+        Векторное представление текста
+
+        Args:
+            text: Текст
+
+        Returns:
+            np.ndarray: L2-нормированный вектор float32 длины dimension
+        """
+        pass
+
+
+class HashingEmbedder(BaseEmbedder):
+    """
+    Локальный эмбеддер на хэшировании признаков
+
+    Признаки - слова в нижнем регистре и символьные триграммы слов.
+    Используется crc32, а не hash(): векторы должны совпадать во всех
+    воркерах и после перезапуска (индекс хранится в файле).
+    """
+
+    WORD_WEIGHT = 1.0
+    TRIGRAM_WEIGHT = 0.5
+
+    def _features(self, text: str):
+        for word in _WORD_RE.findall(text.lower()):
+            yield word, self.WORD_WEIGHT
+            padded = f"#{word}#"
+            for i in range(len(padded) - 2):
+                yield padded[i:i + 3], self.TRIGRAM_WEIGHT
+
+    async def embed(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for feature, weight in self._features(text):
+            digest = zlib.crc32(feature.encode())
+            # Старший бит хэша - знак: коллизии признаков взаимно гасятся
+            sign = -1.0 if digest & 0x80000000 else 1.0
+            vector[digest % self.dimension] += sign * weight
+        return normalize(vector)
+
+
+class YandexEmbedder(BaseEmbedder):
+    """
+    Эмбеддер на Yandex text embedding API
+
+    Attributes:
+        http_client: Клиент Yandex API (авторизация, повторы, circuit breaker)
+        model_uri: URI модели эмбеддингов
+    """
+
+    def __init__(self, http_client: ChatHttpClient, dimension: int) -> None:
+        super().__init__(dimension)
+        self.http_client = http_client
+        self.model_uri = (
+            f"emb://{settings.YANDEX_FOLDER_ID.get_secret_value()}"
+            f"/{settings.YANDEX_EMBEDDING_MODEL}/latest"
+        )
+
+    async def embed(self, text: str) -> np.ndarray:
+        vector = np.asarray(
+            await self.http_client.get_embedding(text, self.model_uri), dtype=np.float32
+        )
+        if vector.shape != (self.dimension,):
+            raise ValueError(
+                f"Размерность эмбеддинга {vector.shape[0]}, "
+                f"а SEMANTIC_CACHE_DIMENSION={self.dimension}"
+            )
+        return normalize(vector)
+
+
+def create_embedder(http_client: ChatHttpClient) -> BaseEmbedder:
+    """
+    Создает эмбеддер по SEMANTIC_CACHE_EMBEDDER
+
+    Args:
+        http_client: Клиент Yandex API (для эмбеддера yandex)
+
+    Returns:
+        BaseEmbedder: Эмбеддер
+    """
+    if settings.SEMANTIC_CACHE_EMBEDDER == "yandex":
+        return YandexEmbedder(http_client, settings.SEMANTIC_CACHE_DIMENSION)
+    return HashingEmbedder(settings.SEMANTIC_CACHE_DIMENSION)
@@ -0,0 +1,291 @@
+"""
+Хеджирование запросов к модели для снижения хвостовых задержек.
+
+Задержка Yandex completion имеет длинный хвост: небольшая доля вызовов
+идет в разы дольше медианы. Если основной вызов не ответил (или не прислал
+первый фрагмент потока) за заданный перцентиль недавних задержек,
+отправляется второй такой же вызов; используется тот, что завершится
+первым, второй отменяется.
+
+Дубли ограничены бюджетом: каждый запрос пополняет его на max_rate, дубль
+тратит единицу, поэтому дублей не больше max_rate от числа запросов (плюс
+небольшой запас burst). Пока замеров задержки меньше min_samples,
+хеджирование не включается.
+
+Хеджируется одна попытка внутри call_with_resilience: ожидание между
+повторами (Retry-After, backoff) не считается задержкой и дублей не
+вызывает. Дубль - отдельный запрос к upstream, ограничитель частоты
+(RateLimiter) его не учитывает.
+
+Example:
+    >>> hedger = get_hedger("completion:yandexgpt-lite")
+    >>> result = await call_with_resilience("completion", lambda: hedger.call(func))
+"""
+
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from typing import (Any, Awaitable, Callable, Deque, Dict, List, Optional,
+                    TypeVar)
+
+from app.core.settings import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class LatencyTracker:
+    """
+    Скользящее окно задержек успешных вызовов
+
+    Отмененный проигравший вызов хеджа дает замер, равный прошедшему
+    времени (оценка снизу): без него в окно попадали бы только быстрые
+    победители и перцентиль занижался бы.
+
+    Перцентиль пересчитывается не на каждый вызов, а после накопления
+    заметного числа новых замеров.
+
+    Attributes:
+        samples: Последние замеры задержки, секунды
+    """
+
+    def __init__(self, window: int = 500) -> None:
+        self.samples: Deque[float] = deque(maxlen=window)
+        self._sorted: List[float] = []
+        self._stale = 0
+        self._recompute_every = max(1, window // 50)
+
+    def __len__(self) -> int:
+        return len(self.samples)
+
+    def add(self, latency: float) -> None:
+        """Добавляет замер задержки"""
+        self.samples.append(latency)
+        self._stale += 1
+
+    def percentile(self, p: float) -> Optional[float]:
+        """
+        Перцентиль задержки по окну
+
+        Args:
+            p: Перцентиль от 0 до 100
+
+        Returns:
+            Optional[float]: Задержка в секундах или None, если замеров нет
+        """
+        if not self.samples:
+            return None
+        if self._stale >= self._recompute_every or len(self._sorted) != len(self.samples):
+            self._sorted = sorted(self.samples)
+            self._stale = 0
+        index = min(len(self._sorted) - 1, max(0, math.ceil(p / 100 * len(self._sorted)) - 1))
+        return self._sorted[index]
+
+
+class HedgeBudget:
+    """
+    Бюджет дублей: не больше max_rate дублей на запрос
+
+    Attributes:
+        max_rate: Пополнение бюджета за каждый запрос
+        burst: Максимальный запас бюджета
+        tokens: Текущий запас
+    """
+
+    def __init__(self, max_rate: float, burst: int) -> None:
+        self.max_rate = max_rate
+        self.burst = max(1, burst)
+        self.tokens = 0.0
+
+    def deposit(self) -> None:
+        """Пополняет бюджет за очередной запрос"""
+        self.tokens = min(self.burst, self.tokens + self.max_rate)
+
+    def withdraw(self) -> bool:
+        """Списывает один дубль, если бюджет позволяет"""
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class Hedger:
+    """
+    Хеджирование вызовов одного эндпоинта (модели)
+
+    Attributes:
+        name: Имя эндпоинта
+        percentile: Перцентиль задержки, после которого отправляется дубль
+        min_delay: Минимальная задержка перед дублем, секунды
+        min_samples: Сколько замеров нужно, чтобы начать хеджировать
+        tracker: Окно задержек успешных вызовов
+        budget: Бюджет дублей
+    """
+
+    def __init__(
+        self,
+        name: str,
+        percentile: float = 95.0,
+        min_delay: float = 0.1,
+        max_rate: float = 0.05,
+        burst: int = 10,
+        window: int = 500,
+        min_samples: int = 20,
+    ) -> None:
+        self.name = name
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self.tracker = LatencyTracker(window)
+        self.budget = HedgeBudget(max_rate, burst)
+
+        self.total_requests = 0
+        self.total_hedged = 0
+        self.total_hedge_wins = 0
+        self.total_budget_exhausted = 0
+
+    def delay(self) -> Optional[float]:
+        """
+        Через сколько секунд без ответа отправлять дубль
+
+        Returns:
+            Optional[float]: Задержка или None, если замеров пока мало
+        """
+        if len(self.tracker) < self.min_samples:
+            return None
+        return max(self.min_delay, self.tracker.percentile(self.percentile))
+
+    async def _timed(self, func: Callable[[], Awaitable[T]]) -> T:
+        started = time.monotonic()
+        result = await func()
+        self.tracker.add(time.monotonic() - started)
+        return result
+
+    async def call(
+        self,
+        func: Callable[[], Awaitable[T]],
+        cleanup: Optional[Callable[[T], Awaitable[Any]]] = None,
+    ) -> T:
+        """
+        Выполняет вызов, при задержке дублируя его
+
+        Ошибка основного вызова до отправки дубля пробрасывается сразу
+        (повторы - забота call_with_resilience). После отправки дубля
+        ошибка одного из вызовов не важна, пока второй может ответить.
+
+        Args:
+            func: Фабрика корутины вызова
+            cleanup: Освобождение результата проигравшего вызова, если он
+                тоже успел завершиться (например, закрытие потока)
+
+        Returns:
+            T: Результат вызова, завершившегося первым
+
+        Raises:
+            Exception: Ошибка вызова, если не удались все отправленные вызовы
+        """
+        self.total_requests += 1
+        delay = self.delay() if settings.YANDEX_HEDGING_ENABLED else None
+        if delay is None:
+            return await self._timed(func)
+
+        self.budget.deposit()
+        primary = asyncio.ensure_future(self._timed(func))
+        tasks = [primary]
+        started = {primary: time.monotonic()}
+        winner: Optional["asyncio.Future[T]"] = None
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if done or not self.budget.withdraw():
+                if not done:
+                    self.total_budget_exhausted += 1
+                winner = primary
+                return await primary
+
+            self.total_hedged += 1
+            logger.debug("%s: нет ответа за %.3f с, отправлен дубль", self.name, delay)
+            tasks.append(asyncio.ensure_future(self._timed(func)))
+            started[tasks[-1]] = time.monotonic()
+
+            pending = set(tasks)
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        winner = task
+                        if task is not primary:
+                            self.total_hedge_wins += 1
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            losers = [task for task in tasks if task is not winner]
+            if winner is not None:
+                # Проигравшие шли не меньше прошедшего времени
+                now = time.monotonic()
+                for task in losers:
+                    if not task.done():
+                        self.tracker.add(now - started[task])
+            await self._discard(losers, cleanup)
+
+    @staticmethod
+    async def _discard(
+        tasks: List["asyncio.Future[T]"],
+        cleanup: Optional[Callable[[T], Awaitable[Any]]],
+    ) -> None:
+        """Отменяет проигравшие вызовы и освобождает успевшие результаты"""
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if cleanup is None:
+            return
+        for task in tasks:
+            if not task.cancelled() and task.exception() is None:
+                try:
+                    await cleanup(task.result())
+                except Exception as e:
+                    logger.warning("Не удалось освободить результат дубля: %s", str(e))
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Состояние для мониторинга"""
+        delay = self.delay()
+        return {
+            "name": self.name,
+            "samples": len(self.tracker),
+            "delay": round(delay, 3) if delay is not None else None,
+            "requests": self.total_requests,
+            "hedged": self.total_hedged,
+            "hedge_wins": self.total_hedge_wins,
+            "budget_exhausted": self.total_budget_exhausted,
+        }
+
+
+_hedgers: Dict[str, Hedger] = {}
+
+
+def get_hedger(name: str) -> Hedger:
+    """
+    Возвращает хеджер эндпоинта (один на процесс)
+
+    Args:
+        name: Имя эндпоинта, для моделей - completion:<модель>
+
+    Returns:
+        Hedger: Хеджер эндпоинта
+    """
+    if name not in _hedgers:
+        _hedgers[name] = Hedger(name, **settings.hedging_params)
+    return _hedgers[name]
+
+
+def get_hedgers_state() -> List[Dict[str, Any]]:
+    """
+    Возвращает состояние всех хеджеров процесса для мониторинга
+    """
+    return [hedger.snapshot() for hedger in _hedgers.values()]
@@ -0,0 +1,123 @@
+"""
+Квоты пользователей на токены и запросы.
+
+Один клиент не должен выбрать квоту каталога Yandex Cloud за всех,
+поэтому у каждого пользователя есть бюджет токенов и запросов на
+календарный день и месяц (UTC). Проверка всех окон и списание - один
+Lua скрипт в Redis (O(1), без обращения к БД). Под запрос резервируется
+оценка токенов с максимумом ответа: пока запрос выполняется, бюджет не
+может быть превышен параллельными запросами. После ответа резерв
+уточняется по Usage, при ошибке вызова токены возвращаются (запрос
+остается учтенным).
+
+Example:
+    >>> quota = UserQuota(storage)
+    >>> async with quota.reserve(user_id=42, tokens=2350) as reservation:
+    ...     response = await call_model(request)
+    ...     reservation.used = int(response.result.usage.totalTokens)
+"""
+
+import logging
+from calendar import monthrange
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, List, Optional
+
+from app.core.cache.quota import QuotaRedisStorage, Window
+from app.core.exceptions import ChatQuotaExceededError
+from app.core.integrations.rate_limit import Reservation
+from app.core.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class UserQuota:
+    """
+    Квоты пользователей на день и месяц
+
+    Attributes:
+        storage: Redis хранилище квот (если None - квоты выключены)
+    """
+
+    PERIODS = ("day", "month")
+
+    def __init__(self, storage: Optional[QuotaRedisStorage] = None) -> None:
+        self.storage = storage
+
+    @property
+    def enabled(self) -> bool:
+        """Квоты включены и есть хранилище"""
+        return settings.USER_QUOTA_ENABLED and self.storage is not None
+
+    def _windows(self, user_id: int, now: datetime) -> List[Window]:
+        """Окна квоты пользователя на момент now (UTC)"""
+        day_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        day_end = day_start + timedelta(days=1)
+        month_end = day_start.replace(day=1) + timedelta(
+            days=monthrange(now.year, now.month)[1]
+        )
+        return [
+            (
+                self.storage.key(user_id, f"day:{now:%Y%m%d}"),
+                settings.USER_QUOTA_DAILY_TOKENS,
+                settings.USER_QUOTA_DAILY_REQUESTS,
+                int(day_end.timestamp()),
+            ),
+            (
+                self.storage.key(user_id, f"month:{now:%Y%m}"),
+                settings.USER_QUOTA_MONTHLY_TOKENS,
+                settings.USER_QUOTA_MONTHLY_REQUESTS,
+                int(month_end.timestamp()),
+            ),
+        ]
+
+    @asynccontextmanager
+    async def reserve(self, user_id: int, tokens: int) -> AsyncIterator[Reservation]:
+        """
+        Резервирует квоту пользователя под запрос и уточняет ее после ответа
+
+        Если used не задан (вызов не удался), резерв токенов возвращается.
+        Ответ из кэша стоит 0 токенов.
+
+        Args:
+            user_id: Идентификатор пользователя
+            tokens: Оценка токенов запроса вместе с максимумом ответа
+
+        Yields:
+            Reservation: Резерв, в который нужно записать used по Usage
+
+        Raises:
+            ChatQuotaExceededError: Если квота за день или месяц исчерпана
+        """
+        reservation = Reservation(reserved=tokens)
+        if not self.enabled:
+            yield reservation
+            return
+
+        now = datetime.now(timezone.utc)
+        windows = self._windows(user_id, now)
+        exhausted = await self.storage.try_reserve(windows, tokens)
+        if exhausted is not None:
+            index, kind = exhausted
+            _, token_limit, request_limit, expire_at = windows[index]
+            logger.info(
+                "Квота пользователя %s исчерпана: %s за %s", user_id, kind, self.PERIODS[index]
+            )
+            raise ChatQuotaExceededError(
+                self.PERIODS[index],
+                kind,
+                token_limit if kind == "tokens" else request_limit,
+                retry_after=round(expire_at - now.timestamp(), 3),
+            )
+
+        try:
+            yield reservation
+        finally:
+            used = reservation.used if reservation.used is not None else 0
+            if used != reservation.reserved:
+                try:
+                    await self.storage.charge(
+                        [window[0] for window in windows], used - reservation.reserved
+                    )
+                except Exception as e:
+                    logger.warning("Не удалось уточнить квоту пользователя: %s", str(e))
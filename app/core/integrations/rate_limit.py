@@ -0,0 +1,149 @@
+"""
+Ограничение частоты запросов к Yandex API на весь кластер.
+
+Квота каталога Yandex Cloud общая для всех воркеров и узлов, поэтому
+ограничитель держит состояние в Redis: две корзины токенов (token bucket) -
+запросы в секунду и токены в минуту. Перед вызовом модели запрос ждет
+свободного места в обеих корзинах, но не дольше RATE_LIMIT_MAX_WAIT.
+Токены резервируются по оценке запроса и уточняются по Usage из ответа.
+
+Example:
+    >>> limiter = RateLimiter(storage)
+    >>> async with limiter.reserve(tokens=350) as reservation:
+    ...     response = await client.get_completion(request)
+    ...     reservation.used = int(response.result.usage.totalTokens)
+"""
+
+import asyncio
+import logging
+import random
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Optional
+
+from app.core.cache.rate_limit import Bucket, RateLimitRedisStorage
+from app.core.exceptions import ChatRateLimitError
+from app.core.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Reservation:
+    """
+    Резерв токенов под один запрос к модели
+
+    Attributes:
+        reserved: Сколько токенов зарезервировано до вызова
+        used: Сколько токенов потрачено по Usage (None - вызов не удался)
+    """
+
+    reserved: int
+    used: Optional[int] = None
+
+
+class RateLimiter:
+    """
+    Распределенный ограничитель частоты запросов к модели
+
+    Attributes:
+        storage: Redis хранилище корзин (если None - ограничение выключено)
+    """
+
+    REQUESTS_BUCKET = "yandex:requests"
+    TOKENS_BUCKET = "yandex:tokens"
+
+    def __init__(self, storage: Optional[RateLimitRedisStorage] = None) -> None:
+        self.storage = storage
+
+    @property
+    def enabled(self) -> bool:
+        """Ограничение включено и есть хранилище"""
+        return settings.RATE_LIMIT_ENABLED and self.storage is not None
+
+    def _requests_bucket(self) -> Bucket:
+        return (
+            self.storage.key(self.REQUESTS_BUCKET),
+            settings.RATE_LIMIT_REQUESTS_BURST,
+            settings.RATE_LIMIT_REQUESTS_PER_SECOND,
+        )
+
+    def _tokens_bucket(self) -> Bucket:
+        return (
+            self.storage.key(self.TOKENS_BUCKET),
+            settings.RATE_LIMIT_TOKENS_PER_MINUTE,
+            settings.RATE_LIMIT_TOKENS_PER_MINUTE / 60,
+        )
+
+    async def acquire(self, tokens: int) -> None:
+        """
+        Ждет места в корзинах и списывает запрос и резерв токенов
+
+        Если по расчету Redis место освободится позже, чем позволяет
+        оставшийся бюджет ожидания, ошибка выбрасывается сразу, без сна.
+
+        Args:
+            tokens: Резерв токенов под запрос
+
+        Raises:
+            ChatRateLimitError: Если место не освободится за RATE_LIMIT_MAX_WAIT
+        """
+        if not self.enabled:
+            return
+
+        deadline = time.monotonic() + settings.RATE_LIMIT_MAX_WAIT
+        while True:
+            wait = await self.storage.try_acquire(
+                [(self._requests_bucket(), 1), (self._tokens_bucket(), tokens)]
+            )
+            if wait <= 0:
+                return
+
+            remaining = deadline - time.monotonic()
+            if wait > remaining:
+                logger.warning("Квота Yandex API исчерпана, ожидание %.2f с", wait)
+                raise ChatRateLimitError(
+                    "квота Yandex API исчерпана", retry_after=round(wait, 3)
+                )
+            # Джиттер, чтобы ожидающие воркеры не просыпались одновременно
+            await asyncio.sleep(wait * (1 + random.uniform(0, 0.1)))
+
+    async def charge(self, tokens: int) -> None:
+        """
+        Доначисляет токены (или возвращает при отрицательном значении)
+
+        Args:
+            tokens: Разница между фактическим расходом и резервом
+        """
+        if not self.enabled or tokens == 0:
+            return
+        await self.storage.charge(self._tokens_bucket(), tokens)
+
+    @asynccontextmanager
+    async def reserve(self, tokens: int) -> AsyncIterator[Reservation]:
+        """
+        Резервирует квоту под запрос и уточняет ее после ответа
+
+        Если вызов не удался (used не задан), резерв токенов возвращается,
+        запрос в корзине запросов остается списанным.
+
+        Args:
+            tokens: Оценка токенов запроса
+
+        Yields:
+            Reservation: Резерв, в который нужно записать used по Usage
+
+        Raises:
+            ChatRateLimitError: Если место не освободится за RATE_LIMIT_MAX_WAIT
+        """
+        reservation = Reservation(reserved=tokens)
+        await self.acquire(tokens)
+        try:
+            yield reservation
+        finally:
+            used = reservation.used if reservation.used is not None else 0
+            try:
+                await self.charge(used - reservation.reserved)
+            except Exception as e:
+                logger.warning("Не удалось уточнить расход квоты: %s", str(e))
@@ -0,0 +1,321 @@
+"""
+Устойчивость вызовов внешних API.
+
+Содержит:
+- классификацию ошибок на временные (таймауты, обрывы соединения, 429, 5xx)
+  и постоянные (4xx, ошибки валидации);
+- повторы с экспоненциальной задержкой и джиттером на базе tenacity,
+  с учетом заголовка Retry-After;
+- circuit breaker на каждый внешний эндпоинт: пока upstream нездоров,
+  вызовы сразу отклоняются, а не копятся в пуле воркеров до таймаута.
+
+Example:
+    >>> result = await call_with_resilience("completion", lambda: client.post(...))
+    >>> get_circuit_breakers_state()
+    [{'name': 'completion', 'state': 'closed', ...}]
+"""
+
+import asyncio
+import logging
+import time
+from email.utils import parsedate_to_datetime
+from enum import Enum
+from typing import Any, Awaitable, Callable, Dict, List, Optional, TypeVar
+
+import aiohttp
+from tenacity import (AsyncRetrying, RetryCallState, retry_if_exception,
+                      stop_after_attempt, stop_after_delay,
+                      wait_random_exponential)
+from tenacity.wait import wait_base
+
+from app.core.exceptions import ChatUpstreamUnavailableError
+from app.core.settings import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+RETRYABLE_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """
+    Проверяет, является ли ошибка временной (имеет смысл повторить запрос)
+
+    Args:
+        exc: Исключение, возникшее при вызове
+
+    Returns:
+        bool: True для таймаутов, обрывов соединения, 429 и 5xx
+    """
+    if isinstance(exc, aiohttp.ClientResponseError):
+        return exc.status in RETRYABLE_STATUSES
+    return isinstance(exc, (asyncio.TimeoutError, aiohttp.ClientConnectionError))
+
+
+def get_retry_after(exc: BaseException) -> Optional[float]:
+    """
+    Извлекает задержку из заголовка Retry-After ответа upstream
+
+    Args:
+        exc: Исключение, возникшее при вызове
+
+    Returns:
+        Optional[float]: Задержка в секундах или None, если заголовка нет
+    """
+    if not isinstance(exc, aiohttp.ClientResponseError) or not exc.headers:
+        return None
+
+    value = exc.headers.get("Retry-After")
+    if not value:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class wait_retry_after(wait_base):
+    """
+    Стратегия ожидания tenacity: Retry-After от upstream, если он есть,
+    иначе экспоненциальная задержка с полным джиттером.
+    """
+
+    def __init__(self, multiplier: float, max_wait: float) -> None:
+        self.max_wait = max_wait
+        self.fallback = wait_random_exponential(multiplier=multiplier, max=max_wait)
+
+    def __call__(self, retry_state: RetryCallState) -> float:
+        outcome = retry_state.outcome
+        if outcome is not None and outcome.failed:
+            retry_after = get_retry_after(outcome.exception())
+            if retry_after is not None:
+                return min(retry_after, self.max_wait)
+        return self.fallback(retry_state)
+
+
+class CircuitState(str, Enum):
+    """Состояние circuit breaker"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker для одного внешнего эндпоинта
+
+    - closed: вызовы проходят, считаются подряд идущие временные ошибки;
+    - open: после failure_threshold ошибок вызовы сразу отклоняются
+      на recovery_timeout секунд;
+    - half_open: пропускается не больше half_open_max_calls пробных вызовов,
+      успех закрывает цепь, ошибка снова открывает.
+
+    Attributes:
+        name: Имя эндпоинта
+        state: Текущее состояние
+        failures: Количество подряд идущих ошибок
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        recovery_timeout: float = 30.0,
+        half_open_max_calls: int = 1,
+    ) -> None:
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+
+        self.state = CircuitState.CLOSED
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._half_open_calls = 0
+        self.total_failures = 0
+        self.total_rejected = 0
+
+    def _retry_in(self) -> float:
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.opened_at + self.recovery_timeout - time.monotonic())
+
+    def before_call(self) -> None:
+        """
+        Проверяет, можно ли выполнить вызов
+
+        Raises:
+            ChatUpstreamUnavailableError: Если цепь разомкнута
+        """
+        if self.state == CircuitState.OPEN:
+            if self._retry_in() > 0:
+                self.total_rejected += 1
+                raise ChatUpstreamUnavailableError(
+                    f"сервис {self.name} временно недоступен",
+                    retry_after=self._retry_in(),
+                )
+            self.state = CircuitState.HALF_OPEN
+            self._half_open_calls = 0
+            logger.info("Circuit breaker %s: half-open", self.name)
+
+        if self.state == CircuitState.HALF_OPEN:
+            if self._half_open_calls >= self.half_open_max_calls:
+                self.total_rejected += 1
+                raise ChatUpstreamUnavailableError(
+                    f"сервис {self.name} восстанавливается",
+                    retry_after=self.recovery_timeout,
+                )
+            self._half_open_calls += 1
+
+    def record_success(self) -> None:
+        """Фиксирует успешный вызов"""
+        if self.state != CircuitState.CLOSED:
+            logger.info("Circuit breaker %s: closed", self.name)
+        self.state = CircuitState.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._half_open_calls = 0
+
+    def release(self) -> None:
+        """
+        Освобождает слот пробного вызова без исхода (вызов отменен или
+        завершился ошибкой, не говорящей о состоянии upstream)
+        """
+        if self.state == CircuitState.HALF_OPEN and self._half_open_calls > 0:
+            self._half_open_calls -= 1
+
+    def record_failure(self) -> None:
+        """Фиксирует временную ошибку upstream"""
+        self.failures += 1
+        self.total_failures += 1
+        if (
+            self.state == CircuitState.HALF_OPEN
+            or self.failures >= self.failure_threshold
+        ):
+            if self.state != CircuitState.OPEN:
+                logger.warning(
+                    "Circuit breaker %s: open после %d ошибок", self.name, self.failures
+                )
+            self.state = CircuitState.OPEN
+            self.opened_at = time.monotonic()
+            self._half_open_calls = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Состояние для мониторинга"""
+        return {
+            "name": self.name,
+            "state": self.state.value,
+            "failures": self.failures,
+            "total_failures": self.total_failures,
+            "total_rejected": self.total_rejected,
+            "retry_after": round(self._retry_in(), 3) if self.state == CircuitState.OPEN else None,
+        }
+
+
+_circuit_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def get_circuit_breaker(name: str) -> CircuitBreaker:
+    """
+    Возвращает circuit breaker эндпоинта (один на процесс)
+
+    Args:
+        name: Имя эндпоинта
+
+    Returns:
+        CircuitBreaker: Circuit breaker эндпоинта
+    """
+    if name not in _circuit_breakers:
+        _circuit_breakers[name] = CircuitBreaker(name, **settings.circuit_breaker_params)
+    return _circuit_breakers[name]
+
+
+def get_circuit_breakers_state() -> List[Dict[str, Any]]:
+    """
+    Возвращает состояние всех circuit breaker процесса для мониторинга
+    """
+    return [breaker.snapshot() for breaker in _circuit_breakers.values()]
+
+
+def build_retrying() -> AsyncRetrying:
+    """
+    Создает политику повторов для вызовов Yandex API
+
+    Повторяются только временные ошибки, отказ circuit breaker не повторяется.
+    Ограничены и число попыток, и общее время на повторы.
+    """
+    return AsyncRetrying(
+        retry=retry_if_exception(is_retryable),
+        wait=wait_retry_after(
+            multiplier=settings.YANDEX_RETRY_BACKOFF_MULTIPLIER,
+            max_wait=settings.YANDEX_RETRY_BACKOFF_MAX,
+        ),
+        stop=(
+            stop_after_attempt(settings.YANDEX_RETRY_ATTEMPTS)
+            | stop_after_delay(settings.YANDEX_RETRY_MAX_DELAY)
+        ),
+        reraise=True,
+    )
+
+
+async def call_with_resilience(
+    name: str, func: Callable[[], Awaitable[T]]
+) -> T:
+    """
+    Выполняет вызов upstream через circuit breaker с повторами
+
+    Args:
+        name: Имя эндпоинта (ключ circuit breaker)
+        func: Фабрика корутины вызова, вызывается на каждую попытку
+
+    Returns:
+        T: Результат вызова
+
+    Raises:
+        ChatUpstreamUnavailableError: Если цепь разомкнута или временные
+            ошибки не прошли за отведенные попытки
+        Exception: Постоянные ошибки пробрасываются без повторов
+    """
+    breaker = get_circuit_breaker(name)
+    try:
+        async for attempt in build_retrying():
+            with attempt:
+                breaker.before_call()
+                try:
+                    result = await func()
+                except Exception as e:
+                    if is_retryable(e):
+                        breaker.record_failure()
+                        logger.warning(
+                            "Временная ошибка %s (попытка %d): %s",
+                            name,
+                            attempt.retry_state.attempt_number,
+                            str(e),
+                        )
+                    elif isinstance(e, aiohttp.ClientResponseError):
+                        # Upstream ответил (пусть и ошибкой запроса) - он жив
+                        breaker.record_success()
+                    else:
+                        breaker.release()
+                    raise
+                except BaseException:
+                    # Отмена (дедлайн, обрыв клиента): исход пробы неизвестен,
+                    # слот half-open нужно вернуть, иначе цепь застрянет
+                    breaker.release()
+                    raise
+                breaker.record_success()
+                return result
+    except Exception as e:
+        if is_retryable(e):
+            raise ChatUpstreamUnavailableError(
+                f"сервис {name} не ответил: {e}", retry_after=get_retry_after(e)
+            ) from e
+        raise
@@ -0,0 +1,248 @@
+import asyncio
+import json
+import logging
+import re
+import time
+import uuid
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Optional
+
+import aiohttp
+
+from app.core.cache.base import BaseRedisStorage
+from app.core.exceptions import ChatAuthError
+from app.core.security import TokenMixin
+from app.core.settings import settings
+
+from ..base import BaseHttpClient
+from ..resilience import call_with_resilience
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class IAMToken:
+    """
+    IAM токен Yandex Cloud
+
+    Attributes:
+        token: Значение токена
+        expires_at: Время истечения (unix timestamp)
+        issued_at: Время получения (unix timestamp)
+    """
+
+    token: str
+    expires_at: float
+    issued_at: float
+
+    def remaining(self) -> float:
+        """Секунд до истечения токена"""
+        return self.expires_at - time.time()
+
+
+def parse_expires_at(value: str) -> float:
+    """
+    Разбирает поле expiresAt ответа IAM API (RFC 3339, до наносекунд)
+
+    Args:
+        value: Строка вида 2024-01-01T12:00:00.123456789Z
+
+    Returns:
+        float: Unix timestamp
+    """
+    # datetime понимает не больше 6 знаков дробной части
+    value = re.sub(r"(\.\d{6})\d+", r"\1", value).replace("Z", "+00:00")
+    return datetime.fromisoformat(value).timestamp()
+
+
+class IAMTokenManager:
+    """
+    Менеджер IAM токена для авторизации в Yandex API
+
+    JWT, подписанный ключом сервисного аккаунта, обменивается на IAM токен
+    один раз, а не на каждый запрос. Токен кэшируется в процессе и в Redis
+    (общий для всех воркеров), фоновая задача обновляет его заранее - раз в
+    YANDEX_IAM_TOKEN_REFRESH_INTERVAL секунд, так что на пути запроса нет
+    ни подписи RSA, ни лишнего обращения к IAM API. Обмен выполняет только
+    тот воркер, который захватил блокировку в Redis, остальные забирают
+    готовый токен.
+
+    Attributes:
+        http_client: HTTP клиент на общей сессии приложения
+        storage: Redis хранилище для общего токена
+    """
+
+    TOKEN_KEY = "yandex:iam_token"
+    LOCK_KEY = "yandex:iam_token:lock"
+
+    # Время жизни IAM токена, если в ответе нет expiresAt
+    DEFAULT_TOKEN_TTL = 12 * 3600
+
+    def __init__(self, http_client: BaseHttpClient, storage: BaseRedisStorage) -> None:
+        self.http_client = http_client
+        self.storage = storage
+        self.refresh_interval = settings.YANDEX_IAM_TOKEN_REFRESH_INTERVAL
+        self.min_ttl = settings.YANDEX_IAM_TOKEN_MIN_TTL
+
+        self._token: Optional[IAMToken] = None
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Запускает фоновое обновление токена"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="iam-token-refresh")
+            logger.info("Фоновое обновление IAM токена запущено")
+
+    async def stop(self) -> None:
+        """Останавливает фоновое обновление токена"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            logger.info("Фоновое обновление IAM токена остановлено")
+
+    async def get_token(self) -> str:
+        """
+        Возвращает действующий IAM токен
+
+        Обычно токен уже есть в памяти процесса и возвращается без обращений
+        к сети. Обновление на пути запроса происходит, только если фоновая
+        задача не успела (например, сразу после старта).
+
+        Returns:
+            str: IAM токен
+
+        Raises:
+            ChatAuthError: Если ключ сервисного аккаунта отклонен
+            ChatUpstreamUnavailableError: Если IAM API недоступен
+        """
+        if self._is_usable(self._token):
+            return self._token.token
+
+        async with self._lock:
+            if not self._is_usable(self._token):
+                await self._refresh()
+            return self._token.token
+
+    def _is_usable(self, token: Optional[IAMToken]) -> bool:
+        return token is not None and token.remaining() > self.min_ttl
+
+    def _needs_refresh(self, token: Optional[IAMToken]) -> bool:
+        return (
+            not self._is_usable(token)
+            or time.time() >= token.issued_at + self.refresh_interval
+        )
+
+    def _next_refresh_delay(self) -> float:
+        if self._token is None:
+            return 0.0
+        refresh_at = min(
+            self._token.issued_at + self.refresh_interval,
+            self._token.expires_at - self.min_ttl,
+        )
+        return max(0.0, refresh_at - time.time())
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self._next_refresh_delay())
+            try:
+                async with self._lock:
+                    if self._needs_refresh(self._token):
+                        await self._refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Ошибка при обновлении IAM токена: %s", str(e))
+                await asyncio.sleep(settings.YANDEX_IAM_TOKEN_RETRY_DELAY)
+
+    async def _load(self) -> Optional[IAMToken]:
+        data = await self.storage.get(self.TOKEN_KEY)
+        if not data:
+            return None
+        return IAMToken(**json.loads(data))
+
+    async def _save(self, token: IAMToken) -> None:
+        await self.storage.set(
+            self.TOKEN_KEY,
+            json.dumps(asdict(token)),
+            expires=max(1, int(token.remaining())),
+        )
+
+    async def _refresh(self) -> None:
+        """
+        Обновляет токен: берет свежий из Redis или обменивает JWT сам
+        """
+        shared = await self._load()
+        if not self._needs_refresh(shared):
+            self._token = shared
+            return
+
+        lock_token = uuid.uuid4().hex
+        if await self.storage.setnx(
+            self.LOCK_KEY, lock_token, expires=settings.YANDEX_IAM_TOKEN_LOCK_TTL
+        ):
+            try:
+                self._token = await self._exchange()
+                await self._save(self._token)
+            finally:
+                # Обмен мог идти дольше TTL блокировки: чужую не снимаем
+                await self.storage.delete_if_equals(self.LOCK_KEY, lock_token)
+            return
+
+        # Токен обновляет другой воркер - ждем, пока он появится в Redis
+        deadline = time.monotonic() + settings.YANDEX_IAM_TOKEN_LOCK_TTL
+        while time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+            shared = await self._load()
+            if not self._needs_refresh(shared):
+                self._token = shared
+                return
+
+        self._token = await self._exchange()
+        await self._save(self._token)
+
+    async def _exchange(self) -> IAMToken:
+        """
+        Обменивает JWT сервисного аккаунта на IAM токен
+
+        Raises:
+            ChatAuthError: Если ключи не заданы или IAM API отклонил запрос
+            ChatUpstreamUnavailableError: Если IAM API недоступен
+        """
+        private_key = settings.YANDEX_PRIVATE_KEY.get_secret_value().replace("\\n", "\n")
+        key_id = settings.YANDEX_KEY_ID.get_secret_value()
+        if not private_key or not key_id:
+            raise ChatAuthError("Ключ сервисного аккаунта не задан")
+
+        jwt_token = TokenMixin.get_iam_token(private_key, key_id)
+        try:
+            response = await call_with_resilience(
+                "iam",
+                lambda: self.http_client.post(
+                    url=settings.YANDEX_IAM_URL,
+                    headers={"Content-Type": "application/json"},
+                    data={"jwt": jwt_token},
+                ),
+            )
+        except aiohttp.ClientResponseError as e:
+            # Постоянная ошибка (неверный ключ, нет прав) - повторять бессмысленно
+            raise ChatAuthError(f"IAM API отклонил ключ: {e.message}") from e
+
+        if not isinstance(response, dict) or "iamToken" not in response:
+            raise ChatAuthError("Неверный ответ IAM API")
+
+        issued_at = time.time()
+        try:
+            expires_at = parse_expires_at(response["expiresAt"])
+        except (KeyError, ValueError):
+            expires_at = issued_at + self.DEFAULT_TOKEN_TTL
+
+        logger.info("Получен новый IAM токен")
+        return IAMToken(
+            token=response["iamToken"], expires_at=expires_at, issued_at=issued_at
+        )
@@ -0,0 +1,174 @@
+import asyncio
+import logging
+import time
+from typing import Optional
+
+from app.core.cache.chat import ChatRedisStorage
+from app.core.cache.operations import OperationRedisStorage
+from app.core.cache.usage import UsageRedisStorage
+from app.schemas import Message, MessageRole, Result
+from app.services.v1.usage import UsageRecorder
+
+from .text import ChatHttpClient
+
+logger = logging.getLogger(__name__)
+
+
+class OperationPoller:
+    """
+    Фоновый опрос отложенных операций Yandex GPT
+
+    Один поллер на процесс; расписание опроса общее для всех воркеров и
+    лежит в Redis. За один проход поллер захватывает не больше batch_size
+    операций, срок проверки которых наступил (каждую - на время аренды
+    lease, поэтому одну операцию опрашивает один воркер), и проверяет их
+    параллельно. Интервал опроса каждой операции растет от min_interval до
+    max_interval (генерация обычно занимает секунды, а не миллисекунды).
+    Результат сохраняется в Redis, ответ ассистента добавляется в историю
+    чата пользователя, расход токенов - в учет по асинхронному тарифу.
+
+    Attributes:
+        http_client: Клиент Yandex API на общей HTTP сессии
+        storage: Хранилище операций
+        chat_storage: Хранилище истории чата
+        usage: Учет расхода токенов
+    """
+
+    def __init__(
+        self,
+        http_client: ChatHttpClient,
+        storage: OperationRedisStorage,
+        chat_storage: ChatRedisStorage,
+        min_interval: float = 0.5,
+        max_interval: float = 10.0,
+        backoff: float = 1.5,
+        idle_interval: float = 2.0,
+        batch_size: int = 20,
+        lease: float = 30.0,
+        usage_storage: Optional[UsageRedisStorage] = None,
+    ) -> None:
+        self.http_client = http_client
+        self.storage = storage
+        self.chat_storage = chat_storage
+        self.usage = UsageRecorder(usage_storage)
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.idle_interval = idle_interval
+        self.batch_size = batch_size
+        self.lease = lease
+
+        self._next_check: Optional[float] = None
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Запускает фоновую задачу опроса"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="operation-poller")
+            logger.info("Поллер отложенных операций запущен")
+
+    async def stop(self) -> None:
+        """Останавливает фоновую задачу опроса"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            logger.info("Поллер отложенных операций остановлен")
+
+    def wake(self) -> None:
+        """Будит поллер, чтобы новая операция попала в расписание без ожидания"""
+        self._wakeup.set()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self._tick()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Ошибка при опросе операций: %s", str(e))
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self._next_delay())
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    def _next_delay(self) -> float:
+        if self._next_check is None:
+            return self.idle_interval
+        return max(0.0, min(self._next_check - time.time(), self.idle_interval))
+
+    async def _tick(self) -> None:
+        due, nearest = await self.storage.claim_due(time.time(), self.batch_size, self.lease)
+        self._next_check = nearest
+        if not due:
+            return
+
+        next_checks = await asyncio.gather(
+            *(self._check(operation_id, interval) for operation_id, interval in due)
+        )
+        # Ближайший срок из Redis посчитан до переноса захваченных проверок
+        self._next_check = min(
+            (next_check for next_check in next_checks + [nearest] if next_check is not None),
+            default=None,
+        )
+
+    async def _postpone(self, operation_id: str, interval: Optional[float]) -> float:
+        interval = min((interval or self.min_interval) * self.backoff, self.max_interval)
+        next_check = time.time() + interval
+        await self.storage.reschedule(operation_id, next_check, interval)
+        return next_check
+
+    async def _check(self, operation_id: str, interval: Optional[float]) -> Optional[float]:
+        """
+        Проверяет захваченную операцию
+
+        Returns:
+            Optional[float]: Срок следующей проверки или None, если операция завершена
+        """
+        try:
+            done, result, error = await self.http_client.get_operation(operation_id)
+        except Exception as e:
+            logger.warning("Не удалось проверить операцию %s: %s", operation_id, str(e))
+            return await self._postpone(operation_id, interval)
+
+        if not done:
+            return await self._postpone(operation_id, interval)
+
+        await self._finish(operation_id, result, error)
+        return None
+
+    async def _finish(
+        self, operation_id: str, result: Optional[Result], error: Optional[str]
+    ) -> None:
+        record = await self.storage.complete_operation(operation_id, result, error)
+        if record is None:
+            # Операцию уже завершил другой воркер
+            return
+
+        if error is not None:
+            logger.error("Операция %s завершилась с ошибкой: %s", operation_id, error)
+            return
+
+        user_id = record["user_id"]
+        if record.get("model"):
+            await self.usage.record(user_id, record["model"], result.usage, async_mode=True)
+
+        await self.chat_storage.append_messages(
+            user_id,
+            [
+                Message.model_validate(record["message"]),
+                Message(
+                    role=MessageRole.ASSISTANT,
+                    text=result.alternatives[0].message.text,
+                    tokens=int(result.usage.completionTokens),
+                    tokens_model=record.get("model"),
+                ),
+            ],
+        )
+        logger.debug("Операция %s завершена", operation_id)
@@ -0,0 +1,116 @@
+"""
+Сериализация запросов к Yandex API в байты за один проход.
+
+Раньше тело запроса копировалось несколько раз: model_dump, замена
+role на строку, фильтрация None в BaseHttpClient.post, json.dumps для
+отладочного лога и повторная сериализация в aiohttp. Для длинной истории
+это несколько полных копий на каждый вызов модели.
+
+RequestEncoder собирает JSON сразу в байты: сообщения сериализует
+pydantic-core (TypeAdapter.dump_json, роли - строками), а неизменные
+части - системное сообщение и начало тела с modelUri - кодируются один
+раз и переиспользуются. Готовые байты отправляются как есть
+(BaseHttpClient.post(body=...)).
+
+Example:
+    >>> body = get_request_encoder().encode(chat_request)
+    >>> await client.post(url, headers=headers, body=body)
+"""
+
+import json
+from functools import lru_cache
+from typing import List, Optional
+
+from pydantic import TypeAdapter
+
+from app.core.settings import settings
+from app.schemas import ChatRequest, CompletionOptions, Message, MessageRole
+
+_messages_adapter = TypeAdapter(List[Message])
+_options_adapter = TypeAdapter(CompletionOptions)
+
+
+@lru_cache(maxsize=64)
+def _encode_head(model_uri: str) -> bytes:
+    """Начало тела запроса до completionOptions (моделей немного)"""
+    return b'{"modelUri":' + json.dumps(model_uri, ensure_ascii=False).encode() + b","
+
+
+class RequestEncoder:
+    """
+    Кодировщик ChatRequest в тело запроса Yandex API
+
+    Attributes:
+        system_text: Текст статического системного сообщения
+        system_bytes: Системное сообщение, закодированное заранее
+    """
+
+    def __init__(self, system_text: str) -> None:
+        self.system_text = system_text
+        self.system_bytes = _messages_adapter.dump_json(
+            [Message(role=MessageRole.SYSTEM, text=system_text)]
+        )[1:-1]
+
+    def _is_static_system(self, message: Message) -> bool:
+        # Сравнение строк сначала проверяет идентичность объектов, поэтому
+        # для ChatService.SYSTEM_MESSAGE текст не сравнивается посимвольно
+        return message.role == MessageRole.SYSTEM and message.text == self.system_text
+
+    def encode_messages(self, messages: List[Message]) -> bytes:
+        """
+        Кодирует список сообщений в JSON массив
+
+        Args:
+            messages: Сообщения запроса
+
+        Returns:
+            bytes: JSON массив сообщений (служебное поле tokens исключено)
+        """
+        if not messages or not self._is_static_system(messages[0]):
+            return _messages_adapter.dump_json(messages)
+
+        if len(messages) == 1:
+            return b"[" + self.system_bytes + b"]"
+        rest = _messages_adapter.dump_json(messages[1:])
+        return b"[" + self.system_bytes + b"," + rest[1:]
+
+    def encode(self, chat_request: ChatRequest) -> bytes:
+        """
+        Кодирует запрос в тело для Yandex API
+
+        Args:
+            chat_request: Запрос к API
+
+        Returns:
+            bytes: JSON тело запроса в UTF-8
+
+        Usage:
+            >>> get_request_encoder().encode(request)
+            b'{"modelUri":"gpt://folder/yandexgpt-lite","completionOptions":...'
+        """
+        return b"".join(
+            (
+                _encode_head(chat_request.modelUri),
+                b'"completionOptions":',
+                _options_adapter.dump_json(chat_request.completionOptions),
+                b',"messages":',
+                self.encode_messages(chat_request.messages),
+                b"}",
+            )
+        )
+
+
+_request_encoder: Optional[RequestEncoder] = None
+
+
+def get_request_encoder() -> RequestEncoder:
+    """
+    Возвращает общий для процесса кодировщик запросов
+
+    Returns:
+        RequestEncoder: Кодировщик с системным сообщением YANDEX_PRE_INSTRUCTIONS
+    """
+    global _request_encoder
+    if _request_encoder is None:
+        _request_encoder = RequestEncoder(settings.YANDEX_PRE_INSTRUCTIONS)
+    return _request_encoder
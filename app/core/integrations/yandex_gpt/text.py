@@ -1,15 +1,106 @@
+import logging
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import aiohttp
+
 from app.core.settings import settings
-from app.core.exceptions import ChatAuthError, ChatCompletionError
+from app.core.exceptions import (ChatAuthError, ChatCompletionError,
+                                 ChatUpstreamUnavailableError)
 from app.schemas import ChatRequest, ChatResponse, Result
 
 from ..base import BaseHttpClient
+from ..hedging import get_hedger
+from ..resilience import call_with_resilience
+from .auth import IAMTokenManager
+from .serialization import get_request_encoder
 
 
 class ChatHttpClient(BaseHttpClient):
     """
     Класс для работы с API Yandex
+
+    Все вызовы идут через circuit breaker своего эндпоинта с повторами
+    временных ошибок (см. app.core.integrations.resilience). Синхронные
+    и потоковые вызовы модели при YANDEX_HEDGING_ENABLED хеджируются
+    (см. app.core.integrations.hedging).
     """
 
+    REQUIRED_RESULT_KEYS = ("alternatives", "usage", "modelVersion")
+
+    def __init__(
+        self,
+        session: Optional[aiohttp.ClientSession] = None,
+        iam_token_manager: Optional[IAMTokenManager] = None,
+    ) -> None:
+        super().__init__(session)
+        self.iam_token_manager = iam_token_manager
+
+    async def _get_headers(self) -> Dict[str, str]:
+        """
+        Формирует заголовки авторизации для Yandex API
+
+        При YANDEX_AUTH_TYPE=iam используется IAM токен из менеджера
+        (обычно уже в памяти процесса), иначе - статический API ключ.
+
+        Raises:
+            ChatAuthError: Если API ключ не задан или IAM авторизация не настроена
+        """
+        if settings.YANDEX_AUTH_TYPE == "iam":
+            if self.iam_token_manager is None:
+                raise ChatAuthError("IAM авторизация не настроена")
+            return {
+                "Authorization": f"Bearer {await self.iam_token_manager.get_token()}",
+                "x-folder-id": settings.YANDEX_FOLDER_ID.get_secret_value(),
+                "Content-Type": "application/json",
+            }
+
+        if not settings.YANDEX_API_KEY.get_secret_value():
+            raise ChatAuthError("API ключ не задан")
+
+        return {
+            "Authorization": f"Api-Key {settings.YANDEX_API_KEY.get_secret_value()}",
+            "Content-Type": "application/json",
+        }
+
+    def _prepare_request_data(self, chat_request: ChatRequest) -> bytes:
+        """
+        Сериализует запрос в тело для Yandex API за один проход
+
+        modelUri берется из запроса: модель выбирает сервис (роутер моделей).
+        Системное сообщение и начало тела кодируются заранее
+        (см. app.core.integrations.yandex_gpt.serialization).
+        """
+        request_data = get_request_encoder().encode(chat_request)
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug("Request data: %s", request_data.decode())
+        return request_data
+
+    @staticmethod
+    def _hedger_name(chat_request: ChatRequest) -> str:
+        """Задержки у моделей разные, поэтому хеджер - на модель"""
+        return f"completion:{chat_request.modelUri.rsplit('/', 1)[-1]}"
+
+    def _parse_result(self, response: Any) -> ChatResponse:
+        """
+        Проверяет ответ (или фрагмент потока) Yandex API и собирает ChatResponse
+
+        Raises:
+            ChatCompletionError: При ошибке или невалидной структуре ответа
+        """
+        if not isinstance(response, dict):
+            raise ChatCompletionError("Невалидный ответ от API")
+
+        if "error" in response:
+            raise ChatCompletionError(response["error"])
+
+        result_data = response.get("result", {})
+
+        if not all(key in result_data for key in self.REQUIRED_RESULT_KEYS):
+            self.logger.error("Invalid response structure: %s", response)
+            raise ChatCompletionError("Неверная структура ответа от API")
+
+        return ChatResponse(success=True, result=Result(**result_data))
+
     async def get_completion(self, chat_request: ChatRequest) -> ChatResponse:
         """
         Получение ответа от Yandex API
@@ -23,45 +114,231 @@ class ChatHttpClient(BaseHttpClient):
         Raises:
             HTTPException: При ошибках запроса
         """
-        headers = {
-            "Authorization": f"Api-Key {settings.YANDEX_API_KEY.get_secret_value()}",
-            "Content-Type": "application/json",
-        }
+        headers = await self._get_headers()
 
-        if not settings.YANDEX_API_KEY.get_secret_value():
-            raise ChatAuthError("API ключ не задан")
+        try:
+            request_data = self._prepare_request_data(chat_request)
 
-        chat_request.modelUri = settings.yandex_model_uri
+            hedger = get_hedger(self._hedger_name(chat_request))
+            response = await call_with_resilience(
+                "completion",
+                lambda: hedger.call(
+                    lambda: self.post(
+                        url=settings.YANDEX_API_URL, headers=headers, body=request_data
+                    )
+                ),
+            )
+
+            self.logger.debug("Raw response from API: %s", response)
 
+            return self._parse_result(response)
+
+        except ChatUpstreamUnavailableError:
+            raise
+        except Exception as e:
+            self.logger.error("Ошибка при запросе к API Yandex: %s", str(e))
+            raise ChatCompletionError(str(e))
+
+    async def _open_stream(
+        self, headers: Dict[str, str], request_data: bytes
+    ) -> Tuple[Dict[str, Any], AsyncIterator[Dict[str, Any]]]:
+        """
+        Открывает поток ответа и дожидается первого фрагмента
+        """
+        stream = self.post_stream(
+            url=settings.YANDEX_API_URL, headers=headers, body=request_data
+        )
         try:
-            request_data = chat_request.model_dump(by_alias=True)
-            for msg in request_data["messages"]:
-                msg["role"] = msg["role"].value
+            first_chunk = await stream.__anext__()
+        except BaseException:
+            await stream.aclose()
+            raise
+        return first_chunk, stream
+
+    async def stream_completion(
+        self, chat_request: ChatRequest
+    ) -> AsyncIterator[ChatResponse]:
+        """
+        Потоковое получение ответа от Yandex API
+
+        Yandex в потоковом режиме присылает JSON объекты по мере генерации,
+        в каждом - весь накопленный на данный момент текст. Последний фрагмент
+        имеет статус ALTERNATIVE_STATUS_FINAL.
+
+        Args:
+            chat_request: Запрос к API
 
-            self.logger.debug("Request data: %s", request_data)
+        Yields:
+            ChatResponse: Очередной фрагмент ответа
 
-            response = await self.post(
-                url=settings.YANDEX_API_URL, headers=headers, data=request_data
+        Raises:
+            ChatCompletionError: При ошибках запроса
+        """
+        headers = await self._get_headers()
+        chat_request.completionOptions.stream = True
+
+        try:
+            request_data = self._prepare_request_data(chat_request)
+
+            # Повторы возможны только до первого фрагмента: после него клиент
+            # уже получил часть ответа
+            # Хеджируется ожидание первого фрагмента, поток проигравшего
+            # вызова закрывается
+            hedger = get_hedger(self._hedger_name(chat_request))
+            first_chunk, stream = await call_with_resilience(
+                "completion",
+                lambda: hedger.call(
+                    lambda: self._open_stream(headers, request_data),
+                    cleanup=lambda opened: opened[1].aclose(),
+                ),
             )
+            try:
+                yield self._parse_result(first_chunk)
+                async for chunk in stream:
+                    yield self._parse_result(chunk)
+            finally:
+                await stream.aclose()
 
-            self.logger.debug("Raw response from API: %s", response)
+        except (ChatCompletionError, ChatUpstreamUnavailableError):
+            raise
+        except Exception as e:
+            self.logger.error("Ошибка при потоковом запросе к API Yandex: %s", str(e))
+            raise ChatCompletionError(str(e))
 
-            if not isinstance(response, dict):
-                raise ChatCompletionError("Невалидный ответ от API")
+    async def submit_completion(self, chat_request: ChatRequest) -> str:
+        """
+        Отправка запроса в асинхронном режиме (completionAsync)
 
-            if "error" in response:
-                raise ChatCompletionError(response["error"])
+        Асинхронный режим тарифицируется в 2 раза дешевле синхронного,
+        ответ забирается позже по идентификатору операции.
 
-            result_data = response.get("result", {})
+        Args:
+            chat_request: Запрос к API
 
-            if not all(
-                key in result_data for key in ["alternatives", "usage", "modelVersion"]
-            ):
-                self.logger.error("Invalid response structure: %s", response)
-                raise ChatCompletionError("Неверная структура ответа от API")
+        Returns:
+            str: Идентификатор операции Yandex
 
-            return ChatResponse(success=True, result=Result(**result_data))
+        Raises:
+            ChatCompletionError: При ошибках запроса
+        """
+        headers = await self._get_headers()
 
+        try:
+            request_data = self._prepare_request_data(chat_request)
+
+            response = await call_with_resilience(
+                "completion_async",
+                lambda: self.post(
+                    url=settings.YANDEX_ASYNC_API_URL,
+                    headers=headers,
+                    body=request_data,
+                ),
+            )
+
+            self.logger.debug("Raw async response from API: %s", response)
+
+            if not isinstance(response, dict) or "error" in response:
+                raise ChatCompletionError(
+                    response.get("error") if isinstance(response, dict) else "Невалидный ответ от API"
+                )
+
+            operation_id = response.get("id")
+            if not operation_id:
+                raise ChatCompletionError("В ответе API нет идентификатора операции")
+
+            return operation_id
+
+        except (ChatCompletionError, ChatUpstreamUnavailableError):
+            raise
         except Exception as e:
-            self.logger.error("Ошибка при запросе к API Yandex: %s", str(e))
+            self.logger.error("Ошибка при асинхронном запросе к API Yandex: %s", str(e))
             raise ChatCompletionError(str(e))
+
+    async def get_operation(
+        self, operation_id: str
+    ) -> Tuple[bool, Optional[Result], Optional[str]]:
+        """
+        Проверка статуса операции Yandex
+
+        Args:
+            operation_id: Идентификатор операции
+
+        Returns:
+            Tuple[bool, Optional[Result], Optional[str]]: Признак завершения,
+            результат генерации и текст ошибки (если операция завершилась с ошибкой)
+        """
+        headers = await self._get_headers()
+        try:
+            response = await call_with_resilience(
+                "operations",
+                lambda: self.get(
+                    url=f"{settings.YANDEX_OPERATIONS_URL}/{operation_id}",
+                    headers=headers,
+                ),
+            )
+        except aiohttp.ClientResponseError as e:
+            # Постоянная ошибка API операций (например, операция не найдена)
+            return True, None, e.message
+
+        if not isinstance(response, dict):
+            raise ChatCompletionError("Невалидный ответ от API")
+
+        if not response.get("done"):
+            return False, None, None
+
+        if "error" in response:
+            return True, None, str(response["error"])
+
+        return True, self._parse_result({"result": response.get("response", {})}).result, None
+
+    async def count_tokens(self, text: str, model_uri: str) -> int:
+        """
+        Подсчет токенов в тексте через Yandex tokenize API
+
+        Args:
+            text: Текст для подсчета
+            model_uri: URI модели (у моделей разные токенизаторы)
+
+        Returns:
+            int: Количество токенов
+        """
+        headers = await self._get_headers()
+        response = await call_with_resilience(
+            "tokenize",
+            lambda: self.post(
+                url=settings.YANDEX_TOKENIZE_URL,
+                headers=headers,
+                data={"modelUri": model_uri, "text": text},
+            ),
+        )
+
+        if not isinstance(response, dict) or "tokens" not in response:
+            raise ChatCompletionError("Неверная структура ответа tokenize API")
+
+        return len(response["tokens"])
+
+    async def get_embedding(self, text: str, model_uri: str) -> List[float]:
+        """
+        Векторное представление текста через Yandex text embedding API
+
+        Args:
+            text: Текст
+            model_uri: URI модели эмбеддингов (emb://{folder_id}/{model}/latest)
+
+        Returns:
+            List[float]: Вектор эмбеддинга
+        """
+        headers = await self._get_headers()
+        response = await call_with_resilience(
+            "embedding",
+            lambda: self.post(
+                url=settings.YANDEX_EMBEDDING_URL,
+                headers=headers,
+                data={"modelUri": model_uri, "text": text},
+            ),
+        )
+
+        if not isinstance(response, dict) or "embedding" not in response:
+            raise ChatCompletionError("Неверная структура ответа embedding API")
+
+        return [float(value) for value in response["embedding"]]
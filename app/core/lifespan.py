@@ -1,21 +1,121 @@
+import logging
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 
+logger = logging.getLogger(__name__)
+
 
 class ApplicationLifecycle:
     """Управление жизненным циклом приложения"""
 
     def __init__(self):
-        pass
+        # Импорт внутри, т.к. settings сам импортирует lifespan
+        from app.core.dependencies.connections.cache import RedisClient
+        from app.core.dependencies.connections.http import HttpClient
+
+        self.http_client = HttpClient()
+        self.redis_client = RedisClient()
+        self.operation_poller = None
+        self.iam_token_manager = None
+        self.history_compactor = None
+        self.usage_flusher = None
+        self.history_invalidation_listener = None
 
     async def startup(self, app: FastAPI):
         """Запуск приложения"""
-        pass
+        from app.core.cache.base import BaseRedisStorage
+        from app.core.cache.chat import ChatRedisStorage
+        from app.core.cache.near_cache import (HistoryInvalidationListener,
+                                               get_history_near_cache)
+        from app.core.cache.operations import OperationRedisStorage
+        from app.core.cache.rate_limit import RateLimitRedisStorage
+        from app.core.cache.usage import UsageRedisStorage
+        from app.core.integrations.base import BaseHttpClient
+        from app.core.integrations.yandex_gpt.auth import IAMTokenManager
+        from app.core.integrations.yandex_gpt.operations import OperationPoller
+        from app.core.integrations.yandex_gpt.text import ChatHttpClient
+        from app.core.settings import settings
+        from app.services.v1.compaction import HistoryCompactor
+        from app.services.v1.usage import UsageFlusher
+
+        app.state.http_session = await self.http_client.connect()
+        redis = await self.redis_client.connect()
+        app.state.redis = redis
+
+        if settings.CHAT_HISTORY_NEAR_CACHE_ENABLED:
+            # Кэш включится после подтверждения подписки на инвалидацию
+            self.history_invalidation_listener = HistoryInvalidationListener(
+                redis=redis,
+                cache=get_history_near_cache(),
+                **settings.history_invalidation_params,
+            )
+            self.history_invalidation_listener.start()
+
+        if settings.YANDEX_AUTH_TYPE == "iam":
+            self.iam_token_manager = IAMTokenManager(
+                http_client=BaseHttpClient(app.state.http_session),
+                storage=BaseRedisStorage(redis),
+            )
+            self.iam_token_manager.start()
+        app.state.iam_token_manager = self.iam_token_manager
+
+        self.operation_poller = OperationPoller(
+            http_client=ChatHttpClient(app.state.http_session, self.iam_token_manager),
+            storage=OperationRedisStorage(redis),
+            chat_storage=ChatRedisStorage(redis),
+            usage_storage=UsageRedisStorage(redis),
+            **settings.operation_poller_params,
+        )
+        self.operation_poller.start()
+        app.state.operation_poller = self.operation_poller
+
+        if settings.CHAT_COMPACTION_ENABLED:
+            self.history_compactor = HistoryCompactor(
+                http_client=ChatHttpClient(app.state.http_session, self.iam_token_manager),
+                storage=ChatRedisStorage(redis),
+                rate_limit_storage=RateLimitRedisStorage(redis),
+                usage_storage=UsageRedisStorage(redis),
+                **settings.chat_compaction_params,
+            )
+            self.history_compactor.start()
+
+        if settings.USAGE_ACCOUNTING_ENABLED:
+            self.usage_flusher = UsageFlusher(
+                storage=UsageRedisStorage(redis), **settings.usage_flusher_params
+            )
+            await self.usage_flusher.start()
+
+        if settings.SEMANTIC_CACHE_ENABLED:
+            from app.services.v1.semantic_cache import get_vector_index
+
+            # Открываем индекс сразу: ошибка пути или места видна при старте
+            get_vector_index()
+
+        logger.info("Приложение запущено")
 
     async def shutdown(self, app: FastAPI):
         """Остановка приложения"""
-        pass
+        from app.core.settings import settings
+
+        if self.operation_poller:
+            await self.operation_poller.stop()
+        if self.history_compactor:
+            await self.history_compactor.stop()
+        if self.usage_flusher:
+            # После поллера и сжатия: их последние вызовы тоже попадут в БД
+            await self.usage_flusher.stop()
+        if self.iam_token_manager:
+            await self.iam_token_manager.stop()
+        if self.history_invalidation_listener:
+            await self.history_invalidation_listener.stop()
+        if settings.SEMANTIC_CACHE_ENABLED:
+            from app.services.v1.semantic_cache import close_vector_index
+
+            close_vector_index()
+        await self.redis_client.close()
+        await self.http_client.close()
+        logger.info("Приложение остановлено")
 
 
 @asynccontextmanager
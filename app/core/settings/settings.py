@@ -1,5 +1,5 @@
 import logging
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Literal
 
 from pydantic import SecretStr, RedisDsn, PostgresDsn
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -123,6 +123,9 @@ class Settings(BaseSettings):
     YANDEX_MAX_TOKENS: int = 2000
     YANDEX_MODEL_NAME: str = "yandexgpt-lite"
     YANDEX_API_URL: str = "https://llm.api.cloud.yandex.net/foundationModels/v1/completion"
+    YANDEX_ASYNC_API_URL: str = "https://llm.api.cloud.yandex.net/foundationModels/v1/completionAsync"
+    YANDEX_OPERATIONS_URL: str = "https://operation.api.cloud.yandex.net/operations"
+    YANDEX_TOKENIZE_URL: str = "https://llm.api.cloud.yandex.net/foundationModels/v1/tokenize"
     YANDEX_API_KEY: SecretStr
     YANDEX_PRIVATE_KEY: SecretStr
     YANDEX_KEY_ID: SecretStr
@@ -136,7 +139,322 @@ class Settings(BaseSettings):
         Returns:
             str: URI в формате gpt://{folder_id}/{model_name}
         """
-        return f"gpt://{self.YANDEX_FOLDER_ID.get_secret_value()}/{self.YANDEX_MODEL_NAME}"
+        return self.get_model_uri(self.YANDEX_MODEL_NAME)
+
+    def get_model_uri(self, model_name: str) -> str:
+        """
+        Формирует URI указанной модели Yandex GPT.
+
+        Args:
+            model_name: Имя модели, например yandexgpt-lite
+
+        Returns:
+            str: URI в формате gpt://{folder_id}/{model_name}
+        """
+        return f"gpt://{self.YANDEX_FOLDER_ID.get_secret_value()}/{model_name}"
+
+    # Настройки авторизации в Yandex API: api_key (статический ключ) или iam
+    # (IAM токен сервисного аккаунта по YANDEX_PRIVATE_KEY и YANDEX_KEY_ID)
+    YANDEX_AUTH_TYPE: Literal["api_key", "iam"] = "api_key"
+    YANDEX_IAM_URL: str = "https://iam.api.cloud.yandex.net/iam/v1/tokens"
+    YANDEX_IAM_TOKEN_REFRESH_INTERVAL: int = 3600
+    YANDEX_IAM_TOKEN_MIN_TTL: int = 300
+    YANDEX_IAM_TOKEN_LOCK_TTL: int = 10
+    YANDEX_IAM_TOKEN_RETRY_DELAY: float = 5.0
+
+    # Настройки окна контекста (обрезка истории под бюджет токенов модели)
+    CONTEXT_WINDOW_ENABLED: bool = True
+    CONTEXT_USE_TOKENIZER: bool = True
+    CONTEXT_TOKENIZE_THRESHOLD: float = 0.8
+    CONTEXT_CHARS_PER_TOKEN: float = 3.0
+    CONTEXT_MESSAGE_OVERHEAD: int = 4
+    CONTEXT_SAFETY_MARGIN: int = 64
+    # Одновременных запросов к tokenize API при подсчете одной истории
+    CONTEXT_TOKENIZE_CONCURRENCY: int = 4
+
+    # Настройки роутера моделей: выбор модели по размеру запроса, загрузке
+    # и наблюдаемым задержкам/ошибкам. Без роутинга всегда YANDEX_MODEL_NAME,
+    # одновременные запросы к моделям не ограничиваются
+    YANDEX_ROUTING_ENABLED: bool = False
+    YANDEX_ROUTING_MODELS: List[str] = ["yandexgpt-lite", "yandexgpt", "yandexgpt-32k"]
+    YANDEX_ROUTING_MAX_CONCURRENCY: Dict[str, int] = {}
+    YANDEX_ROUTING_DEFAULT_CONCURRENCY: int = 10
+    YANDEX_ROUTING_ACQUIRE_TIMEOUT: float = 5.0
+    YANDEX_ROUTING_EWMA_ALPHA: float = 0.2
+    YANDEX_ROUTING_DEFAULT_LATENCY: float = 1.0
+    YANDEX_ROUTING_ERROR_PENALTY: float = 5.0
+    YANDEX_ROUTING_MAX_ERROR_RATE: float = 0.5
+    YANDEX_ROUTING_ERROR_HALF_LIFE: float = 30.0
+
+    # Настройки деградации по задержке: если модель не ответила за
+    # YANDEX_FALLBACK_DEADLINE секунд (включая ожидание квоты и слота),
+    # вызов отменяется и запрос повторяется на более легкой модели из
+    # YANDEX_FALLBACK_MODELS (модель -> облегченная модель)
+    YANDEX_FALLBACK_ENABLED: bool = False
+    YANDEX_FALLBACK_DEADLINE: float = 10.0
+    YANDEX_FALLBACK_MODELS: Dict[str, str] = {
+        "yandexgpt": "yandexgpt-lite",
+        "llama": "llama-lite",
+    }
+
+    # Настройки хранения истории чата: blob - один JSON на всю историю
+    # (перезаписывается целиком на каждой реплике), list - список Redis
+    # (новые сообщения дописываются, хранятся последние
+    # CHAT_HISTORY_MAX_MESSAGES). История в формате blob переносится
+    # в список при первом чтении
+    CHAT_HISTORY_STORAGE: Literal["blob", "list"] = "blob"
+    CHAT_HISTORY_MAX_MESSAGES: int = 100
+    CHAT_HISTORY_TTL: int = 3600
+
+    # Ближний кэш истории чата: LRU разобранных сообщений в памяти
+    # процесса перед Redis. Каждая запись истории рассылает инвалидацию
+    # в канал CHAT_HISTORY_INVALIDATION_CHANNEL, кэш отвечает, только пока
+    # процесс подписан на канал (подписка занимает одно соединение пула).
+    # CHAT_HISTORY_NEAR_CACHE_TTL ограничивает устаревание записи, если
+    # инвалидация потерялась
+    CHAT_HISTORY_NEAR_CACHE_ENABLED: bool = False
+    CHAT_HISTORY_NEAR_CACHE_MAX_ENTRIES: int = 10000
+    CHAT_HISTORY_NEAR_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    CHAT_HISTORY_NEAR_CACHE_TTL: float = 30.0
+    CHAT_HISTORY_INVALIDATION_CHANNEL: str = "chat_history:invalidate"
+    CHAT_HISTORY_INVALIDATION_RETRY_DELAY: float = 1.0
+
+    @property
+    def history_invalidation_params(self) -> Dict[str, Any]:
+        """
+        Параметры подписки на инвалидацию ближнего кэша истории
+
+        Returns:
+            Dict с каналом и паузой перед переподпиской
+        """
+        return {
+            "channel": self.CHAT_HISTORY_INVALIDATION_CHANNEL,
+            "retry_delay": self.CHAT_HISTORY_INVALIDATION_RETRY_DELAY,
+        }
+
+    # Настройки сжатия длинной истории чата: когда история длиннее
+    # CHAT_COMPACTION_THRESHOLD токенов, фоновая задача заменяет старые
+    # реплики кратким содержанием от дешевой модели, последние
+    # CHAT_COMPACTION_KEEP_MESSAGES сообщений остаются как есть
+    CHAT_COMPACTION_ENABLED: bool = False
+    CHAT_COMPACTION_THRESHOLD: int = 3000
+    CHAT_COMPACTION_KEEP_MESSAGES: int = 6
+    CHAT_COMPACTION_MODEL: str = "yandexgpt-lite"
+    CHAT_COMPACTION_SUMMARY_TOKENS: int = 500
+    CHAT_COMPACTION_INTERVAL: float = 1.0
+    CHAT_COMPACTION_BATCH_SIZE: int = 10
+    CHAT_COMPACTION_LOCK_TTL: int = 120
+    CHAT_COMPACTION_PROMPT: str = (
+        "Кратко перескажи диалог пользователя с помощником: задачи пользователя, "
+        "принятые решения, важные факты, код и договоренности. Пиши от третьего "
+        "лица, без вступлений, не больше нескольких абзацев."
+    )
+
+    @property
+    def chat_compaction_params(self) -> Dict[str, Any]:
+        """
+        Параметры фонового сжатия истории чата
+
+        Returns:
+            Dict с порогом, числом сохраняемых сообщений и моделью для пересказа
+        """
+        return {
+            "threshold": self.CHAT_COMPACTION_THRESHOLD,
+            "keep_messages": self.CHAT_COMPACTION_KEEP_MESSAGES,
+            "model_name": self.CHAT_COMPACTION_MODEL,
+            "summary_tokens": self.CHAT_COMPACTION_SUMMARY_TOKENS,
+            "interval": self.CHAT_COMPACTION_INTERVAL,
+            "batch_size": self.CHAT_COMPACTION_BATCH_SIZE,
+        }
+
+    # Настройки учета расхода токенов: вызовы модели копятся в Redis,
+    # фоновая задача раз в USAGE_FLUSH_INTERVAL секунд агрегирует их
+    # и записывает в БД одной вставкой (таблица token_usage)
+    USAGE_ACCOUNTING_ENABLED: bool = False
+    USAGE_FLUSH_INTERVAL: float = 10.0
+    USAGE_FLUSH_BATCH_SIZE: int = 1000
+    USAGE_MAX_DAYS: int = 90
+
+    @property
+    def usage_flusher_params(self) -> Dict[str, Any]:
+        """
+        Параметры фоновой записи расхода токенов в БД
+
+        Returns:
+            Dict с интервалом и размером пакета записи
+        """
+        return {
+            "interval": self.USAGE_FLUSH_INTERVAL,
+            "batch_size": self.USAGE_FLUSH_BATCH_SIZE,
+        }
+
+    # Настройки пакетной генерации
+    BATCH_MAX_ITEMS: int = 100
+    BATCH_CONCURRENCY: int = 10
+
+    # Настройки кэша ответов модели (для детерминированных запросов)
+    COMPLETION_CACHE_ENABLED: bool = False
+    COMPLETION_CACHE_TTL: int = 3600
+    COMPLETION_CACHE_MAX_ENTRIES: int = 10000
+    COMPLETION_CACHE_MAX_TEMPERATURE: float = 0.3
+
+    # Настройки семантического кэша: вопрос без предыдущего диалога,
+    # похожий по смыслу на уже заданный, получает сохраненный ответ.
+    # Векторы вопросов - в файле индекса (memory-mapped, общий для воркеров
+    # узла), ответы - в Redis. Эмбеддинги: hashing (локально, без запросов)
+    # или yandex (Yandex text embedding API). Порог сходства у них разный
+    SEMANTIC_CACHE_ENABLED: bool = False
+    SEMANTIC_CACHE_EMBEDDER: Literal["hashing", "yandex"] = "hashing"
+    SEMANTIC_CACHE_INDEX_PATH: str = "data/semantic_cache.idx"
+    SEMANTIC_CACHE_DIMENSION: int = 256
+    SEMANTIC_CACHE_MAX_ENTRIES: int = 50000
+    SEMANTIC_CACHE_THRESHOLD: float = 0.9
+    SEMANTIC_CACHE_TTL: int = 86400
+    YANDEX_EMBEDDING_URL: str = "https://llm.api.cloud.yandex.net/foundationModels/v1/textEmbedding"
+    YANDEX_EMBEDDING_MODEL: str = "text-search-query"
+
+    # Настройки объединения одинаковых одновременных запросов (single-flight)
+    COALESCING_ENABLED: bool = False
+    COALESCING_DISTRIBUTED: bool = False
+    COALESCING_LOCK_TTL: int = 30
+    COALESCING_RESULT_TTL: int = 5
+    COALESCING_POLL_INTERVAL: float = 0.05
+
+    # Настройки повторов и circuit breaker для Yandex API
+    YANDEX_RETRY_ATTEMPTS: int = 3
+    YANDEX_RETRY_BACKOFF_MULTIPLIER: float = 0.5
+    YANDEX_RETRY_BACKOFF_MAX: float = 8.0
+    YANDEX_RETRY_MAX_DELAY: float = 30.0
+    YANDEX_CIRCUIT_FAILURE_THRESHOLD: int = 5
+    YANDEX_CIRCUIT_RECOVERY_TIMEOUT: float = 30.0
+    YANDEX_CIRCUIT_HALF_OPEN_MAX_CALLS: int = 1
+
+    @property
+    def circuit_breaker_params(self) -> Dict[str, Any]:
+        """
+        Параметры circuit breaker для эндпоинтов Yandex API
+
+        Returns:
+            Dict с порогом ошибок и временем восстановления
+        """
+        return {
+            "failure_threshold": self.YANDEX_CIRCUIT_FAILURE_THRESHOLD,
+            "recovery_timeout": self.YANDEX_CIRCUIT_RECOVERY_TIMEOUT,
+            "half_open_max_calls": self.YANDEX_CIRCUIT_HALF_OPEN_MAX_CALLS,
+        }
+
+    # Настройки хеджирования запросов к модели: если ответ (или первый
+    # фрагмент потока) не пришел за перцентиль недавних задержек, отправляется
+    # такой же запрос и используется тот, что ответит первым. Доля дублей
+    # ограничена YANDEX_HEDGING_MAX_RATE от числа запросов
+    YANDEX_HEDGING_ENABLED: bool = False
+    YANDEX_HEDGING_PERCENTILE: float = 95.0
+    YANDEX_HEDGING_MIN_DELAY: float = 0.1
+    YANDEX_HEDGING_MAX_RATE: float = 0.05
+    YANDEX_HEDGING_BURST: int = 10
+    YANDEX_HEDGING_WINDOW: int = 500
+    YANDEX_HEDGING_MIN_SAMPLES: int = 20
+
+    @property
+    def hedging_params(self) -> Dict[str, Any]:
+        """
+        Параметры хеджирования запросов к модели
+
+        Returns:
+            Dict с перцентилем задержки, лимитом доли дублей и окном замеров
+        """
+        return {
+            "percentile": self.YANDEX_HEDGING_PERCENTILE,
+            "min_delay": self.YANDEX_HEDGING_MIN_DELAY,
+            "max_rate": self.YANDEX_HEDGING_MAX_RATE,
+            "burst": self.YANDEX_HEDGING_BURST,
+            "window": self.YANDEX_HEDGING_WINDOW,
+            "min_samples": self.YANDEX_HEDGING_MIN_SAMPLES,
+        }
+
+    # Настройки ограничения частоты запросов к Yandex API на весь кластер
+    # (квота каталога: запросы в секунду и токены в минуту)
+    RATE_LIMIT_ENABLED: bool = False
+    RATE_LIMIT_REQUESTS_PER_SECOND: float = 10.0
+    RATE_LIMIT_REQUESTS_BURST: int = 10
+    RATE_LIMIT_TOKENS_PER_MINUTE: int = 100000
+    RATE_LIMIT_MAX_WAIT: float = 5.0
+
+    # Настройки квот пользователей: токены и запросы за календарный день
+    # и месяц (UTC), 0 - без ограничения. Под запрос резервируется оценка
+    # истории плюс максимум токенов ответа, после ответа - уточнение по Usage
+    USER_QUOTA_ENABLED: bool = False
+    USER_QUOTA_DAILY_TOKENS: int = 200000
+    USER_QUOTA_DAILY_REQUESTS: int = 1000
+    USER_QUOTA_MONTHLY_TOKENS: int = 3000000
+    USER_QUOTA_MONTHLY_REQUESTS: int = 20000
+
+    # Настройки опроса отложенных (асинхронных) операций Yandex GPT
+    YANDEX_OPERATION_POLL_MIN_INTERVAL: float = 0.5
+    YANDEX_OPERATION_POLL_MAX_INTERVAL: float = 10.0
+    YANDEX_OPERATION_POLL_BACKOFF: float = 1.5
+    YANDEX_OPERATION_POLL_IDLE_INTERVAL: float = 2.0
+    YANDEX_OPERATION_POLL_BATCH_SIZE: int = 20
+    # Аренда захваченной проверки: другой воркер повторит ее, только если
+    # захвативший не перенес проверку за это время (упал)
+    YANDEX_OPERATION_POLL_LEASE: float = 30.0
+    YANDEX_OPERATION_RESULT_TTL: int = 3600
+
+    @property
+    def operation_poller_params(self) -> Dict[str, Any]:
+        """
+        Параметры фонового опроса отложенных операций
+
+        Returns:
+            Dict с интервалами, размером пакета проверок и временем аренды
+        """
+        return {
+            "min_interval": self.YANDEX_OPERATION_POLL_MIN_INTERVAL,
+            "max_interval": self.YANDEX_OPERATION_POLL_MAX_INTERVAL,
+            "backoff": self.YANDEX_OPERATION_POLL_BACKOFF,
+            "idle_interval": self.YANDEX_OPERATION_POLL_IDLE_INTERVAL,
+            "batch_size": self.YANDEX_OPERATION_POLL_BATCH_SIZE,
+            "lease": self.YANDEX_OPERATION_POLL_LEASE,
+        }
+
+    # Настройки HTTP клиента (общий пул соединений к внешним API)
+    HTTP_POOL_LIMIT: int = 100
+    HTTP_POOL_LIMIT_PER_HOST: int = 20
+    HTTP_DNS_CACHE_TTL: int = 300
+    HTTP_KEEPALIVE_TIMEOUT: float = 30.0
+    HTTP_CONNECT_TIMEOUT: float = 5.0
+    HTTP_READ_TIMEOUT: float = 60.0
+    HTTP_TOTAL_TIMEOUT: float = 120.0
+
+    @property
+    def http_connector_params(self) -> Dict[str, Any]:
+        """
+        Формирует параметры для создания aiohttp.TCPConnector
+
+        Returns:
+            Dict с настройками пула соединений
+        """
+        return {
+            "limit": self.HTTP_POOL_LIMIT,
+            "limit_per_host": self.HTTP_POOL_LIMIT_PER_HOST,
+            "ttl_dns_cache": self.HTTP_DNS_CACHE_TTL,
+            "keepalive_timeout": self.HTTP_KEEPALIVE_TIMEOUT,
+            "enable_cleanup_closed": True,
+        }
+
+    @property
+    def http_timeout_params(self) -> Dict[str, Any]:
+        """
+        Формирует параметры для создания aiohttp.ClientTimeout
+
+        Returns:
+            Dict с таймаутами HTTP запросов
+        """
+        return {
+            "total": self.HTTP_TOTAL_TIMEOUT,
+            "connect": self.HTTP_CONNECT_TIMEOUT,
+            "sock_read": self.HTTP_READ_TIMEOUT,
+        }
 
     # Настройки Redis
     REDIS_USER: str = "default"
@@ -144,7 +462,16 @@ class Settings(BaseSettings):
     REDIS_HOST: str = "localhost"
     REDIS_PORT: int = 6379
     REDIS_DB: int = 0
+    # Один пул на процесс: не больше REDIS_POOL_SIZE соединений, запрос
+    # ждет свободного соединения до REDIS_POOL_TIMEOUT секунд
     REDIS_POOL_SIZE: int = 10
+    REDIS_POOL_TIMEOUT: float = 5.0
+    REDIS_SOCKET_TIMEOUT: float = 5.0
+    REDIS_CONNECT_TIMEOUT: float = 2.0
+    REDIS_HEALTH_CHECK_INTERVAL: int = 30
+    # Ключей за один вызов SCAN и в одной пачке обслуживающих операций
+    # (scan_batches, delete_matching, expire_matching)
+    REDIS_SCAN_COUNT: int = 1000
 
     @property
     def redis_dsn(self) -> RedisDsn:
@@ -163,9 +490,19 @@ class Settings(BaseSettings):
 
     @property
     def redis_params(self) -> Dict[str, Any]:
+        """
+        Параметры пула соединений Redis
+
+        Returns:
+            Dict с URL, размером пула, таймаутами и интервалом проверки соединений
+        """
         return {
             "url": self.redis_url,
-            "max_connections": self.REDIS_POOL_SIZE
+            "max_connections": self.REDIS_POOL_SIZE,
+            "timeout": self.REDIS_POOL_TIMEOUT,
+            "socket_timeout": self.REDIS_SOCKET_TIMEOUT,
+            "socket_connect_timeout": self.REDIS_CONNECT_TIMEOUT,
+            "health_check_interval": self.REDIS_HEALTH_CHECK_INTERVAL,
         }
 
     # Настройки CORS
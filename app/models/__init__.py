@@ -5,8 +5,10 @@
 """
 
 from .v1.base import BaseModel
+from .v1.usage import TokenUsageModel
 
 
 __all__ = [
     "BaseModel",
+    "TokenUsageModel",
 ]
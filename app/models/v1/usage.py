@@ -0,0 +1,46 @@
+"""
+Модуль usage.py содержит модель учета расхода токенов AI моделей.
+
+Одна запись - суммарный расход пользователя на одной модели за день,
+накопленный за один проход фоновой записи (UsageFlusher). Записей за
+один день может быть несколько, отчет по дням суммирует их.
+"""
+
+from datetime import date
+from decimal import Decimal
+from typing import Optional
+
+from sqlalchemy import BigInteger, Date, Index, Numeric, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .base import BaseModel
+
+
+class TokenUsageModel(BaseModel):
+    """
+    Агрегированный расход токенов
+
+    Args:
+        user_id (Mapped[Optional[int]]): Идентификатор пользователя (None - пакетные запросы).
+        day (Mapped[date]): День вызовов (UTC).
+        model (Mapped[str]): Имя модели.
+        async_mode (Mapped[bool]): Асинхронный (отложенный) режим.
+        requests (Mapped[int]): Количество вызовов.
+        input_tokens (Mapped[int]): Токенов в запросах.
+        completion_tokens (Mapped[int]): Токенов в ответах.
+        total_tokens (Mapped[int]): Всего токенов.
+        cost (Mapped[Decimal]): Стоимость в рублях по ModelPricing.
+    """
+
+    __tablename__ = "token_usage"
+    __table_args__ = (Index("ix_token_usage_user_id_day", "user_id", "day"),)
+
+    user_id: Mapped[Optional[int]] = mapped_column(nullable=True)
+    day: Mapped[date] = mapped_column(Date, index=True)
+    model: Mapped[str] = mapped_column(String(100))
+    async_mode: Mapped[bool] = mapped_column(default=False)
+    requests: Mapped[int] = mapped_column(default=0)
+    input_tokens: Mapped[int] = mapped_column(BigInteger, default=0)
+    completion_tokens: Mapped[int] = mapped_column(BigInteger, default=0)
+    total_tokens: Mapped[int] = mapped_column(BigInteger, default=0)
+    cost: Mapped[Decimal] = mapped_column(Numeric(14, 6), default=0)
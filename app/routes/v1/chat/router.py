@@ -1,10 +1,27 @@
-from fastapi import Form, Depends
-from sqlalchemy.ext.asyncio import AsyncSession
-from app.core.dependencies.providers.database import get_session
-from app.core.dependencies.providers.cache import get_chat_redis_storage
-from app.core.cache.chat import ChatRedisStorage
-from app.schemas import ChatResponse
+from typing import Optional, Union
+
+from fastapi import Form, Depends, Query
+from fastapi.responses import StreamingResponse
+from app.core.dependencies.providers.cache import (get_completion_cache_storage,
+                                                   get_semantic_cache_storage)
+from app.core.dependencies.providers.chat import get_chat_service
+from app.core.dependencies.providers.operations import get_operation_poller
+from app.core.dependencies.providers.usage import get_usage_service
+from app.core.cache.completion import CompletionCacheRedisStorage
+from app.core.cache.near_cache import get_history_near_cache
+from app.core.cache.semantic import SemanticCacheRedisStorage
+from app.core.integrations.hedging import get_hedgers_state
+from app.core.integrations.resilience import get_circuit_breakers_state
+from app.core.integrations.yandex_gpt.operations import OperationPoller
+from app.core.settings import settings
+from app.schemas import (BatchCompletionRequest, BatchCompletionResponse,
+                         ChatOperationResponse, ChatResponse,
+                         CompletionCacheStatsResponse, HistoryCacheStatsSchema,
+                         SemanticCacheStatsSchema,
+                         UpstreamStateResponse, UsageReportResponse)
 from app.services import ChatService
+from app.services.v1.routing import get_model_router
+from app.services.v1.usage import UsageService
 from app.routes.base import BaseRouter
 
 class ChatRouter(BaseRouter):
@@ -12,13 +29,16 @@ class ChatRouter(BaseRouter):
         super().__init__(prefix="chat", tags=["Chat"])
 
     def configure(self):
-        @self.router.post("/completion", response_model=ChatResponse)
+        @self.router.post(
+            "/completion", response_model=Union[ChatResponse, ChatOperationResponse]
+        )
         async def get_chat_completion(
             message: str = Form(...),
+            async_mode: bool = Form(False),
             # current_user: UserCredentialsSchema = Depends(get_current_user),
-            db_session: AsyncSession = Depends(get_session),
-            chat_redis_storage: ChatRedisStorage = Depends(get_chat_redis_storage),
-        ) -> ChatResponse:
+            chat_service: ChatService = Depends(get_chat_service),
+            operation_poller: OperationPoller = Depends(get_operation_poller),
+        ) -> Union[ChatResponse, ChatOperationResponse]:
             """
             # Получение ответа от YandexGPT
 
@@ -26,15 +46,21 @@ class ChatRouter(BaseRouter):
             * **message** - Текст сообщения пользователя
             * **async_mode** - Использовать асинхронный режим (дешевле в 2 раза)
             * **current_user** - Данные текущего пользователя
-            * **db_session** - Сессия базы данных
+            * **chat_service** - Сервис чата (сессия БД, Redis, общая HTTP сессия)
 
             ## Returns
+            * **ChatOperationResponse** - При async_mode: идентификатор операции
+              в статусе `pending`, результат забирается через
+              `GET /chat/operations/{operation_id}`
             * **AIChatResponse** - Ответ от модели:
                 * **success** - Признак успеха
                 * **result** - Результат генерации:
                     * **alternatives** - Варианты ответа
                     * **usage** - Статистика использования токенов
                     * **modelVersion** - Версия модели
+                * **model** - Модель, выбранная для запроса
+                * **fallback** - Основная модель не уложилась в дедлайн,
+                  ответ получен от облегченной модели (указана в **model**)
 
             ## Пример ответа
             ```json
@@ -54,9 +80,208 @@ class ChatRouter(BaseRouter):
                         "totalTokens": "25"
                     },
                     "modelVersion": "23.10.2024"
-                }
+                },
+                "model": "yandexgpt-lite",
+                "fallback": false
+            }
+            ```
+            """
+            if async_mode:
+                operation = await chat_service.submit_completion(message)#, current_user.id)
+                operation_poller.wake()
+                return operation
+            return await chat_service.get_completion(message)#, current_user.id)
+
+        @self.router.post("/completion/batch", response_model=BatchCompletionResponse)
+        async def get_batch_completion(
+            batch: BatchCompletionRequest,
+            chat_service: ChatService = Depends(get_chat_service),
+        ) -> BatchCompletionResponse:
+            """
+            # Пакетная генерация: несколько независимых запросов за один вызов
+
+            Запросы выполняются параллельно (не больше `BATCH_CONCURRENCY`
+            одновременно). История чата пользователя не используется:
+            у каждого запроса своя история в `history`.
+
+            ## Args
+            * **items** - Запросы (не больше `BATCH_MAX_ITEMS`):
+                * **message** - Текст сообщения пользователя
+                * **history** - История диалога (`role`, `text`)
+                * **temperature** / **maxTokens** - Настройки генерации
+
+            ## Returns
+            * **BatchCompletionResponse** - Результаты в порядке запросов:
+                * **results** - `index`, `success`, `result`/`model` или `error`/`error_type`
+                * **succeeded** / **failed** - Количество успешных и неудачных запросов
+
+            ## Пример запроса
+            ```json
+            {
+                "items": [
+                    {"message": "Что такое GIL?"},
+                    {
+                        "message": "А в 3.13?",
+                        "history": [{"role": "user", "text": "Что такое GIL?"}],
+                        "temperature": 0.2
+                    }
+                ]
             }
             ```
             """
-            chat_service = ChatService(db_session, chat_redis_storage)
-            return await chat_service.get_completion(message)#, current_user.id)
\ No newline at end of file
+            return await chat_service.get_batch_completion(batch.items)#, current_user.id)
+
+        @self.router.get(
+            "/operations/{operation_id}", response_model=ChatOperationResponse
+        )
+        async def get_chat_operation(
+            operation_id: str,
+            chat_service: ChatService = Depends(get_chat_service),
+        ) -> ChatOperationResponse:
+            """
+            # Получение результата отложенной генерации
+
+            ## Args
+            * **operation_id** - Идентификатор операции из ответа `/completion` с async_mode
+
+            ## Returns
+            * **ChatOperationResponse** - Статус операции:
+                * **status** - `pending`, `done` или `failed`
+                * **result** - Результат генерации (для `done`)
+                * **error** - Текст ошибки (для `failed`)
+            """
+            return await chat_service.get_operation(operation_id)
+
+        @self.router.get("/upstream", response_model=UpstreamStateResponse)
+        async def get_upstream_state() -> UpstreamStateResponse:
+            """
+            # Состояние upstream AI (для мониторинга)
+
+            Circuit breaker эндпоинтов Yandex API, нагрузка на модели
+            и хеджирование запросов в текущем воркере.
+
+            ## Returns
+            * **UpstreamStateResponse** - Состояние по эндпоинтам:
+                * **state** - `closed` (норма), `open` (вызовы отклоняются), `half_open`
+                * **failures** - Подряд идущие временные ошибки
+                * **retry_after** - Секунд до пробного вызова (для `open`)
+            * **models** - Нагрузка на модели:
+                * **in_flight** / **limit** - Занятые и всего слоты модели
+                * **latency** / **error_rate** - Сглаженные задержка и доля ошибок
+            * **hedging** - Хеджирование по моделям:
+                * **delay** - Задержка до отправки дубля (перцентиль задержек)
+                * **hedged** / **hedge_wins** - Отправлено дублей и сколько из них ответили первыми
+            """
+            return UpstreamStateResponse(
+                circuit_breakers=get_circuit_breakers_state(),
+                models=get_model_router().snapshot(),
+                hedging=get_hedgers_state(),
+            )
+
+        @self.router.get("/cache/stats", response_model=CompletionCacheStatsResponse)
+        async def get_completion_cache_stats(
+            completion_cache: CompletionCacheRedisStorage = Depends(get_completion_cache_storage),
+            semantic_cache: SemanticCacheRedisStorage = Depends(get_semantic_cache_storage),
+        ) -> CompletionCacheStatsResponse:
+            """
+            # Статистика кэша ответов модели
+
+            ## Returns
+            * **CompletionCacheStatsResponse** - Статистика:
+                * **enabled** - Кэш включен (`COMPLETION_CACHE_ENABLED`)
+                * **hits** / **misses** - Попадания и промахи
+                * **hit_rate** - Доля попаданий
+                * **size** - Количество записей в кэше
+                * **semantic** - То же для семантического кэша
+                  (`SEMANTIC_CACHE_ENABLED`), **size** / **capacity** -
+                  записи индекса этого узла
+                * **history** - Ближний кэш истории чата процесса, обработавшего
+                  запрос (`CHAT_HISTORY_NEAR_CACHE_ENABLED`): **active** -
+                  подписка на инвалидацию активна, **entries** / **bytes** -
+                  записи и оценка объема, **evictions** / **invalidations** -
+                  вытеснения по лимитам и удаления по инвалидации
+            """
+            stats = await completion_cache.get_stats()
+            semantic_index = None
+            if settings.SEMANTIC_CACHE_ENABLED:
+                from app.services.v1.semantic_cache import get_vector_index
+
+                semantic_index = get_vector_index()
+            history_cache = get_history_near_cache()
+            return CompletionCacheStatsResponse(
+                enabled=settings.COMPLETION_CACHE_ENABLED,
+                semantic=SemanticCacheStatsSchema(
+                    enabled=settings.SEMANTIC_CACHE_ENABLED,
+                    size=len(semantic_index) if semantic_index else 0,
+                    capacity=settings.SEMANTIC_CACHE_MAX_ENTRIES,
+                    **await semantic_cache.get_stats(),
+                ),
+                history=HistoryCacheStatsSchema(
+                    enabled=history_cache is not None,
+                    **(history_cache.get_stats() if history_cache else {}),
+                ),
+                **stats,
+            )
+
+        @self.router.get("/usage", response_model=UsageReportResponse)
+        async def get_token_usage(
+            user_id: Optional[int] = Query(None),
+            days: int = Query(30, ge=1, le=settings.USAGE_MAX_DAYS),
+            usage_service: UsageService = Depends(get_usage_service),
+        ) -> UsageReportResponse:
+            """
+            # Расход токенов и стоимость по дням
+
+            Учет ведется при `USAGE_ACCOUNTING_ENABLED`, вызовы попадают
+            в отчет с задержкой до `USAGE_FLUSH_INTERVAL` секунд.
+
+            ## Args
+            * **user_id** - Пользователь (без параметра - все пользователи)
+            * **days** - Количество дней, включая сегодняшний (UTC)
+
+            ## Returns
+            * **UsageReportResponse** - Отчет:
+                * **days** - Расход по дням и моделям: **requests**,
+                  **input_tokens**, **completion_tokens**, **total_tokens**,
+                  **cost** (рубли по тарифу модели)
+                * **total_tokens** / **total_cost** - Итог за период
+            """
+            return await usage_service.get_report(user_id, days)
+
+        @self.router.post("/completion/stream")
+        async def stream_chat_completion(
+            message: str = Form(...),
+            chat_service: ChatService = Depends(get_chat_service),
+        ) -> StreamingResponse:
+            """
+            # Потоковое получение ответа от YandexGPT (Server-Sent Events)
+
+            Ответ приходит по мере генерации, не дожидаясь полного текста.
+
+            ## Args
+            * **message** - Текст сообщения пользователя
+            * **chat_service** - Сервис чата (сессия БД, Redis, общая HTTP сессия)
+
+            ## Returns
+            * **text/event-stream** - Поток событий:
+                * **message** - Очередной фрагмент: `delta` (новый текст), `status`, `usage`
+                * **done** - Генерация завершена, `delta` содержит полный ответ
+                * **error** - Ошибка, текст в поле `message`
+
+            ## Пример потока
+            ```
+            event: message
+            data: {"success": true, "delta": "Отв", "status": "ALTERNATIVE_STATUS_PARTIAL", ...}
+
+            event: message
+            data: {"success": true, "delta": "ет", "status": "ALTERNATIVE_STATUS_FINAL", ...}
+
+            event: done
+            data: {"success": true, "delta": "Ответ", "status": "ALTERNATIVE_STATUS_FINAL", ...}
+            ```
+            """
+            return StreamingResponse(
+                chat_service.stream_completion(message),
+                media_type="text/event-stream",
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+            )
\ No newline at end of file
@@ -4,9 +4,19 @@ from .v1.base import (BaseInputSchema, BaseResponseSchema, BaseSchema,
                       ItemResponseSchema, ListResponseSchema)
 from .v1.pagination import Page, PaginationParams
 from .v1.users.schema import UserCredentialsSchema
-from .v1.chat.chat import (ChatRequest, ChatResponse,
-                               CompletionOptions, Message, MessageRole,
-                               ModelPricing, ModelType, ModelVersion, Result)
+from .v1.chat.chat import (BatchCompletionItem, BatchCompletionItemResult,
+                               BatchCompletionRequest, BatchCompletionResponse,
+                               ChatOperationResponse, ChatRequest, ChatResponse,
+                               ChatStreamChunk, CircuitBreakerSchema,
+                               CompletionCacheStatsResponse, CompletionOptions,
+                               DailyUsageSchema, HedgingSchema,
+                               HistoryCacheStatsSchema,
+                               Message, MessageRole,
+                               ModelLoadSchema, ModelPricing, ModelType, ModelVersion,
+                               OperationStatus, Result, SemanticCacheStatsSchema,
+                               TokenUsageRecord, TokenUsageSchema,
+                               UpstreamStateResponse,
+                               Usage, UsageReportResponse)
 
 
 
@@ -23,10 +33,29 @@ __all__ = [
     "UserCredentialsSchema",
     "ChatRequest",
     "ChatResponse",
+    "ChatStreamChunk",
+    "ChatOperationResponse",
+    "BatchCompletionItem",
+    "BatchCompletionRequest",
+    "BatchCompletionItemResult",
+    "BatchCompletionResponse",
+    "OperationStatus",
+    "CircuitBreakerSchema",
+    "UpstreamStateResponse",
+    "ModelLoadSchema",
+    "HedgingSchema",
+    "CompletionCacheStatsResponse",
+    "SemanticCacheStatsSchema",
+    "HistoryCacheStatsSchema",
     "Message",
     "MessageRole",
     "CompletionOptions",
     "Result",
+    "Usage",
+    "TokenUsageRecord",
+    "TokenUsageSchema",
+    "DailyUsageSchema",
+    "UsageReportResponse",
     "ModelPricing",
     "ModelType",
     "ModelVersion",
@@ -1,9 +1,12 @@
+import hashlib
+import json
+from datetime import date, datetime
 from enum import Enum
-from typing import List
+from typing import List, Optional
 
 from pydantic import Field
 
-from ..base import BaseInputSchema, BaseResponseSchema
+from ..base import BaseInputSchema, BaseResponseSchema, BaseSchema
 
 
 class MessageRole(str, Enum):
@@ -43,6 +46,60 @@ class ModelPricing(Enum):
     LLAMA_70B_SYNC = (6, 1.20)
     LLAMA_70B_ASYNC = (3, 0.60)
 
+    @property
+    def units(self) -> float:
+        """Юниты тарификации за 1000 токенов"""
+        return self.value[0]
+
+    @property
+    def price(self) -> float:
+        """Цена в рублях за 1000 токенов"""
+        return self.value[1]
+
+    @classmethod
+    def for_model(cls, model_name: str, async_mode: bool = False) -> "ModelPricing":
+        """
+        Тариф модели
+
+        Args:
+            model_name: Имя модели из URI, например yandexgpt-lite или yandexgpt/rc
+            async_mode: Асинхронный (отложенный) режим
+
+        Returns:
+            ModelPricing: Тариф (дообученные и неизвестные модели - по DataSphere)
+        """
+        families = {
+            ModelType.YANDEX_GPT_LITE.value: "YANDEX_GPT_LITE",
+            ModelType.YANDEX_GPT_PRO.value: "YANDEX_GPT_PRO",
+            ModelType.YANDEX_GPT_PRO_32K.value: "YANDEX_GPT_PRO",
+            ModelType.LLAMA_8B.value: "LLAMA_8B",
+            ModelType.LLAMA_70B.value: "LLAMA_70B",
+        }
+        family = families.get(model_name.split("/", 1)[0], "DATASPHERE")
+        return cls[f"{family}_{'ASYNC' if async_mode else 'SYNC'}"]
+
+    def cost(self, tokens: int) -> float:
+        """
+        Стоимость токенов в рублях
+
+        Args:
+            tokens: Количество токенов (запрос и ответ тарифицируются одинаково)
+
+        Returns:
+            float: Стоимость
+        """
+        return tokens * self.price / 1000
+
+
+class OperationStatus(str, Enum):
+    """
+    Статус отложенной (асинхронной) операции генерации
+    """
+
+    PENDING = "pending"
+    DONE = "done"
+    FAILED = "failed"
+
 
 class Message(BaseInputSchema):
     """
@@ -51,10 +108,16 @@ class Message(BaseInputSchema):
     Attributes:
         role: Роль отправителя сообщения
         text: Текст сообщения
+        tokens: Количество токенов в тексте (служебное поле: хранится вместе
+            с историей, но не отправляется в API и не попадает в ответы)
+        tokens_model: Модель, для которой посчитан tokens (служебное поле;
+            None - счетчик прежних версий, считается общим для всех моделей)
     """
 
     role: MessageRole
     text: str
+    tokens: Optional[int] = Field(default=None, exclude=True)
+    tokens_model: Optional[str] = Field(default=None, exclude=True)
 
 
 class ReasoningOptions(BaseInputSchema):
@@ -142,6 +205,31 @@ class ChatRequest(BaseInputSchema):
     completionOptions: CompletionOptions = Field(default_factory=CompletionOptions)
     messages: List[Message]
 
+    def fingerprint(self) -> str:
+        """
+        Канонический хэш запроса
+
+        Одинаковые по смыслу запросы (модель, сообщения, настройки генерации,
+        кроме режима stream) дают одинаковый хэш независимо от порядка полей.
+
+        Returns:
+            str: SHA-256 хэш запроса
+        """
+        payload = {
+            "modelUri": self.modelUri,
+            "messages": [
+                {"role": MessageRole(msg.role).value, "text": msg.text}
+                for msg in self.messages
+            ],
+            "completionOptions": self.completionOptions.model_dump(
+                mode="json", exclude={"stream"}
+            ),
+        }
+        canonical = json.dumps(
+            payload, sort_keys=True, ensure_ascii=False, separators=(",", ":")
+        )
+        return hashlib.sha256(canonical.encode()).hexdigest()
+
 
 class ChatResponse(BaseResponseSchema):
     """
@@ -150,7 +238,376 @@ class ChatResponse(BaseResponseSchema):
     Attributes:
         success: Флаг успешности запроса
         result: Результат генерации
+        cached: Ответ получен из кэша, а не от модели
+        model: Модель, выбранная для запроса
+        fallback: Основная модель не уложилась в дедлайн, ответ получен
+            от более легкой модели (указана в model)
     """
 
     success: bool = True
     result: Result
+    cached: bool = False
+    model: Optional[str] = None
+    fallback: bool = False
+
+
+class ChatStreamChunk(BaseResponseSchema):
+    """
+    Фрагмент потокового ответа AI чата (данные одного SSE события)
+
+    Attributes:
+        success: Флаг успешности запроса
+        delta: Текст, сгенерированный с момента предыдущего фрагмента
+        status: Статус генерации
+        usage: Статистика использования токенов
+        modelVersion: Версия модели
+        model: Модель, выбранная для запроса
+    """
+
+    success: bool = True
+    delta: str = ""
+    status: str
+    usage: Optional[Usage] = None
+    modelVersion: Optional[str] = None
+    model: Optional[str] = None
+
+
+class ChatOperationResponse(BaseResponseSchema):
+    """
+    Схема ответа для отложенной (асинхронной) генерации
+
+    Attributes:
+        success: Флаг успешности запроса
+        id: Идентификатор операции Yandex
+        status: Статус операции
+        result: Результат генерации (когда операция завершена)
+        error: Текст ошибки (если операция завершилась с ошибкой)
+    """
+
+    success: bool = True
+    id: str
+    status: OperationStatus
+    result: Optional[Result] = None
+    error: Optional[str] = None
+
+
+class BatchCompletionItem(BaseInputSchema):
+    """
+    Один независимый запрос пакетной генерации
+
+    Attributes:
+        message: Текст сообщения пользователя
+        history: История диалога (не берется из Redis и не сохраняется)
+        temperature: Температура генерации (по умолчанию YANDEX_TEMPERATURE)
+        maxTokens: Максимум токенов ответа (по умолчанию YANDEX_MAX_TOKENS)
+    """
+
+    message: str
+    history: List[Message] = Field(default_factory=list)
+    temperature: Optional[float] = Field(default=None, ge=0, le=1)
+    maxTokens: Optional[int] = Field(default=None, gt=0)
+
+
+class BatchCompletionRequest(BaseInputSchema):
+    """
+    Схема запроса пакетной генерации
+
+    Attributes:
+        items: Независимые запросы к модели
+    """
+
+    items: List[BatchCompletionItem] = Field(min_length=1)
+
+
+class BatchCompletionItemResult(BaseInputSchema):
+    """
+    Результат одного запроса пакетной генерации
+
+    Attributes:
+        index: Номер запроса в пакете
+        success: Флаг успешности запроса
+        result: Результат генерации (при успехе)
+        cached: Ответ получен из кэша, а не от модели
+        model: Модель, выбранная для запроса
+        error: Текст ошибки (при неудаче)
+        error_type: Тип ошибки (при неудаче)
+    """
+
+    index: int
+    success: bool
+    result: Optional[Result] = None
+    cached: bool = False
+    model: Optional[str] = None
+    error: Optional[str] = None
+    error_type: Optional[str] = None
+
+
+class BatchCompletionResponse(BaseResponseSchema):
+    """
+    Схема ответа пакетной генерации
+
+    Ошибка отдельного запроса не прерывает пакет: она возвращается
+    в результате этого запроса.
+
+    Attributes:
+        success: Флаг успешности запроса (пакет обработан)
+        results: Результаты в порядке запросов
+        succeeded: Количество успешных запросов
+        failed: Количество запросов с ошибкой
+    """
+
+    success: bool = True
+    results: List[BatchCompletionItemResult]
+    succeeded: int
+    failed: int
+
+
+class CircuitBreakerSchema(BaseInputSchema):
+    """
+    Состояние circuit breaker внешнего эндпоинта
+
+    Attributes:
+        name: Имя эндпоинта
+        state: Состояние (closed/open/half_open)
+        failures: Количество подряд идущих временных ошибок
+        total_failures: Всего временных ошибок с запуска процесса
+        total_rejected: Всего вызовов, отклоненных разомкнутой цепью
+        retry_after: Через сколько секунд цепь попробует восстановиться
+    """
+
+    name: str
+    state: str
+    failures: int
+    total_failures: int
+    total_rejected: int
+    retry_after: Optional[float] = None
+
+
+class ModelLoadSchema(BaseInputSchema):
+    """
+    Нагрузка и здоровье модели с точки зрения роутера
+
+    Attributes:
+        name: Имя модели
+        in_flight: Запросов к модели выполняется или ждет слота
+        limit: Максимум одновременных запросов к модели
+        latency: Сглаженная (EWMA) задержка ответа, секунды
+        error_rate: Сглаженная доля ошибок
+        requests: Всего запросов с запуска процесса
+        errors: Всего ошибок с запуска процесса
+    """
+
+    name: str
+    in_flight: int
+    limit: int
+    latency: Optional[float] = None
+    error_rate: float
+    requests: int
+    errors: int
+
+
+class HedgingSchema(BaseInputSchema):
+    """
+    Состояние хеджирования запросов к модели
+
+    Attributes:
+        name: Имя эндпоинта (completion:<модель>)
+        samples: Замеров задержки в окне
+        delay: Через сколько секунд без ответа отправляется дубль
+        requests: Всего запросов с запуска процесса
+        hedged: Всего отправлено дублей
+        hedge_wins: Сколько раз дубль ответил раньше основного запроса
+        budget_exhausted: Сколько дублей не отправлено из-за лимита доли
+    """
+
+    name: str
+    samples: int
+    delay: Optional[float] = None
+    requests: int
+    hedged: int
+    hedge_wins: int
+    budget_exhausted: int
+
+
+class UpstreamStateResponse(BaseResponseSchema):
+    """
+    Схема ответа с состоянием upstream AI для мониторинга
+
+    Attributes:
+        success: Флаг успешности запроса
+        circuit_breakers: Состояние circuit breaker по эндпоинтам
+        models: Нагрузка на модели (роутер моделей)
+        hedging: Хеджирование запросов по моделям
+    """
+
+    success: bool = True
+    circuit_breakers: List[CircuitBreakerSchema] = Field(default_factory=list)
+    models: List[ModelLoadSchema] = Field(default_factory=list)
+    hedging: List[HedgingSchema] = Field(default_factory=list)
+
+
+class SemanticCacheStatsSchema(BaseInputSchema):
+    """
+    Статистика семантического кэша
+
+    Attributes:
+        enabled: Кэш включен
+        hits: Количество попаданий
+        misses: Количество промахов
+        hit_rate: Доля попаданий
+        size: Записей в индексе узла
+        capacity: Емкость индекса
+    """
+
+    enabled: bool
+    hits: int
+    misses: int
+    hit_rate: float
+    size: int
+    capacity: int
+
+
+class HistoryCacheStatsSchema(BaseInputSchema):
+    """
+    Статистика ближнего кэша истории чата (процесса, обработавшего запрос)
+
+    Attributes:
+        enabled: Кэш включен
+        active: Подписка на инвалидацию активна, кэш отвечает
+        hits: Количество попаданий
+        misses: Количество промахов
+        hit_rate: Доля попаданий
+        entries: Пользователей в кэше
+        bytes: Оценка объема кэша
+        evictions: Вытеснено записей по лимитам
+        invalidations: Удалено записей по инвалидации
+    """
+
+    enabled: bool
+    active: bool = False
+    hits: int = 0
+    misses: int = 0
+    hit_rate: float = 0.0
+    entries: int = 0
+    bytes: int = 0
+    evictions: int = 0
+    invalidations: int = 0
+
+
+class CompletionCacheStatsResponse(BaseResponseSchema):
+    """
+    Схема ответа со статистикой кэша ответов модели
+
+    Attributes:
+        success: Флаг успешности запроса
+        enabled: Кэш включен
+        hits: Количество попаданий
+        misses: Количество промахов
+        hit_rate: Доля попаданий
+        size: Текущее количество записей
+        semantic: Статистика семантического кэша
+        history: Статистика ближнего кэша истории чата
+    """
+
+    success: bool = True
+    enabled: bool
+    hits: int
+    misses: int
+    hit_rate: float
+    size: int
+    semantic: Optional[SemanticCacheStatsSchema] = None
+    history: Optional[HistoryCacheStatsSchema] = None
+
+
+class TokenUsageRecord(BaseInputSchema):
+    """
+    Расход токенов одним вызовом модели (буфер учета в Redis)
+
+    Attributes:
+        user_id: Идентификатор пользователя (None для пакетных запросов)
+        model: Имя модели
+        async_mode: Вызов в асинхронном (отложенном) режиме
+        input_tokens: Токенов в запросе
+        completion_tokens: Токенов в ответе
+        created_at: Время вызова
+    """
+
+    user_id: Optional[int] = None
+    model: str
+    async_mode: bool = False
+    input_tokens: int
+    completion_tokens: int
+    created_at: datetime
+
+
+class TokenUsageSchema(BaseSchema):
+    """
+    Агрегированный расход токенов (запись таблицы token_usage)
+
+    Attributes:
+        user_id: Идентификатор пользователя
+        day: День (UTC)
+        model: Имя модели
+        async_mode: Асинхронный режим
+        requests: Количество вызовов
+        input_tokens: Токенов в запросах
+        completion_tokens: Токенов в ответах
+        total_tokens: Всего токенов
+        cost: Стоимость в рублях по ModelPricing
+    """
+
+    user_id: Optional[int] = None
+    day: date
+    model: str
+    async_mode: bool
+    requests: int
+    input_tokens: int
+    completion_tokens: int
+    total_tokens: int
+    cost: float
+
+
+class DailyUsageSchema(BaseInputSchema):
+    """
+    Расход токенов модели за день
+
+    Attributes:
+        day: День (UTC)
+        model: Имя модели
+        requests: Количество вызовов
+        input_tokens: Токенов в запросах
+        completion_tokens: Токенов в ответах
+        total_tokens: Всего токенов
+        cost: Стоимость в рублях
+    """
+
+    day: date
+    model: str
+    requests: int
+    input_tokens: int
+    completion_tokens: int
+    total_tokens: int
+    cost: float
+
+
+class UsageReportResponse(BaseResponseSchema):
+    """
+    Схема ответа с расходом токенов по дням
+
+    Attributes:
+        success: Флаг успешности запроса
+        user_id: Пользователь (None - все пользователи)
+        date_from: Первый день отчета
+        date_to: Последний день отчета
+        days: Расход по дням и моделям
+        total_tokens: Всего токенов за период
+        total_cost: Стоимость за период в рублях
+    """
+
+    success: bool = True
+    user_id: Optional[int] = None
+    date_from: date
+    date_to: date
+    days: List[DailyUsageSchema] = Field(default_factory=list)
+    total_tokens: int = 0
+    total_cost: float = 0.0
@@ -1,7 +1,7 @@
 import logging
-from typing import Any, Callable, Generic, List, Optional, Type, TypeVar
+from typing import Any, Callable, Dict, Generic, List, Optional, Type, TypeVar
 
-from sqlalchemy import asc, delete, desc, func, select
+from sqlalchemy import asc, delete, desc, func, insert, select
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.sql.expression import Executable
@@ -82,6 +82,33 @@ class BaseDataManager(SessionMixin, Generic[T]):
             self.logger.error("❌ Ошибка при добавлении: %s", e)
             raise
 
+    async def add_many(self, rows: List[Dict[str, Any]]) -> int:
+        """
+        Добавляет несколько записей одним INSERT (без загрузки объектов в сессию).
+
+        Args:
+            rows (List[Dict[str, Any]]): Значения полей записей.
+
+        Returns:
+            int: Количество добавленных записей.
+
+        Raises:
+            SQLAlchemyError: Если произошла ошибка при добавлении.
+
+        Usage:
+            await self.add_many([{"name": "a"}, {"name": "b"}])
+        """
+        if not rows:
+            return 0
+        try:
+            await self.session.execute(insert(self.model), rows)
+            await self.session.commit()
+            return len(rows)
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            self.logger.error("❌ Ошибка при пакетном добавлении: %s", e)
+            raise
+
     async def get_one(self, select_statement: Executable) -> Any | None:
         """
         Получает одну запись из базы данных.
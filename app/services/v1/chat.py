@@ -1,13 +1,38 @@
+import asyncio
 import logging
+from typing import AsyncIterator, List, Optional
 
+import aiohttp
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.settings import settings
+from app.core.integrations.coalescing import CompletionCoalescer
+from app.core.integrations.quota import UserQuota
+from app.core.integrations.rate_limit import RateLimiter
+from app.core.integrations.yandex_gpt.auth import IAMTokenManager
 from app.core.integrations.yandex_gpt.text import ChatHttpClient
 from app.core.cache.chat import ChatRedisStorage
-from app.schemas import (ChatRequest, ChatResponse, CompletionOptions,
-                         Message, MessageRole)
+from app.core.cache.coalescing import CoalescingRedisStorage
+from app.core.cache.completion import CompletionCacheRedisStorage
+from app.core.cache.operations import OperationRedisStorage
+from app.core.cache.quota import QuotaRedisStorage
+from app.core.cache.rate_limit import RateLimitRedisStorage
+from app.core.cache.semantic import SemanticCacheRedisStorage
+from app.core.cache.usage import UsageRedisStorage
+from app.core.exceptions import (ChatBatchTooLargeError,
+                                 ChatDeadlineExceededError,
+                                 ChatOperationNotFoundError,
+                                 ChatQuotaExceededError,
+                                 ChatRateLimitError,
+                                 ChatUpstreamUnavailableError)
+from app.schemas import (BatchCompletionItem, BatchCompletionItemResult,
+                         BatchCompletionResponse, ChatOperationResponse,
+                         ChatRequest, ChatResponse, ChatStreamChunk,
+                         CompletionOptions, Message, MessageRole)
 from app.services.v1.base import BaseService
+from app.services.v1.context import ContextWindowManager
+from app.services.v1.routing import get_model_name, get_model_router
+from app.services.v1.usage import UsageRecorder
 
 logger = logging.getLogger(__name__)
 
@@ -18,6 +43,15 @@ class ChatService(BaseService):
 
     Attributes:
         session: Сессия базы данных
+        storage: Redis хранилище истории чата
+        operation_storage: Redis хранилище отложенных операций
+        completion_cache: Redis кэш ответов модели
+        semantic_cache: Семантический кэш ответов (похожие вопросы)
+        coalescer: Объединение одинаковых одновременных запросов
+        router: Выбор модели и ограничение одновременных запросов к ней
+        rate_limiter: Ограничение частоты запросов к Yandex API на весь кластер
+        usage: Учет расхода токенов
+        quota: Квоты пользователей на токены и запросы
         http_client: HTTP клиент для работы с AI API
     """
 
@@ -25,14 +59,287 @@ class ChatService(BaseService):
         self,
         session: AsyncSession,
         storage: ChatRedisStorage,
+        http_session: Optional[aiohttp.ClientSession] = None,
+        operation_storage: Optional[OperationRedisStorage] = None,
+        completion_cache: Optional[CompletionCacheRedisStorage] = None,
+        coalescing_storage: Optional[CoalescingRedisStorage] = None,
+        iam_token_manager: Optional[IAMTokenManager] = None,
+        rate_limit_storage: Optional[RateLimitRedisStorage] = None,
+        semantic_cache_storage: Optional[SemanticCacheRedisStorage] = None,
+        usage_storage: Optional[UsageRedisStorage] = None,
+        quota_storage: Optional[QuotaRedisStorage] = None,
     ):
         super().__init__(session)
         self.storage = storage
-        self.http_client = ChatHttpClient()
+        self.operation_storage = operation_storage
+        self.completion_cache = completion_cache
+        self.coalescer = CompletionCoalescer(coalescing_storage)
+        self.http_client = ChatHttpClient(http_session, iam_token_manager)
         self.max_tokens = settings.YANDEX_MAX_TOKENS
+        self.context_window = ContextWindowManager(
+            self.http_client, settings.YANDEX_MODEL_NAME, self.max_tokens
+        )
+        self.router = get_model_router()
+        self.rate_limiter = RateLimiter(rate_limit_storage)
+        self.usage = UsageRecorder(usage_storage)
+        self.quota = UserQuota(quota_storage)
+        self.semantic_cache = None
+        if semantic_cache_storage and settings.SEMANTIC_CACHE_ENABLED:
+            # numpy нужен только семантическому кэшу: без него импорт не нужен
+            from app.core.integrations.embeddings import create_embedder
+            from app.services.v1.semantic_cache import SemanticCache
+
+            self.semantic_cache = SemanticCache(
+                semantic_cache_storage, create_embedder(self.http_client)
+            )
 
     SYSTEM_MESSAGE = Message(role=MessageRole.SYSTEM.value, text=settings.YANDEX_PRE_INSTRUCTIONS)
 
+    async def _build_request(
+        self,
+        message_history: List[Message],
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        model_name: Optional[str] = None,
+    ) -> ChatRequest:
+        """
+        Формирует запрос к модели из истории сообщений
+
+        Модель выбирает роутер по размеру истории и загрузке моделей.
+        Старые реплики, не помещающиеся в бюджет токенов выбранной модели,
+        в запрос не попадают (см. ContextWindowManager).
+
+        Args:
+            message_history: История сообщений вместе с новым сообщением
+            temperature: Температура генерации (по умолчанию YANDEX_TEMPERATURE)
+            max_tokens: Максимум токенов ответа (по умолчанию YANDEX_MAX_TOKENS)
+            model_name: Модель без выбора роутером (например, резервная)
+
+        Returns:
+            ChatRequest: Запрос к AI модели
+        """
+        max_tokens = max_tokens or self.max_tokens
+        model_name = model_name or self.router.select(
+            self.context_window.estimate([self.SYSTEM_MESSAGE] + message_history),
+            lambda name: self.context_window.get_budget(name, max_tokens),
+        )
+        messages = await self.context_window.fit(
+            self.SYSTEM_MESSAGE, message_history, model_name, max_tokens
+        )
+        self._adopt_token_counts(message_history, messages[1:])
+
+        return ChatRequest(
+            modelUri=settings.get_model_uri(model_name),
+            completionOptions=CompletionOptions(
+                temperature=(
+                    temperature if temperature is not None else settings.YANDEX_TEMPERATURE
+                ),
+                maxTokens=str(max_tokens),
+            ),
+            messages=messages,
+        )
+
+    @staticmethod
+    def _adopt_token_counts(message_history: List[Message], window: List[Message]) -> None:
+        """
+        Переносит в историю копии сообщений с посчитанными счетчиками токенов
+
+        Окно запроса - конец истории; сообщения, посчитанные в окне, заменяют
+        в списке истории исходные (сами исходные объекты не меняются) и
+        сохраняются вместе с историей.
+        """
+        offset = len(message_history) - len(window)
+        for index, message in enumerate(window, start=offset):
+            if message is not message_history[index]:
+                message_history[index] = message
+
+    async def _complete(
+        self, request: ChatRequest, user_id: Optional[int] = None
+    ) -> ChatResponse:
+        """
+        Выполняет запрос к модели с учетом кэша ответов
+
+        Сначала проверяется точный кэш, затем семантический (ответ на
+        похожий вопрос). Одинаковые одновременные запросы объединяются
+        в один вызов модели.
+
+        Args:
+            request: Запрос к AI модели
+            user_id: Пользователь, на которого учитывается расход токенов
+
+        Returns:
+            ChatResponse: Ответ модели или ответ из кэша
+        """
+        fingerprint = request.fingerprint()
+
+        use_cache = bool(
+            self.completion_cache and self.completion_cache.is_cacheable(request)
+        )
+        if use_cache:
+            cached = await self.completion_cache.get_response(fingerprint)
+            if cached:
+                logger.debug("Ответ получен из кэша: %s", fingerprint)
+                return cached
+
+        question_vector = None
+        if self.semantic_cache:
+            cached, question_vector = await self.semantic_cache.lookup(request)
+            if cached:
+                return cached
+
+        response = await self.coalescer.run(
+            fingerprint, lambda: self._call_model(request, user_id)
+        )
+
+        if use_cache and response.success:
+            await self.completion_cache.save_response(fingerprint, response)
+        if question_vector is not None and response.success:
+            await self.semantic_cache.store(request, question_vector, response)
+
+        return response
+
+    @staticmethod
+    def _get_fallback_model(model_name: str) -> Optional[str]:
+        """
+        Облегченная модель, на которую переключается запрос после дедлайна
+
+        Returns:
+            Optional[str]: Имя модели или None, если деградация не настроена
+        """
+        if not settings.YANDEX_FALLBACK_ENABLED:
+            return None
+        fallback_model = settings.YANDEX_FALLBACK_MODELS.get(model_name)
+        return fallback_model if fallback_model != model_name else None
+
+    async def _call_model(
+        self, request: ChatRequest, user_id: Optional[int] = None
+    ) -> ChatResponse:
+        """
+        Вызывает модель из запроса, занимая ее слот в роутере
+
+        Перед вызовом запрос ждет квоты Yandex API (ограничитель кластера),
+        резерв токенов уточняется по Usage ответа. Если у модели есть
+        облегченная замена, весь вызов вместе с ожиданием квоты и слота
+        модели ограничен YANDEX_FALLBACK_DEADLINE.
+        Расход токенов учитывается на пользователя.
+
+        Args:
+            request: Запрос к AI модели
+            user_id: Пользователь, на которого учитывается расход токенов
+
+        Returns:
+            ChatResponse: Ответ модели с именем модели
+
+        Raises:
+            ChatDeadlineExceededError: Если модель не ответила за дедлайн
+        """
+        model_name = get_model_name(request.modelUri)
+        fallback_model = self._get_fallback_model(model_name)
+        deadline = asyncio.timeout(
+            settings.YANDEX_FALLBACK_DEADLINE if fallback_model is not None else None
+        )
+
+        try:
+            async with deadline, self.rate_limiter.reserve(
+                self.context_window.estimate(request.messages)
+            ) as reservation:
+                async with self.router.lease(model_name):
+                    response = await self.http_client.get_completion(request)
+                reservation.used = int(response.result.usage.totalTokens)
+        except TimeoutError:
+            if not deadline.expired():
+                raise
+            raise ChatDeadlineExceededError(
+                model_name, settings.YANDEX_FALLBACK_DEADLINE, fallback_model
+            )
+        await self.usage.record(user_id, model_name, response.result.usage)
+        return response.model_copy(update={"model": model_name})
+
+    async def _complete_with_fallback(
+        self,
+        message_history: List[Message],
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        user_id: Optional[int] = None,
+    ) -> ChatResponse:
+        """
+        Получает ответ модели, при дедлайне - от облегченной модели
+
+        Запрос к облегченной модели собирается заново: ее окно контекста
+        может быть меньше, и старые реплики обрезаются под него.
+
+        Args:
+            message_history: История сообщений вместе с новым сообщением
+            temperature: Температура генерации
+            max_tokens: Максимум токенов ответа
+            user_id: Пользователь, на которого учитывается расход токенов
+
+        Returns:
+            ChatResponse: Ответ модели (fallback=True, если от облегченной)
+        """
+        request = await self._build_request(message_history, temperature, max_tokens)
+        try:
+            return await self._complete(request, user_id)
+        except ChatDeadlineExceededError as e:
+            logger.warning(
+                "Модель %s не ответила за %g с, запрос переключен на %s",
+                e.model,
+                e.deadline,
+                e.fallback_model,
+            )
+            fallback_model = e.fallback_model
+
+        request = await self._build_request(
+            message_history, temperature, max_tokens, model_name=fallback_model
+        )
+        response = await self._complete(request, user_id)
+        return response.model_copy(update={"fallback": True})
+
+    def _quota_tokens(
+        self, message_history: List[Message], max_tokens: Optional[int] = None
+    ) -> int:
+        """
+        Резерв квоты пользователя под запрос: оценка истории с системным
+        сообщением и максимум токенов ответа (уточняется по Usage)
+        """
+        history_tokens = self.context_window.estimate([self.SYSTEM_MESSAGE] + message_history)
+        return history_tokens + (max_tokens or self.max_tokens)
+
+    async def _save_history(
+        self,
+        user_id: int,
+        stored_history: List[Message],
+        message_history: List[Message],
+    ) -> None:
+        """
+        Дописывает новые сообщения в историю и при превышении порога ставит
+        ее на сжатие
+
+        Прежние сообщения, для которых за реплику посчитаны счетчики токенов
+        (в message_history они заменены копиями), сохраняются той же записью.
+        Сжатие выполняет фоновая задача (HistoryCompactor), ответ
+        пользователю его не ждет.
+
+        Args:
+            user_id: Идентификатор пользователя
+            stored_history: История в том виде, в каком прочитана из хранилища
+            message_history: История вместе с новыми сообщениями реплики
+        """
+        updates = {
+            index: (stored, message_history[index])
+            for index, stored in enumerate(stored_history)
+            if message_history[index] is not stored
+        }
+        await self.storage.append_messages(
+            user_id, message_history[len(stored_history):], updates
+        )
+        if (
+            settings.CHAT_COMPACTION_ENABLED
+            and self.context_window.estimate(message_history)
+            > settings.CHAT_COMPACTION_THRESHOLD
+        ):
+            await self.storage.request_compaction(user_id)
+
     async def get_completion(
         self, message: str,
         user_id: int = 1, # временно, пока нет авторизации
@@ -50,6 +357,7 @@ class ChatService(BaseService):
         try:
             # Получаем историю
             message_history = await self.storage.get_chat_history(user_id)
+            stored_history = list(message_history)
 
             # Создаем новое сообщение
             new_message = Message(role=role, text=message)
@@ -57,31 +365,289 @@ class ChatService(BaseService):
             # Добавляем новое сообщение в историю
             message_history.append(new_message)
 
-            # Формируем полный список сообщений
-            messages = [self.SYSTEM_MESSAGE] + message_history
+            async with self.quota.reserve(
+                user_id, self._quota_tokens(message_history)
+            ) as quota:
+                response = await self._complete_with_fallback(message_history, user_id=user_id)
+                # Ответ из кэша модель не вызывал
+                quota.used = 0 if response.cached else int(response.result.usage.totalTokens)
 
-            request = ChatRequest(
-                modelUri=settings.yandex_model_uri,
-                completionOptions=CompletionOptions(maxTokens=str(self.max_tokens)),
-                messages=messages,
-            )
-
-            async with self.http_client as client:
-                response = await client.get_completion(request)
+            # Добавляем ответ ассистента в историю
+            if response.success:
+                assistant_message = Message(
+                    role=MessageRole.ASSISTANT,
+                    text=response.result.alternatives[0].message.text,
+                    tokens=int(response.result.usage.completionTokens),
+                    tokens_model=response.model,
+                )
+                message_history.append(assistant_message)
 
-                # Добавляем ответ ассистента в историю
-                if response.success:
-                    assistant_message = Message(
-                        role=MessageRole.ASSISTANT,
-                        text=response.result.alternatives[0].message.text,
-                    )
-                    message_history.append(assistant_message)
+                # Сохраняем обновленную историю
+                await self._save_history(user_id, stored_history, message_history)
 
-                    # Сохраняем обновленную историю
-                    await self.storage.save_chat_history(user_id, message_history)
-
-                return response
+            return response
+        except (
+            ChatDeadlineExceededError,
+            ChatQuotaExceededError,
+            ChatRateLimitError,
+            ChatUpstreamUnavailableError,
+        ):
+            # Upstream временно недоступен или исчерпана квота: история
+            # не повреждена, запрос можно повторить
+            raise
         except Exception as e:
             logger.error("Error in get_completion: %s", str(e))
             await self.storage.clear_chat_history(user_id)
             raise
+
+    async def get_item_completion(
+        self,
+        item: BatchCompletionItem,
+        index: int = 0,
+        user_id: int = 1, # временно, пока нет авторизации
+    ) -> BatchCompletionItemResult:
+        """
+        Выполняет один независимый запрос (пакетная и офлайн обработка)
+
+        История чата пользователя не читается и не меняется, квота и расход
+        токенов учитываются на пользователя. Ошибка (в том числе исчерпанная
+        квота) не выбрасывается, а возвращается в результате.
+
+        Args:
+            item: Запрос с собственной историей и настройками генерации
+            index: Номер запроса (для сопоставления результатов)
+            user_id: Пользователь, на которого учитываются квота и расход
+
+        Returns:
+            BatchCompletionItemResult: Результат или ошибка запроса
+        """
+        message_history = item.history + [Message(role=MessageRole.USER, text=item.message)]
+        try:
+            async with self.quota.reserve(
+                user_id, self._quota_tokens(message_history, item.maxTokens)
+            ) as quota:
+                response = await self._complete_with_fallback(
+                    message_history,
+                    temperature=item.temperature,
+                    max_tokens=item.maxTokens,
+                    user_id=user_id,
+                )
+                quota.used = 0 if response.cached else int(response.result.usage.totalTokens)
+            return BatchCompletionItemResult(
+                index=index,
+                success=response.success,
+                result=response.result,
+                cached=response.cached,
+                model=response.model,
+            )
+        except Exception as e:
+            error = str(getattr(e, "detail", e))
+            logger.warning("Ошибка в запросе %d пакета: %s", index, error)
+            return BatchCompletionItemResult(
+                index=index,
+                success=False,
+                error=error,
+                error_type=getattr(e, "error_type", "ai_completion_error"),
+            )
+
+    async def get_batch_completion(
+        self,
+        items: List[BatchCompletionItem],
+        user_id: int = 1, # временно, пока нет авторизации
+    ) -> BatchCompletionResponse:
+        """
+        Выполняет пакет независимых запросов к модели
+
+        Запросы выполняются параллельно (не больше BATCH_CONCURRENCY
+        одновременно) на общей HTTP сессии, с кэшем, объединением
+        одинаковых запросов, роутингом и ограничением частоты, как и
+        одиночные. История чата пользователя не читается и не меняется.
+        Квота пользователя резервируется на каждый запрос: запросы сверх
+        квоты возвращаются с ошибкой ai_quota_exceeded.
+
+        Args:
+            items: Запросы пакета
+            user_id: Пользователь, на которого учитываются квота и расход
+
+        Returns:
+            BatchCompletionResponse: Результаты и ошибки по каждому запросу
+
+        Raises:
+            ChatBatchTooLargeError: Если запросов больше BATCH_MAX_ITEMS
+        """
+        if len(items) > settings.BATCH_MAX_ITEMS:
+            raise ChatBatchTooLargeError(len(items), settings.BATCH_MAX_ITEMS)
+
+        semaphore = asyncio.Semaphore(settings.BATCH_CONCURRENCY)
+
+        async def run(index: int, item: BatchCompletionItem) -> BatchCompletionItemResult:
+            async with semaphore:
+                return await self.get_item_completion(item, index, user_id)
+
+        results = await asyncio.gather(
+            *(run(index, item) for index, item in enumerate(items))
+        )
+
+        succeeded = sum(1 for result in results if result.success)
+        return BatchCompletionResponse(
+            results=results, succeeded=succeeded, failed=len(results) - succeeded
+        )
+
+    async def submit_completion(
+        self, message: str,
+        user_id: int = 1, # временно, пока нет авторизации
+        role: MessageRole = MessageRole.USER
+    ) -> ChatOperationResponse:
+        """
+        Отправляет запрос в асинхронном режиме (в 2 раза дешевле)
+
+        Возвращает идентификатор операции сразу, не дожидаясь генерации.
+        Результат забирает фоновый поллер: он сохраняет его в Redis и
+        добавляет сообщение пользователя и ответ ассистента в историю.
+
+        Args:
+            message: Текст сообщения пользователя
+            user_id: Идентификатор пользователя
+            role: Роль отправителя сообщения
+
+        Returns:
+            ChatOperationResponse: Операция в статусе pending
+        """
+        message_history = await self.storage.get_chat_history(user_id)
+        new_message = Message(role=role, text=message)
+
+        request = await self._build_request(message_history + [new_message])
+
+        # Usage придет только с результатом операции: резервы не уточняются
+        async with self.quota.reserve(
+            user_id, self._quota_tokens(message_history + [new_message])
+        ) as quota:
+            async with self.rate_limiter.reserve(
+                self.context_window.estimate(request.messages)
+            ) as reservation:
+                operation_id = await self.http_client.submit_completion(request)
+                reservation.used = reservation.reserved
+            quota.used = quota.reserved
+
+        return await self.operation_storage.add_pending(
+            operation_id, user_id, new_message, model=get_model_name(request.modelUri)
+        )
+
+    async def get_operation(self, operation_id: str) -> ChatOperationResponse:
+        """
+        Получает статус и результат отложенной операции
+
+        Args:
+            operation_id: Идентификатор операции Yandex
+
+        Returns:
+            ChatOperationResponse: Статус операции и результат, если она завершена
+
+        Raises:
+            ChatOperationNotFoundError: Если операция не найдена
+        """
+        operation = await self.operation_storage.get_operation(operation_id)
+        if operation is None:
+            raise ChatOperationNotFoundError(operation_id)
+        return operation
+
+    @staticmethod
+    def _sse_event(event: str, data: str) -> str:
+        """
+        Форматирует событие Server-Sent Events
+        """
+        return f"event: {event}\ndata: {data}\n\n"
+
+    async def stream_completion(
+        self, message: str,
+        user_id: int = 1, # временно, пока нет авторизации
+        role: MessageRole = MessageRole.USER
+    ) -> AsyncIterator[str]:
+        """
+        Получает ответ от модели в потоковом режиме (SSE)
+
+        Каждый фрагмент от модели отправляется клиенту как событие `message`
+        с приращением текста. После завершения генерации ответ ассистента
+        сохраняется в историю и отправляется событие `done`, при ошибке -
+        событие `error`.
+
+        Args:
+            message: Текст сообщения пользователя
+            user_id: Идентификатор пользователя
+            role: Роль отправителя сообщения
+
+        Yields:
+            str: Очередное SSE событие
+        """
+        try:
+            message_history = await self.storage.get_chat_history(user_id)
+            stored_history = list(message_history)
+            message_history.append(Message(role=role, text=message))
+
+            request = await self._build_request(message_history)
+
+            model_name = get_model_name(request.modelUri)
+
+            text = ""
+            last_chunk: Optional[ChatStreamChunk] = None
+            async with self.quota.reserve(
+                user_id, self._quota_tokens(message_history)
+            ) as quota, self.rate_limiter.reserve(
+                self.context_window.estimate(request.messages)
+            ) as reservation:
+                async with self.router.lease(model_name):
+                    async for response in self.http_client.stream_completion(request):
+                        alternative = response.result.alternatives[0]
+                        # Yandex присылает накопленный текст, клиенту отдаем только приращение
+                        current_text = alternative.message.text
+                        delta = (
+                            current_text[len(text):]
+                            if current_text.startswith(text)
+                            else current_text
+                        )
+                        text = current_text
+
+                        last_chunk = ChatStreamChunk(
+                            delta=delta,
+                            status=alternative.status,
+                            usage=response.result.usage,
+                            modelVersion=response.result.modelVersion,
+                            model=model_name,
+                        )
+                        yield self._sse_event("message", last_chunk.model_dump_json())
+                if last_chunk and last_chunk.usage:
+                    reservation.used = int(last_chunk.usage.totalTokens)
+                    quota.used = reservation.used
+            await self.usage.record(user_id, model_name, last_chunk.usage if last_chunk else None)
+
+            message_history.append(
+                Message(
+                    role=MessageRole.ASSISTANT,
+                    text=text,
+                    tokens=(
+                        int(last_chunk.usage.completionTokens)
+                        if last_chunk and last_chunk.usage
+                        else None
+                    ),
+                    tokens_model=model_name,
+                )
+            )
+            await self._save_history(user_id, stored_history, message_history)
+
+            if last_chunk is not None:
+                last_chunk = last_chunk.model_copy(update={"delta": text})
+            yield self._sse_event(
+                "done", last_chunk.model_dump_json() if last_chunk else "{}"
+            )
+        except Exception as e:
+            logger.error("Error in stream_completion: %s", str(e))
+            if not isinstance(
+                e, (ChatQuotaExceededError, ChatRateLimitError, ChatUpstreamUnavailableError)
+            ):
+                await self.storage.clear_chat_history(user_id)
+            error = ChatStreamChunk(
+                success=False,
+                status="ERROR",
+                message=str(getattr(e, "detail", e)),
+            )
+            yield self._sse_event("error", error.model_dump_json())
@@ -0,0 +1,218 @@
+"""
+Фоновое сжатие длинной истории чата.
+
+История хранится целиком до истечения TTL, поэтому в долгой сессии каждый
+запрос к модели длиннее предыдущего. Когда история длиннее порога, сервис
+чата ставит пользователя в очередь в Redis, а фоновая задача (одна на
+процесс, очередь общая) пересказывает старые реплики дешевой моделью и
+заменяет их одним системным сообщением с кратким содержанием. Последние
+keep_messages сообщений не трогаются. Пересказ идет вне запроса
+пользователя: ответ не ждет сжатия.
+
+Пока модель пишет пересказ, пользователь может продолжить диалог: замена
+атомарная и выполняется, только если история все еще начинается
+с пересказанных сообщений (ChatRedisStorage.replace_history_prefix).
+Прежний пересказ попадает в следующий вместе со старыми репликами.
+"""
+
+import asyncio
+import logging
+from typing import List, Optional
+
+from app.core.cache.chat import ChatRedisStorage
+from app.core.cache.rate_limit import RateLimitRedisStorage
+from app.core.cache.usage import UsageRedisStorage
+from app.core.integrations.rate_limit import RateLimiter
+from app.core.integrations.yandex_gpt.text import ChatHttpClient
+from app.core.settings import settings
+from app.schemas import ChatRequest, CompletionOptions, Message, MessageRole
+from app.services.v1.context import ContextWindowManager
+from app.services.v1.usage import UsageRecorder
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_PREFIX = "Краткое содержание предыдущей части диалога:\n"
+
+
+class HistoryCompactor:
+    """
+    Фоновое сжатие истории чата пересказом старых реплик
+
+    Attributes:
+        http_client: Клиент Yandex API на общей HTTP сессии
+        storage: Хранилище истории чата (и очереди сжатия)
+        rate_limiter: Ограничитель частоты запросов к Yandex API
+        usage: Учет расхода токенов (пересказ учитывается на пользователя)
+        threshold: Размер истории в токенах, после которого она сжимается
+        keep_messages: Сколько последних сообщений не пересказывать
+        model_name: Модель для пересказа
+        summary_tokens: Максимум токенов пересказа
+    """
+
+    def __init__(
+        self,
+        http_client: ChatHttpClient,
+        storage: ChatRedisStorage,
+        rate_limit_storage: Optional[RateLimitRedisStorage] = None,
+        threshold: int = 3000,
+        keep_messages: int = 6,
+        model_name: str = "yandexgpt-lite",
+        summary_tokens: int = 500,
+        interval: float = 1.0,
+        batch_size: int = 10,
+        usage_storage: Optional[UsageRedisStorage] = None,
+    ) -> None:
+        self.http_client = http_client
+        self.storage = storage
+        self.rate_limiter = RateLimiter(rate_limit_storage)
+        self.usage = UsageRecorder(usage_storage)
+        self.threshold = threshold
+        self.keep_messages = max(1, keep_messages)
+        self.model_name = model_name
+        self.summary_tokens = summary_tokens
+        self.interval = interval
+        self.batch_size = batch_size
+        self.context_window = ContextWindowManager(http_client, model_name, summary_tokens)
+
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Запускает фоновую задачу сжатия"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="history-compactor")
+            logger.info("Сжатие истории чата запущено")
+
+    async def stop(self) -> None:
+        """Останавливает фоновую задачу сжатия"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            logger.info("Сжатие истории чата остановлено")
+
+    def needs_compaction(self, history: List[Message]) -> bool:
+        """
+        Проверяет, пора ли сжимать историю
+
+        Args:
+            history: История чата
+
+        Returns:
+            bool: True, если история длиннее порога и есть что пересказывать
+        """
+        return (
+            len(history) > self.keep_messages + 1
+            and self.context_window.estimate(history) > self.threshold
+        )
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                user_ids = await self.storage.pop_compaction_requests(self.batch_size)
+                if user_ids:
+                    await asyncio.gather(*(self.compact(user_id) for user_id in user_ids))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Ошибка при сжатии истории чата: %s", str(e))
+
+            await asyncio.sleep(self.interval)
+
+    def _select_prefix(self, history: List[Message]) -> List[Message]:
+        """
+        Старые сообщения для пересказа
+
+        Берутся все, кроме последних keep_messages, но не больше, чем
+        помещается в окно модели пересказа: остаток сожмется следующим
+        проходом.
+        """
+        candidates = history[: len(history) - self.keep_messages]
+        budget = self.context_window.budget - self.context_window.estimate(
+            [Message(role=MessageRole.SYSTEM, text=settings.CHAT_COMPACTION_PROMPT)]
+        )
+
+        prefix: List[Message] = []
+        used = 0
+        for message in candidates:
+            used += self.context_window.message_tokens(message)
+            if used > budget:
+                break
+            prefix.append(message)
+        return prefix
+
+    async def _summarize(self, user_id: int, messages: List[Message]) -> Message:
+        """Пересказывает сообщения дешевой моделью"""
+        roles = {
+            MessageRole.USER: "Пользователь",
+            MessageRole.ASSISTANT: "Помощник",
+            MessageRole.SYSTEM: "Контекст",
+        }
+        transcript = "\n\n".join(
+            f"{roles[MessageRole(message.role)]}: {message.text}" for message in messages
+        )
+        request = ChatRequest(
+            modelUri=settings.get_model_uri(self.model_name),
+            completionOptions=CompletionOptions(
+                temperature=0.1, maxTokens=str(self.summary_tokens)
+            ),
+            messages=[
+                Message(role=MessageRole.SYSTEM, text=settings.CHAT_COMPACTION_PROMPT),
+                Message(role=MessageRole.USER, text=transcript),
+            ],
+        )
+
+        async with self.rate_limiter.reserve(
+            self.context_window.estimate(request.messages) + self.summary_tokens
+        ) as reservation:
+            response = await self.http_client.get_completion(request)
+            reservation.used = int(response.result.usage.totalTokens)
+        await self.usage.record(user_id, self.model_name, response.result.usage)
+
+        text = SUMMARY_PREFIX + response.result.alternatives[0].message.text
+        return Message(role=MessageRole.SYSTEM, text=text)
+
+    async def compact(self, user_id: int) -> bool:
+        """
+        Сжимает историю пользователя, если она длиннее порога
+
+        Args:
+            user_id: Идентификатор пользователя
+
+        Returns:
+            bool: True, если старые сообщения заменены пересказом
+        """
+        lock_token = await self.storage.lock_compaction(user_id)
+        if lock_token is None:
+            # Историю уже сжимает другой воркер
+            return False
+
+        try:
+            history = await self.storage.get_chat_history(user_id)
+            if not self.needs_compaction(history):
+                return False
+
+            prefix = self._select_prefix(history)
+            if len(prefix) < 2:
+                return False
+
+            summary = await self._summarize(user_id, prefix)
+            replaced = await self.storage.replace_history_prefix(user_id, prefix, summary)
+            if replaced:
+                logger.info(
+                    "История пользователя %s сжата: %d сообщений (~%d токенов) -> ~%d токенов",
+                    user_id,
+                    len(prefix),
+                    self.context_window.estimate(prefix),
+                    self.context_window.message_tokens(summary),
+                )
+            else:
+                logger.debug("История пользователя %s изменилась, сжатие пропущено", user_id)
+            return replaced
+        except Exception as e:
+            logger.warning("Не удалось сжать историю пользователя %s: %s", user_id, str(e))
+            return False
+        finally:
+            await self.storage.unlock_compaction(user_id, lock_token)
@@ -0,0 +1,246 @@
+import asyncio
+import logging
+import math
+from typing import Dict, List, Optional
+
+from app.core.integrations.yandex_gpt.text import ChatHttpClient
+from app.core.settings import settings
+from app.schemas import Message, MessageRole, ModelType
+
+logger = logging.getLogger(__name__)
+
+# Размер контекста (токены на запрос и ответ вместе) по типам моделей
+MODEL_CONTEXT_WINDOWS: Dict[ModelType, int] = {
+    ModelType.YANDEX_GPT_LITE: 8192,
+    ModelType.YANDEX_GPT_PRO: 8192,
+    ModelType.YANDEX_GPT_PRO_32K: 32768,
+    ModelType.LLAMA_8B: 8192,
+    ModelType.LLAMA_70B: 8192,
+    ModelType.CUSTOM: 8192,
+}
+
+
+def get_model_type(model_name: str) -> ModelType:
+    """
+    Определяет тип модели по имени (неизвестные модели считаются CUSTOM)
+
+    Args:
+        model_name: Имя модели, например yandexgpt-lite или yandexgpt/rc
+
+    Returns:
+        ModelType: Тип модели
+    """
+    try:
+        return ModelType(model_name.split("/")[0])
+    except ValueError:
+        return ModelType.CUSTOM
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Быстрая локальная оценка количества токенов
+
+    Оценка намеренно завышенная (CONTEXT_CHARS_PER_TOKEN символов на токен),
+    чтобы окно не переполнялось, когда точный подсчет недоступен.
+
+    Args:
+        text: Текст сообщения
+
+    Returns:
+        int: Оценка количества токенов
+    """
+    return max(1, math.ceil(len(text) / settings.CONTEXT_CHARS_PER_TOKEN))
+
+
+class ContextWindowManager:
+    """
+    Управление окном контекста: обрезка истории под бюджет токенов модели
+
+    Бюджет на запрос = размер контекста модели - maxTokens на ответ -
+    запас. Пока оценка истории заметно меньше бюджета, используются уже
+    известные счетчики и локальная оценка. Когда история приближается к
+    бюджету, недостающие счетчики запрашиваются у tokenize API (не больше
+    CONTEXT_TOKENIZE_CONCURRENCY запросов одновременно). Счетчик привязан
+    к модели (tokens_model): токенизаторы моделей различаются. Сообщения
+    не изменяются - посчитанные счетчики возвращаются в копиях, которые
+    вызывающий код сохраняет вместе с историей в Redis. Если история не
+    помещается, отбрасываются самые старые реплики; новое сообщение
+    пользователя остается всегда.
+
+    Attributes:
+        http_client: Клиент Yandex API
+        model_name: Имя модели
+        max_tokens: Максимум токенов на ответ модели
+    """
+
+    def __init__(self, http_client: ChatHttpClient, model_name: str, max_tokens: int):
+        self.http_client = http_client
+        self.model_name = model_name
+        self.max_tokens = max_tokens
+
+    @property
+    def budget(self) -> int:
+        """Бюджет токенов на сообщения запроса к модели по умолчанию"""
+        return self.get_budget(self.model_name)
+
+    def get_budget(self, model_name: str, max_tokens: Optional[int] = None) -> int:
+        """
+        Бюджет токенов на сообщения запроса к указанной модели
+
+        Args:
+            model_name: Имя модели
+            max_tokens: Максимум токенов ответа (по умолчанию max_tokens менеджера)
+
+        Returns:
+            int: Размер контекста модели за вычетом ответа и запаса
+        """
+        context_window = MODEL_CONTEXT_WINDOWS[get_model_type(model_name)]
+        return (
+            context_window
+            - (max_tokens or self.max_tokens)
+            - settings.CONTEXT_SAFETY_MARGIN
+        )
+
+    @staticmethod
+    def has_tokens(message: Message, model_name: Optional[str] = None) -> bool:
+        """
+        Известен ли точный счетчик токенов сообщения для модели
+
+        Args:
+            message: Сообщение
+            model_name: Модель (None - подходит счетчик любой модели)
+        """
+        return message.tokens is not None and (
+            model_name is None or message.tokens_model in (None, model_name)
+        )
+
+    @classmethod
+    def message_tokens(cls, message: Message, model_name: Optional[str] = None) -> int:
+        """
+        Количество токенов сообщения с учетом служебной разметки роли
+
+        Используется точный счетчик, если он известен для модели, иначе оценка.
+        """
+        tokens = (
+            message.tokens
+            if cls.has_tokens(message, model_name)
+            else estimate_tokens(message.text)
+        )
+        return tokens + settings.CONTEXT_MESSAGE_OVERHEAD
+
+    def estimate(self, messages: List[Message], model_name: Optional[str] = None) -> int:
+        """
+        Оценка токенов списка сообщений по известным счетчикам и локальной оценке
+        """
+        return sum(self.message_tokens(message, model_name) for message in messages)
+
+    async def count_tokens(
+        self, messages: List[Message], model_name: Optional[str] = None
+    ) -> List[Message]:
+        """
+        Запрашивает точные счетчики токенов для сообщений, где их еще нет
+
+        Исходные сообщения не изменяются (они могут быть общими, например
+        системное сообщение или история из ближнего кэша): сообщения с новым
+        счетчиком возвращаются копиями. Ошибки tokenize API не прерывают
+        запрос: для таких сообщений остается локальная оценка.
+
+        Args:
+            messages: Сообщения
+            model_name: Модель запроса (по умолчанию model_name менеджера)
+
+        Returns:
+            List[Message]: Сообщения в том же порядке, посчитанные - копиями
+        """
+        model_name = model_name or self.model_name
+        counted = list(messages)
+        missing = [
+            index
+            for index, message in enumerate(messages)
+            if not self.has_tokens(message, model_name)
+        ]
+        if not missing:
+            return counted
+
+        model_uri = settings.get_model_uri(model_name)
+        semaphore = asyncio.Semaphore(settings.CONTEXT_TOKENIZE_CONCURRENCY)
+
+        async def count(text: str) -> int:
+            async with semaphore:
+                return await self.http_client.count_tokens(text, model_uri)
+
+        results = await asyncio.gather(
+            *(count(messages[index].text) for index in missing),
+            return_exceptions=True,
+        )
+        for index, result in zip(missing, results):
+            if isinstance(result, int):
+                counted[index] = messages[index].model_copy(
+                    update={"tokens": result, "tokens_model": model_name}
+                )
+            else:
+                logger.warning("Не удалось посчитать токены: %s", str(result))
+        return counted
+
+    async def fit(
+        self,
+        system_message: Message,
+        history: List[Message],
+        model_name: Optional[str] = None,
+        max_tokens: Optional[int] = None,
+    ) -> List[Message]:
+        """
+        Формирует список сообщений запроса, помещающийся в бюджет
+
+        Args:
+            system_message: Системное сообщение (всегда в начале запроса)
+            history: История вместе с новым сообщением пользователя в конце
+            model_name: Модель запроса (по умолчанию model_name менеджера)
+            max_tokens: Максимум токенов ответа (по умолчанию max_tokens менеджера)
+
+        Returns:
+            List[Message]: Системное сообщение и самые новые реплики,
+            помещающиеся в бюджет (сообщения с новым счетчиком - копии,
+            окно - всегда конец истории)
+        """
+        if not settings.CONTEXT_WINDOW_ENABLED:
+            return [system_message] + history
+
+        model_name = model_name or self.model_name
+        budget = self.get_budget(model_name, max_tokens)
+        messages = [system_message] + history
+        estimated = self.estimate(messages, model_name)
+
+        if (
+            settings.CONTEXT_USE_TOKENIZER
+            and estimated > budget * settings.CONTEXT_TOKENIZE_THRESHOLD
+        ):
+            messages = await self.count_tokens(messages, model_name)
+            estimated = self.estimate(messages, model_name)
+
+        if estimated <= budget:
+            return messages
+
+        # Набираем реплики с конца, пока помещаются в бюджет
+        system_message, history = messages[0], messages[1:]
+        remaining = budget - self.message_tokens(system_message, model_name)
+        window: List[Message] = []
+        for message in reversed(history):
+            tokens = self.message_tokens(message, model_name)
+            if window and tokens > remaining:
+                break
+            window.append(message)
+            remaining -= tokens
+        window.reverse()
+
+        # Окно начинается с реплики пользователя, а не с ответа ассистента
+        while len(window) > 1 and window[0].role != MessageRole.USER:
+            window.pop(0)
+
+        logger.debug(
+            "История обрезана под бюджет %d токенов: %d из %d сообщений",
+            budget,
+            len(window),
+            len(history),
+        )
+        return [system_message] + window
@@ -0,0 +1,263 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+from app.core.exceptions import (ChatCompletionError,
+                                 ChatDeadlineExceededError,
+                                 ChatUpstreamUnavailableError)
+from app.core.settings import settings
+from app.services.v1.context import MODEL_CONTEXT_WINDOWS, get_model_type
+
+logger = logging.getLogger(__name__)
+
+
+def get_context_window(model_name: str) -> int:
+    """Размер контекста модели в токенах"""
+    return MODEL_CONTEXT_WINDOWS[get_model_type(model_name)]
+
+
+def get_model_name(model_uri: str) -> str:
+    """
+    Извлекает имя модели из URI
+
+    Args:
+        model_uri: URI вида gpt://{folder_id}/{model_name}
+
+    Returns:
+        str: Имя модели, например yandexgpt-lite или yandexgpt/rc
+    """
+    return model_uri.split("/", 3)[-1]
+
+
+class ModelStats:
+    """
+    Нагрузка и здоровье одной модели в текущем процессе
+
+    Задержка и доля ошибок сглаживаются EWMA, доля ошибок к тому же
+    затухает со временем: модель, исключенная из ротации из-за ошибок,
+    через несколько периодов полураспада снова получает запросы.
+
+    Attributes:
+        name: Имя модели
+        limit: Максимум одновременных запросов к модели
+        semaphore: Слоты одновременных запросов
+        in_flight: Запросов к модели выполняется или ждет слота
+        latency: Сглаженная задержка ответа, секунды
+    """
+
+    def __init__(self, name: str, limit: int) -> None:
+        self.name = name
+        self.limit = limit
+        self.in_flight = 0
+        self.latency: Optional[float] = None
+        self.requests = 0
+        self.errors = 0
+
+        self.semaphore = asyncio.Semaphore(limit)
+        self._error_rate = 0.0
+        self._error_updated_at = time.monotonic()
+
+    @property
+    def saturated(self) -> bool:
+        """Все слоты модели заняты (или уже обещаны ожидающим)"""
+        return self.in_flight >= self.limit
+
+    @property
+    def error_rate(self) -> float:
+        """Сглаженная доля ошибок с учетом затухания"""
+        elapsed = time.monotonic() - self._error_updated_at
+        return self._error_rate * 0.5 ** (elapsed / settings.YANDEX_ROUTING_ERROR_HALF_LIFE)
+
+    @property
+    def healthy(self) -> bool:
+        """Доля ошибок ниже порога исключения из ротации"""
+        return self.error_rate < settings.YANDEX_ROUTING_MAX_ERROR_RATE
+
+    def score(self) -> float:
+        """
+        Ожидаемая стоимость запроса к модели (меньше - лучше)
+
+        Задержка растет с загрузкой модели и штрафуется за ошибки.
+        """
+        latency = self.latency if self.latency is not None else settings.YANDEX_ROUTING_DEFAULT_LATENCY
+        return (
+            latency
+            * (1 + self.in_flight / self.limit)
+            * (1 + settings.YANDEX_ROUTING_ERROR_PENALTY * self.error_rate)
+        )
+
+    def record(self, latency: float, failed: bool) -> None:
+        """Учитывает завершенный запрос"""
+        alpha = settings.YANDEX_ROUTING_EWMA_ALPHA
+        self.requests += 1
+        if failed:
+            self.errors += 1
+        else:
+            self.latency = latency if self.latency is None else (
+                alpha * latency + (1 - alpha) * self.latency
+            )
+        self._error_rate = alpha * float(failed) + (1 - alpha) * self.error_rate
+        self._error_updated_at = time.monotonic()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Состояние для мониторинга"""
+        return {
+            "name": self.name,
+            "in_flight": self.in_flight,
+            "limit": self.limit,
+            "latency": round(self.latency, 3) if self.latency is not None else None,
+            "error_rate": round(self.error_rate, 3),
+            "requests": self.requests,
+            "errors": self.errors,
+        }
+
+
+class ModelRouter:
+    """
+    Выбор модели для запроса с учетом размера, загрузки и здоровья моделей
+
+    - Модель должна вместить запрос: бюджет контекста модели не меньше
+      оценки токенов запроса. Из подходящих сначала рассматриваются модели
+      с наименьшим контекстом (32k используется, только если иначе никак
+      или меньшие модели перегружены/нездоровы).
+    - Среди моделей одного размера выбирается модель с наименьшей
+      ожидаемой стоимостью (EWMA задержки с учетом загрузки и ошибок).
+    - Количество одновременных запросов к каждой модели ограничено
+      (квоты Yandex считаются по моделям), см. lease().
+
+    Без YANDEX_ROUTING_ENABLED всегда выбирается YANDEX_MODEL_NAME и
+    одновременные запросы не ограничиваются; статистика моделей работает.
+    """
+
+    def __init__(self) -> None:
+        self._models: Dict[str, ModelStats] = {}
+
+    def get_stats(self, model_name: str) -> ModelStats:
+        """
+        Возвращает статистику модели (создается при первом обращении)
+
+        Args:
+            model_name: Имя модели
+
+        Returns:
+            ModelStats: Статистика модели в текущем процессе
+        """
+        if model_name not in self._models:
+            limit = settings.YANDEX_ROUTING_MAX_CONCURRENCY.get(
+                model_name, settings.YANDEX_ROUTING_DEFAULT_CONCURRENCY
+            )
+            self._models[model_name] = ModelStats(model_name, limit)
+        return self._models[model_name]
+
+    def select(self, prompt_tokens: int, budget: Callable[[str], int]) -> str:
+        """
+        Выбирает модель для запроса
+
+        Args:
+            prompt_tokens: Оценка токенов запроса (вся история)
+            budget: Бюджет токенов запроса для модели (см. ContextWindowManager)
+
+        Returns:
+            str: Имя модели
+        """
+        if not settings.YANDEX_ROUTING_ENABLED or not settings.YANDEX_ROUTING_MODELS:
+            return settings.YANDEX_MODEL_NAME
+
+        candidates = [
+            model_name
+            for model_name in settings.YANDEX_ROUTING_MODELS
+            if budget(model_name) >= prompt_tokens
+        ]
+        if not candidates:
+            # Запрос не помещается никуда - берем самый большой контекст,
+            # история будет обрезана под него
+            candidates = [max(settings.YANDEX_ROUTING_MODELS, key=get_context_window)]
+
+        stats = [self.get_stats(model_name) for model_name in candidates]
+        for window in sorted({get_context_window(item.name) for item in stats}):
+            available = [
+                item
+                for item in stats
+                if get_context_window(item.name) == window
+                and item.healthy
+                and not item.saturated
+            ]
+            if available:
+                choice = min(available, key=ModelStats.score)
+                break
+        else:
+            # Все модели перегружены или нездоровы - ждем наименее загруженную
+            choice = min(stats, key=ModelStats.score)
+
+        logger.debug(
+            "Выбрана модель %s для запроса ~%d токенов", choice.name, prompt_tokens
+        )
+        return choice.name
+
+    @asynccontextmanager
+    async def lease(self, model_name: str) -> AsyncIterator[ModelStats]:
+        """
+        Занимает слот модели на время запроса и учитывает его результат
+
+        Слоты ограничены только с YANDEX_ROUTING_ENABLED, без роутинга
+        запрос лишь учитывается в статистике.
+
+        Args:
+            model_name: Имя модели
+
+        Raises:
+            ChatUpstreamUnavailableError: Если слот не освободился за
+                YANDEX_ROUTING_ACQUIRE_TIMEOUT секунд
+        """
+        stats = self.get_stats(model_name)
+        # Ожидающие слота тоже считаются нагрузкой, иначе всплеск запросов
+        # уйдет в одну модель до того, как первые из них займут слоты
+        stats.in_flight += 1
+        limited = settings.YANDEX_ROUTING_ENABLED
+        if limited:
+            try:
+                await asyncio.wait_for(
+                    stats.semaphore.acquire(), timeout=settings.YANDEX_ROUTING_ACQUIRE_TIMEOUT
+                )
+            except BaseException as e:
+                stats.in_flight -= 1
+                if isinstance(e, asyncio.TimeoutError):
+                    raise ChatUpstreamUnavailableError(
+                        f"модель {model_name} перегружена",
+                        retry_after=settings.YANDEX_ROUTING_ACQUIRE_TIMEOUT,
+                    ) from e
+                raise
+
+        started = time.monotonic()
+        failed = False
+        try:
+            yield stats
+        except asyncio.CancelledError:
+            # Отмена клиентом не говорит о здоровье модели
+            started = None
+            raise
+        except (
+            ChatCompletionError, ChatDeadlineExceededError, ChatUpstreamUnavailableError
+        ):
+            failed = True
+            raise
+        finally:
+            stats.in_flight -= 1
+            if limited:
+                stats.semaphore.release()
+            if started is not None:
+                stats.record(time.monotonic() - started, failed)
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """Состояние всех моделей процесса для мониторинга"""
+        return [item.snapshot() for item in self._models.values()]
+
+
+_model_router = ModelRouter()
+
+
+def get_model_router() -> ModelRouter:
+    """Возвращает роутер моделей (один на процесс)"""
+    return _model_router
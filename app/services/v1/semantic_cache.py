@@ -0,0 +1,165 @@
+"""
+Семантический кэш ответов модели.
+
+Точный кэш (по хэшу запроса) промахивается на перефразированных вопросах,
+а в FAQ-трафике их большинство. Семантический кэш сравнивает эмбеддинг
+вопроса с эмбеддингами уже заданных и при сходстве не ниже
+SEMANTIC_CACHE_THRESHOLD возвращает сохраненный ответ без вызова модели.
+
+Кэшируются только вопросы без предыдущего диалога (системное сообщение
+и одно сообщение пользователя): ответ на реплику в середине разговора
+зависит от контекста, а не только от ее текста. Записи разделены по
+модели и системному сообщению, температура ограничена, как у точного кэша.
+Ошибки кэша (например, недоступен API эмбеддингов) не ломают запрос.
+
+Example:
+    >>> cache = SemanticCache(storage, HashingEmbedder(256))
+    >>> cached, vector = await cache.lookup(request)
+    >>> if cached is None:
+    ...     response = await call_model(request)
+    ...     await cache.store(request, vector, response)
+"""
+
+import asyncio
+import logging
+import zlib
+from typing import Optional, Tuple
+
+import numpy as np
+
+from app.core.cache.semantic import SemanticCacheRedisStorage
+from app.core.cache.vector_index import VectorIndex
+from app.core.integrations.embeddings import BaseEmbedder
+from app.core.settings import settings
+from app.schemas import ChatRequest, ChatResponse, MessageRole
+
+logger = logging.getLogger(__name__)
+
+_vector_index: Optional[VectorIndex] = None
+
+
+def get_vector_index() -> VectorIndex:
+    """
+    Возвращает индекс семантического кэша процесса (открывается при первом
+    обращении)
+
+    Returns:
+        VectorIndex: Индекс векторов вопросов
+    """
+    global _vector_index
+    if _vector_index is None:
+        _vector_index = VectorIndex(
+            settings.SEMANTIC_CACHE_INDEX_PATH,
+            settings.SEMANTIC_CACHE_DIMENSION,
+            settings.SEMANTIC_CACHE_MAX_ENTRIES,
+        )
+    return _vector_index
+
+
+def close_vector_index() -> None:
+    """Сбрасывает индекс на диск при остановке приложения"""
+    global _vector_index
+    if _vector_index is not None:
+        _vector_index.flush()
+        _vector_index = None
+
+
+class SemanticCache:
+    """
+    Семантический кэш ответов
+
+    Attributes:
+        storage: Redis хранилище ответов
+        embedder: Эмбеддер вопросов
+    """
+
+    def __init__(self, storage: SemanticCacheRedisStorage, embedder: BaseEmbedder) -> None:
+        self.storage = storage
+        self.embedder = embedder
+
+    @staticmethod
+    def get_question(chat_request: ChatRequest) -> Optional[str]:
+        """
+        Вопрос, по которому можно искать в кэше
+
+        Args:
+            chat_request: Запрос к AI модели
+
+        Returns:
+            Optional[str]: Текст вопроса или None, если запрос не кэшируется
+        """
+        if (
+            not settings.SEMANTIC_CACHE_ENABLED
+            or chat_request.completionOptions.temperature
+            > settings.COMPLETION_CACHE_MAX_TEMPERATURE
+        ):
+            return None
+
+        dialog = [m for m in chat_request.messages if m.role != MessageRole.SYSTEM]
+        if len(dialog) != 1 or dialog[0].role != MessageRole.USER:
+            return None
+        return dialog[0].text
+
+    @staticmethod
+    def _scope(chat_request: ChatRequest) -> int:
+        """Область кэша: модель и системные сообщения"""
+        system = "\n".join(
+            m.text for m in chat_request.messages if m.role == MessageRole.SYSTEM
+        )
+        return zlib.crc32(f"{chat_request.modelUri}\n{system}".encode())
+
+    async def lookup(
+        self, chat_request: ChatRequest
+    ) -> Tuple[Optional[ChatResponse], Optional[np.ndarray]]:
+        """
+        Ищет ответ на похожий вопрос
+
+        Args:
+            chat_request: Запрос к AI модели
+
+        Returns:
+            Tuple[Optional[ChatResponse], Optional[np.ndarray]]: Ответ из кэша
+            (или None) и эмбеддинг вопроса для store (None, если запрос не
+            кэшируется или кэш недоступен)
+        """
+        question = self.get_question(chat_request)
+        if question is None:
+            return None, None
+
+        try:
+            vector = await self.embedder.embed(question)
+            # Перебор индекса - numpy без GIL, не блокируем цикл событий
+            found = await asyncio.to_thread(
+                get_vector_index().search,
+                vector,
+                self._scope(chat_request),
+                settings.SEMANTIC_CACHE_THRESHOLD,
+                settings.SEMANTIC_CACHE_TTL,
+            )
+            response = await self.storage.get_response(found[0]) if found else None
+            await self.storage.record_lookup(response is not None)
+        except Exception as e:
+            logger.warning("Семантический кэш недоступен: %s", str(e))
+            return None, None
+
+        if response is not None:
+            logger.debug("Ответ из семантического кэша, сходство %.3f", found[1])
+        return response, vector
+
+    async def store(
+        self, chat_request: ChatRequest, vector: np.ndarray, response: ChatResponse
+    ) -> None:
+        """
+        Сохраняет ответ на вопрос
+
+        Args:
+            chat_request: Запрос к AI модели
+            vector: Эмбеддинг вопроса из lookup
+            response: Ответ модели
+        """
+        key = chat_request.fingerprint()
+        try:
+            await self.storage.save_response(key, response)
+            get_vector_index().add(vector, self._scope(chat_request), key)
+        except Exception as e:
+            logger.warning("Не удалось сохранить ответ в семантический кэш: %s", str(e))
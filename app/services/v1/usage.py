@@ -0,0 +1,306 @@
+"""
+Учет расхода токенов и стоимости вызовов модели.
+
+Каждый вызов модели (синхронный, потоковый, отложенный, пересказ истории)
+добавляется в буфер в Redis (UsageRecorder) - запрос не ждет БД.
+Фоновая задача UsageFlusher (одна на процесс, буфер общий) раз в
+USAGE_FLUSH_INTERVAL секунд забирает пакет, суммирует его по пользователю,
+дню, модели и режиму, считает стоимость по ModelPricing и записывает одним
+INSERT. Отчет по дням (UsageService) суммирует эти записи, вызовы
+из буфера попадают в него со следующим проходом.
+
+Ответы из кэша модель не вызывают и не учитываются. Объединенные
+одинаковые запросы учитываются один раз - на пользователя, чей запрос
+ушел в модель.
+"""
+
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache.usage import UsageRedisStorage
+from app.core.dependencies.connections.database import DatabaseClient
+from app.core.settings import settings
+from app.models import TokenUsageModel
+from app.schemas import (DailyUsageSchema, ModelPricing, TokenUsageRecord,
+                         TokenUsageSchema, Usage, UsageReportResponse)
+from app.services.v1.base import BaseDataManager, BaseService
+
+logger = logging.getLogger(__name__)
+
+
+class UsageRecorder:
+    """
+    Запись вызовов модели в буфер учета
+
+    Без хранилища или при выключенном USAGE_ACCOUNTING_ENABLED ничего
+    не делает. Ошибка буфера не ломает запрос к модели.
+
+    Attributes:
+        storage: Redis буфер учета
+    """
+
+    def __init__(self, storage: Optional[UsageRedisStorage] = None) -> None:
+        self.storage = storage
+
+    async def record(
+        self,
+        user_id: Optional[int],
+        model_name: str,
+        usage: Optional[Usage],
+        async_mode: bool = False,
+    ) -> None:
+        """
+        Учитывает вызов модели
+
+        Args:
+            user_id: Идентификатор пользователя (None для пакетных запросов)
+            model_name: Имя модели
+            usage: Статистика токенов из ответа модели
+            async_mode: Вызов в асинхронном (отложенном) режиме
+        """
+        if self.storage is None or usage is None or not settings.USAGE_ACCOUNTING_ENABLED:
+            return
+        try:
+            await self.storage.record(
+                TokenUsageRecord(
+                    user_id=user_id,
+                    model=model_name,
+                    async_mode=async_mode,
+                    input_tokens=int(usage.inputTextTokens),
+                    completion_tokens=int(usage.completionTokens),
+                    created_at=datetime.now(timezone.utc),
+                )
+            )
+        except Exception as e:
+            logger.warning("Не удалось учесть расход токенов: %s", str(e))
+
+
+class UsageDataManager(BaseDataManager[TokenUsageSchema]):
+    """
+    Менеджер данных учета расхода токенов
+    """
+
+    def __init__(self, session: AsyncSession):
+        super().__init__(session, TokenUsageSchema, TokenUsageModel)
+
+    @staticmethod
+    def aggregate(records: List[TokenUsageRecord]) -> List[dict]:
+        """
+        Суммирует вызовы по пользователю, дню, модели и режиму
+
+        Args:
+            records: Вызовы из буфера
+
+        Returns:
+            List[dict]: Значения полей записей token_usage
+        """
+        totals: Dict[Tuple[Optional[int], date, str, bool], List[int]] = defaultdict(
+            lambda: [0, 0, 0]
+        )
+        for record in records:
+            day = record.created_at.astimezone(timezone.utc).date()
+            total = totals[(record.user_id, day, record.model, record.async_mode)]
+            total[0] += 1
+            total[1] += record.input_tokens
+            total[2] += record.completion_tokens
+
+        rows = []
+        for (user_id, day, model, async_mode), (requests, input_tokens, completion_tokens) in (
+            totals.items()
+        ):
+            total_tokens = input_tokens + completion_tokens
+            rows.append(
+                {
+                    "user_id": user_id,
+                    "day": day,
+                    "model": model,
+                    "async_mode": async_mode,
+                    "requests": requests,
+                    "input_tokens": input_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": total_tokens,
+                    "cost": round(
+                        ModelPricing.for_model(model, async_mode).cost(total_tokens), 6
+                    ),
+                }
+            )
+        return rows
+
+    async def add_records(self, records: List[TokenUsageRecord]) -> int:
+        """
+        Записывает пакет вызовов агрегатами
+
+        Args:
+            records: Вызовы из буфера
+
+        Returns:
+            int: Количество добавленных записей token_usage
+        """
+        return await self.add_many(self.aggregate(records))
+
+    async def get_daily(
+        self, user_id: Optional[int], date_from: date, date_to: date
+    ) -> List[DailyUsageSchema]:
+        """
+        Расход по дням и моделям
+
+        Args:
+            user_id: Пользователь (None - все пользователи)
+            date_from: Первый день
+            date_to: Последний день
+
+        Returns:
+            List[DailyUsageSchema]: Расход, упорядоченный по дню и модели
+        """
+        statement = (
+            select(
+                self.model.day,
+                self.model.model,
+                func.sum(self.model.requests).label("requests"),
+                func.sum(self.model.input_tokens).label("input_tokens"),
+                func.sum(self.model.completion_tokens).label("completion_tokens"),
+                func.sum(self.model.total_tokens).label("total_tokens"),
+                func.sum(self.model.cost).label("cost"),
+            )
+            .where(self.model.day.between(date_from, date_to))
+            .group_by(self.model.day, self.model.model)
+            .order_by(self.model.day, self.model.model)
+        )
+        if user_id is not None:
+            statement = statement.where(self.model.user_id == user_id)
+
+        try:
+            result = await self.session.execute(statement)
+            return [DailyUsageSchema.model_validate(dict(row._mapping)) for row in result]
+        except SQLAlchemyError as e:
+            self.logger.error("❌ Ошибка при получении расхода токенов: %s", e)
+            raise
+
+
+class UsageService(BaseService):
+    """
+    Сервис отчетов о расходе токенов
+    """
+
+    def __init__(self, session: AsyncSession):
+        super().__init__(session)
+        self.data_manager = UsageDataManager(session)
+
+    async def get_report(self, user_id: Optional[int], days: int) -> UsageReportResponse:
+        """
+        Расход токенов за последние дни
+
+        Args:
+            user_id: Пользователь (None - все пользователи)
+            days: Количество дней, включая сегодняшний (UTC)
+
+        Returns:
+            UsageReportResponse: Расход по дням и моделям и итог за период
+        """
+        date_to = datetime.now(timezone.utc).date()
+        date_from = date_to - timedelta(days=days - 1)
+        daily = await self.data_manager.get_daily(user_id, date_from, date_to)
+        return UsageReportResponse(
+            user_id=user_id,
+            date_from=date_from,
+            date_to=date_to,
+            days=daily,
+            total_tokens=sum(item.total_tokens for item in daily),
+            total_cost=round(sum(item.cost for item in daily), 6),
+        )
+
+
+class UsageFlusher:
+    """
+    Фоновая запись буфера учета в БД
+
+    Attributes:
+        storage: Redis буфер учета
+        interval: Пауза между проходами, секунды
+        batch_size: Максимум вызовов за одну вставку
+    """
+
+    def __init__(
+        self,
+        storage: UsageRedisStorage,
+        interval: float = 10.0,
+        batch_size: int = 1000,
+    ) -> None:
+        self.storage = storage
+        self.interval = interval
+        self.batch_size = batch_size
+
+        self._db_client = DatabaseClient()
+        self._session_factory = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        """Подключается к БД и запускает фоновую задачу записи"""
+        if self._task is None:
+            self._session_factory = await self._db_client.connect()
+            self._task = asyncio.create_task(self._run(), name="usage-flusher")
+            logger.info("Учет расхода токенов запущен")
+
+    async def stop(self) -> None:
+        """Останавливает фоновую задачу и записывает остаток буфера"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error("Не удалось записать расход токенов при остановке: %s", str(e))
+            await self._db_client.close()
+            logger.info("Учет расхода токенов остановлен")
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Ошибка при записи расхода токенов: %s", str(e))
+
+            await asyncio.sleep(self.interval)
+
+    async def flush(self) -> int:
+        """
+        Записывает буфер в БД пакетами по batch_size
+
+        Returns:
+            int: Количество записанных вызовов
+        """
+        flushed = 0
+        while True:
+            records = await self.storage.pop_batch(self.batch_size)
+            if not records:
+                return flushed
+
+            committed = False
+            try:
+                async with self._session_factory() as session:
+                    await UsageDataManager(session).add_records(records)
+                    committed = True
+            except BaseException:
+                # Пакет уже снят с буфера: если он не записан, возвращаем,
+                # чтобы не потерять учет. После коммита (ошибка при закрытии
+                # сессии, отмена) возврат посчитал бы вызовы дважды
+                if not committed:
+                    await self.storage.restore(records)
+                raise
+
+            flushed += len(records)
+            if len(records) < self.batch_size:
+                return flushed
@@ -0,0 +1,95 @@
+"""
+Микробенчмарк сериализации тела запроса к Yandex API.
+
+Сравнивает прежний путь (model_dump, замена role, фильтрация None,
+json.dumps для лога и сериализация json= в aiohttp) с RequestEncoder,
+который собирает байты за один проход. Для каждой длины истории
+выводит время на запрос и пиковый объем временных аллокаций
+(tracemalloc), предварительно проверив, что оба пути дают одинаковый JSON.
+
+Usage:
+    python -m scripts.bench_serialization --history 10 100 1000 --repeat 200
+"""
+
+import argparse
+import json
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+
+
+def legacy_encode(chat_request: Any) -> bytes:
+    """Прежняя цепочка преобразований из ChatHttpClient и BaseHttpClient.post"""
+    request_data = chat_request.model_dump(by_alias=True)
+    for msg in request_data["messages"]:
+        msg["role"] = msg["role"].value
+    # Отладочный лог формировался всегда, даже при уровне INFO
+    json.dumps(request_data, indent=2)
+    request_data = {k: v for k, v in request_data.items() if v is not None}
+    # aiohttp: json= сериализует стандартным json.dumps
+    return json.dumps(request_data).encode()
+
+
+def build_request(history: int, text_length: int) -> Any:
+    from app.core.settings import settings
+    from app.schemas import ChatRequest, CompletionOptions, Message, MessageRole
+    from app.services import ChatService
+
+    messages = [ChatService.SYSTEM_MESSAGE]
+    for i in range(history):
+        role = MessageRole.USER if i % 2 == 0 else MessageRole.ASSISTANT
+        text = f"Сообщение {i}: " + "пример текста с кодом print('hi') " * (text_length // 32)
+        messages.append(Message(role=role, text=text, tokens=len(text) // 4))
+
+    return ChatRequest(
+        modelUri=settings.get_model_uri(settings.YANDEX_MODEL_NAME),
+        completionOptions=CompletionOptions(maxTokens="2000"),
+        messages=messages,
+    )
+
+
+def measure(func: Callable[[], bytes], repeat: int) -> Dict[str, float]:
+    """Среднее время вызова и пик аллокаций одного вызова"""
+    func()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    elapsed = (time.perf_counter() - started) / repeat
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {"us": elapsed * 1e6, "peak_kb": peak / 1024}
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    from app.core.integrations.yandex_gpt.serialization import get_request_encoder
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--history", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--text-length", type=int, default=400, help="Символов в сообщении")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    encoder = get_request_encoder()
+    print(f"{'history':>8} {'legacy, мкс':>12} {'encoder, мкс':>13} {'ускорение':>10} "
+          f"{'legacy, КБ':>11} {'encoder, КБ':>12}")
+
+    for history in args.history:
+        request = build_request(history, args.text_length)
+        if json.loads(legacy_encode(request)) != json.loads(encoder.encode(request)):
+            raise SystemExit(f"Тела запросов различаются при history={history}")
+
+        legacy = measure(lambda: legacy_encode(request), args.repeat)
+        encoded = measure(lambda: encoder.encode(request), args.repeat)
+        print(
+            f"{history:>8} {legacy['us']:>12.1f} {encoded['us']:>13.1f} "
+            f"{legacy['us'] / encoded['us']:>9.1f}x "
+            f"{legacy['peak_kb']:>11.1f} {encoded['peak_kb']:>12.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
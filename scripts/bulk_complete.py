@@ -0,0 +1,326 @@
+"""
+Офлайн генерация по JSONL файлу с возобновлением после сбоя.
+
+Каждая строка входного файла - независимый запрос в формате
+BatchCompletionItem (message, history, temperature, maxTokens) и
+необязательное поле id. Результаты дописываются в выходной JSONL по мере
+готовности (порядок строк не сохраняется, в каждой есть номер строки
+входа `line` и `id`).
+
+Файл читается потоково, в памяти одновременно не больше нескольких
+concurrency запросов, поэтому размер набора данных не важен. Прогресс
+сохраняется в файл контрольной точки:
+- watermark: все строки до нее обработаны, с этого смещения читается вход;
+- done: обработанные строки выше watermark (не больше окна параллельности);
+- output_offset: размер выхода на момент сохранения - при возобновлении
+  выход обрезается до него, поэтому строки не дублируются.
+Контрольная точка пишется во временный файл и атомарно заменяется
+(os.replace), поэтому оборванная запись не портит прогресс.
+
+Квота и расход токенов учитываются на пользователя --user-id, как для
+пакетного эндпоинта.
+
+Usage:
+    bulk-complete prompts.jsonl results.jsonl --concurrency 20
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from pydantic import ValidationError
+
+logger = logging.getLogger("bulk_complete")
+
+
+@dataclass
+class Checkpoint:
+    """
+    Контрольная точка обработки входного файла
+
+    Attributes:
+        input: Путь к входному файлу (защита от продолжения чужого прогона)
+        watermark: Номер первой строки, которая еще не обработана
+        input_offset: Смещение начала строки watermark во входном файле
+        output_offset: Размер выходного файла на момент сохранения
+        done: Обработанные строки выше watermark
+    """
+
+    input: str
+    watermark: int = 0
+    input_offset: int = 0
+    output_offset: int = 0
+    done: Set[int] = field(default_factory=set)
+
+    # Смещения концов прочитанных, но еще не пройденных watermark строк
+    _offsets: Dict[int, int] = field(default_factory=dict, repr=False)
+
+    @classmethod
+    def load(cls, path: Path, input_path: str) -> "Checkpoint":
+        """Загружает контрольную точку или создает новую"""
+        if not path.exists():
+            return cls(input=input_path)
+
+        data = json.loads(path.read_text(encoding="utf-8"))
+        if data["input"] != input_path:
+            raise SystemExit(
+                f"Контрольная точка {path} относится к {data['input']}, "
+                f"а не к {input_path}. Используйте --fresh или другой --checkpoint"
+            )
+        return cls(
+            input=data["input"],
+            watermark=data["watermark"],
+            input_offset=data["input_offset"],
+            output_offset=data["output_offset"],
+            done=set(data["done"]),
+        )
+
+    def save(self, path: Path, output_offset: int) -> None:
+        """Атомарно сохраняет контрольную точку"""
+        self.output_offset = output_offset
+        data = asdict(self)
+        data.pop("_offsets")
+        data["done"] = sorted(self.done)
+
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def track(self, line: int, end_offset: int) -> None:
+        """Запоминает, где во входе заканчивается прочитанная строка"""
+        self._offsets[line] = end_offset
+        self._advance()
+
+    def mark_done(self, line: int) -> None:
+        """Отмечает строку обработанной и сдвигает watermark"""
+        self.done.add(line)
+        self._advance()
+
+    def _advance(self) -> None:
+        while self.watermark in self.done and self.watermark in self._offsets:
+            self.done.remove(self.watermark)
+            self.input_offset = self._offsets.pop(self.watermark)
+            self.watermark += 1
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    from app.core.settings import settings
+
+    parser = argparse.ArgumentParser(
+        prog="bulk-complete",
+        description="Генерация ответов по JSONL файлу с контрольными точками",
+    )
+    parser.add_argument("input", help="Входной JSONL: message, history, temperature, maxTokens, id")
+    parser.add_argument("output", help="Выходной JSONL (дописывается)")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=settings.BATCH_CONCURRENCY,
+        help="Одновременных запросов к модели (по умолчанию BATCH_CONCURRENCY)",
+    )
+    parser.add_argument(
+        "--user-id",
+        type=int,
+        default=1,
+        help="Пользователь, на которого учитываются квота и расход токенов",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        help="Файл контрольной точки (по умолчанию <output>.checkpoint)",
+    )
+    parser.add_argument(
+        "--checkpoint-every",
+        type=int,
+        default=100,
+        help="Сохранять контрольную точку каждые N результатов",
+    )
+    parser.add_argument(
+        "--fresh",
+        action="store_true",
+        help="Начать заново: удалить контрольную точку и очистить выход",
+    )
+    return parser.parse_args(argv)
+
+
+async def read_input(
+    input_path: Path,
+    checkpoint: Checkpoint,
+    queue: "asyncio.Queue[Optional[Tuple[int, bytes]]]",
+    workers: int,
+) -> None:
+    """Читает вход с watermark и кладет необработанные строки в очередь"""
+    with open(input_path, "rb") as f:
+        f.seek(checkpoint.input_offset)
+        line_number = checkpoint.watermark
+        for raw in iter(f.readline, b""):
+            checkpoint.track(line_number, f.tell())
+            if line_number in checkpoint.done:
+                pass
+            elif not raw.strip():
+                # Пустые строки считаются обработанными
+                checkpoint.mark_done(line_number)
+            else:
+                await queue.put((line_number, raw))
+            line_number += 1
+
+    for _ in range(workers):
+        await queue.put(None)
+
+
+async def run(args: argparse.Namespace) -> None:
+    from app.core.cache.base import BaseRedisStorage
+    from app.core.cache.quota import QuotaRedisStorage
+    from app.core.cache.rate_limit import RateLimitRedisStorage
+    from app.core.cache.usage import UsageRedisStorage
+    from app.core.dependencies.connections.cache import RedisClient
+    from app.core.dependencies.connections.http import HttpClient
+    from app.core.integrations.base import BaseHttpClient
+    from app.core.integrations.yandex_gpt.auth import IAMTokenManager
+    from app.core.settings import settings
+    from app.schemas import BatchCompletionItem
+    from app.services import ChatService
+
+    input_path = Path(args.input)
+    output_path = Path(args.output)
+    checkpoint_path = Path(args.checkpoint or f"{args.output}.checkpoint")
+
+    if args.fresh:
+        checkpoint_path.unlink(missing_ok=True)
+        output_path.unlink(missing_ok=True)
+
+    checkpoint = Checkpoint.load(checkpoint_path, str(input_path.resolve()))
+    if checkpoint.watermark or checkpoint.done:
+        logger.info(
+            "Продолжаем с строки %d (уже обработано выше: %d)",
+            checkpoint.watermark,
+            len(checkpoint.done),
+        )
+
+    # Все, что дописано после контрольной точки, будет посчитано заново
+    output_path.touch()
+    with open(output_path, "r+b") as f:
+        f.truncate(checkpoint.output_offset)
+
+    http_client = HttpClient()
+    redis_client = RedisClient()
+    session = await http_client.connect()
+
+    redis = None
+    if (
+        settings.RATE_LIMIT_ENABLED
+        or settings.USER_QUOTA_ENABLED
+        or settings.USAGE_ACCOUNTING_ENABLED
+        or settings.YANDEX_AUTH_TYPE == "iam"
+    ):
+        redis = await redis_client.connect()
+
+    iam_token_manager = None
+    if settings.YANDEX_AUTH_TYPE == "iam":
+        iam_token_manager = IAMTokenManager(BaseHttpClient(session), BaseRedisStorage(redis))
+        iam_token_manager.start()
+
+    chat_service = ChatService(
+        None,
+        None,
+        session,
+        iam_token_manager=iam_token_manager,
+        rate_limit_storage=RateLimitRedisStorage(redis) if redis else None,
+        usage_storage=UsageRedisStorage(redis) if redis else None,
+        quota_storage=QuotaRedisStorage(redis) if redis else None,
+    )
+
+    queue: "asyncio.Queue[Optional[Tuple[int, bytes]]]" = asyncio.Queue(
+        maxsize=args.concurrency * 2
+    )
+    stats = {"ok": 0, "failed": 0}
+    started = time.monotonic()
+
+    with open(output_path, "ab") as output:
+
+        def write(record: Dict[str, Any], line_number: int) -> None:
+            output.write(json.dumps(record, ensure_ascii=False).encode() + b"\n")
+            checkpoint.mark_done(line_number)
+            processed = stats["ok"] + stats["failed"]
+            if processed % args.checkpoint_every == 0:
+                output.flush()
+                os.fsync(output.fileno())
+                checkpoint.save(checkpoint_path, output.tell())
+                rate = processed / max(time.monotonic() - started, 1e-9)
+                logger.info(
+                    "Обработано %d (ошибок %d), %.1f строк/с, watermark %d",
+                    processed,
+                    stats["failed"],
+                    rate,
+                    checkpoint.watermark,
+                )
+
+        async def worker() -> None:
+            while (entry := await queue.get()) is not None:
+                line_number, raw = entry
+                try:
+                    data = json.loads(raw)
+                    item = BatchCompletionItem.model_validate(data)
+                except (ValueError, ValidationError) as e:
+                    stats["failed"] += 1
+                    write(
+                        {
+                            "line": line_number,
+                            "success": False,
+                            "error": str(e),
+                            "error_type": "invalid_input",
+                        },
+                        line_number,
+                    )
+                    continue
+
+                result = await chat_service.get_item_completion(item, line_number, args.user_id)
+                stats["ok" if result.success else "failed"] += 1
+                record = {"line": line_number, "id": data.get("id")}
+                record.update(result.model_dump(exclude={"index"}, exclude_none=True))
+                write(record, line_number)
+
+        try:
+            await asyncio.gather(
+                read_input(input_path, checkpoint, queue, args.concurrency),
+                *(worker() for _ in range(args.concurrency)),
+            )
+        finally:
+            output.flush()
+            os.fsync(output.fileno())
+            checkpoint.save(checkpoint_path, output.tell())
+            if iam_token_manager:
+                await iam_token_manager.stop()
+            await redis_client.close()
+            await http_client.close()
+
+    logger.info(
+        "Готово: успешно %d, с ошибкой %d за %.1f с",
+        stats["ok"],
+        stats["failed"],
+        time.monotonic() - started,
+    )
+
+
+def bulk_complete(argv: Optional[List[str]] = None) -> None:
+    """
+    Генерация ответов по JSONL файлу (команда bulk-complete)
+    """
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    try:
+        asyncio.run(run(args))
+    except KeyboardInterrupt:
+        print("⏹️ Остановлено, прогресс сохранен в контрольной точке")
+
+
+if __name__ == "__main__":
+    bulk_complete()
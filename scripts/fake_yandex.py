@@ -0,0 +1,344 @@
+"""
+Локальная замена Yandex Foundation Models API для нагрузочных тестов.
+
+Имитирует эндпоинты, которыми пользуется ChatHttpClient:
+- POST /foundationModels/v1/completion (обычный и потоковый режим);
+- POST /foundationModels/v1/completionAsync и GET /operations/{id};
+- POST /foundationModels/v1/tokenize;
+- POST /iam/v1/tokens (обмен JWT на IAM токен).
+
+Задержки, количество токенов, доля ошибок и 429, частота фрагментов
+потока настраиваются аргументами. Сервер не зависит от приложения и
+не проверяет авторизацию. GET /stats возвращает счетчики для сверки
+с результатами бенчмарка.
+
+Usage:
+    fake-yandex --port 8081 --latency 0.3 --tokens-per-second 200 --error-rate 0.01
+
+    YANDEX_API_URL=http://127.0.0.1:8081/foundationModels/v1/completion
+    YANDEX_ASYNC_API_URL=http://127.0.0.1:8081/foundationModels/v1/completionAsync
+    YANDEX_OPERATIONS_URL=http://127.0.0.1:8081/operations
+    YANDEX_TOKENIZE_URL=http://127.0.0.1:8081/foundationModels/v1/tokenize
+    YANDEX_IAM_URL=http://127.0.0.1:8081/iam/v1/tokens
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from aiohttp import web
+
+WORDS = (
+    "модель отвечает на вопрос пользователя подробно и по существу с примерами "
+    "кода на python и пояснениями к каждому шагу решения задачи"
+).split()
+
+CHARS_PER_TOKEN = 3
+
+
+class FakeYandex:
+    """
+    Состояние и обработчики фейкового сервера
+
+    Attributes:
+        config: Аргументы запуска (задержки, ошибки, токены)
+        operations: Отложенные операции: id -> готовность и результат
+        stats: Счетчики запросов по типам ответов
+    """
+
+    def __init__(self, config: argparse.Namespace) -> None:
+        self.config = config
+        self.operations: Dict[str, Dict[str, Any]] = {}
+        self.stats: Dict[str, int] = {
+            "requests": 0,
+            "in_flight": 0,
+            "max_in_flight": 0,
+            "completions": 0,
+            "streams": 0,
+            "async_submitted": 0,
+            "tokenize": 0,
+            "errors": 0,
+            "rate_limited": 0,
+        }
+        self.random = random.Random(config.seed)
+
+    # Модель ответа
+
+    def sample_latency(self) -> float:
+        """Задержка до первого токена по выбранному распределению"""
+        mean = self.config.latency
+        distribution = self.config.latency_distribution
+        if distribution == "fixed" or mean <= 0:
+            return max(0.0, mean)
+        if distribution == "uniform":
+            return self.random.uniform(0, 2 * mean)
+        if distribution == "exponential":
+            return self.random.expovariate(1 / mean)
+        # lognormal с заданным средним: mu = ln(mean) - sigma^2 / 2
+        sigma = self.config.latency_sigma
+        return self.random.lognormvariate(math.log(mean) - sigma**2 / 2, sigma)
+
+    def completion_tokens(self, body: Dict[str, Any]) -> int:
+        """Количество токенов ответа с учетом maxTokens запроса"""
+        options = body.get("completionOptions") or {}
+        max_tokens = int(options.get("maxTokens") or self.config.completion_tokens)
+        tokens = self.config.completion_tokens
+        if self.config.completion_tokens_jitter:
+            tokens += self.random.randint(
+                -self.config.completion_tokens_jitter, self.config.completion_tokens_jitter
+            )
+        return max(1, min(tokens, max_tokens))
+
+    @staticmethod
+    def count_tokens(text: str) -> int:
+        return max(1, math.ceil(len(text) / CHARS_PER_TOKEN))
+
+    def input_tokens(self, body: Dict[str, Any]) -> int:
+        return sum(self.count_tokens(m.get("text", "")) for m in body.get("messages", []))
+
+    def generate_text(self, tokens: int) -> str:
+        """Текст примерно из tokens токенов"""
+        words: List[str] = []
+        length = 0
+        while length < tokens * CHARS_PER_TOKEN:
+            word = WORDS[len(words) % len(WORDS)]
+            words.append(word)
+            length += len(word) + 1
+        return " ".join(words)
+
+    @staticmethod
+    def result(text: str, input_tokens: int, completion_tokens: int, final: bool) -> Dict[str, Any]:
+        return {
+            "alternatives": [
+                {
+                    "message": {"role": "assistant", "text": text},
+                    "status": "ALTERNATIVE_STATUS_FINAL" if final else "ALTERNATIVE_STATUS_PARTIAL",
+                }
+            ],
+            "usage": {
+                "inputTextTokens": str(input_tokens),
+                "completionTokens": str(completion_tokens),
+                "totalTokens": str(input_tokens + completion_tokens),
+            },
+            "modelVersion": "fake",
+        }
+
+    def generation_time(self, tokens: int) -> float:
+        if self.config.tokens_per_second <= 0:
+            return 0.0
+        return tokens / self.config.tokens_per_second
+
+    # Ошибки
+
+    def injected_error(self) -> Optional[web.Response]:
+        """Случайный 429 или 5xx по настроенным долям"""
+        roll = self.random.random()
+        if roll < self.config.rate_limit_rate:
+            self.stats["rate_limited"] += 1
+            return web.json_response(
+                {
+                    "error": {
+                        "grpcCode": 8,
+                        "httpCode": 429,
+                        "message": (
+                            "ai.textGenerationCompletionSessionsCount.count "
+                            "gauge quota limit exceed"
+                        ),
+                    }
+                },
+                status=429,
+                headers={"Retry-After": str(self.config.retry_after)},
+            )
+        if roll < self.config.rate_limit_rate + self.config.error_rate:
+            self.stats["errors"] += 1
+            status = self.random.choice([500, 502, 503, 504])
+            return web.json_response(
+                {"error": {"httpCode": status, "message": "injected failure"}}, status=status
+            )
+        return None
+
+    # Обработчики
+
+    @web.middleware
+    async def count_requests(self, request: web.Request, handler):
+        self.stats["requests"] += 1
+        self.stats["in_flight"] += 1
+        self.stats["max_in_flight"] = max(self.stats["max_in_flight"], self.stats["in_flight"])
+        try:
+            return await handler(request)
+        finally:
+            self.stats["in_flight"] -= 1
+
+    async def completion(self, request: web.Request) -> web.StreamResponse:
+        body = await request.json()
+        error = self.injected_error()
+        if error is not None:
+            return error
+
+        input_tokens = self.input_tokens(body)
+        tokens = self.completion_tokens(body)
+        text = self.generate_text(tokens)
+
+        if (body.get("completionOptions") or {}).get("stream"):
+            return await self.stream(request, text, input_tokens, tokens)
+
+        self.stats["completions"] += 1
+        await asyncio.sleep(self.sample_latency() + self.generation_time(tokens))
+        return web.json_response({"result": self.result(text, input_tokens, tokens, True)})
+
+    async def stream(
+        self, request: web.Request, text: str, input_tokens: int, tokens: int
+    ) -> web.StreamResponse:
+        """NDJSON поток: в каждом фрагменте весь накопленный текст"""
+        self.stats["streams"] += 1
+        response = web.StreamResponse(headers={"Content-Type": "application/json"})
+        await response.prepare(request)
+        await asyncio.sleep(self.sample_latency())
+
+        chunk_tokens = max(1, self.config.chunk_tokens)
+        sent = 0
+        while sent < tokens:
+            sent = min(tokens, sent + chunk_tokens)
+            final = sent == tokens
+            partial = text[: math.ceil(len(text) * sent / tokens)]
+            chunk = {"result": self.result(partial, input_tokens, sent, final)}
+            await response.write(json.dumps(chunk, ensure_ascii=False).encode() + b"\n")
+            if not final:
+                await asyncio.sleep(
+                    self.config.chunk_interval
+                    if self.config.chunk_interval >= 0
+                    else self.generation_time(chunk_tokens)
+                )
+
+        await response.write_eof()
+        return response
+
+    async def completion_async(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        error = self.injected_error()
+        if error is not None:
+            return error
+
+        self.stats["async_submitted"] += 1
+        input_tokens = self.input_tokens(body)
+        tokens = self.completion_tokens(body)
+        operation_id = uuid.uuid4().hex
+        self.operations[operation_id] = {
+            "ready_at": time.monotonic()
+            + self.sample_latency() * self.config.async_slowdown
+            + self.generation_time(tokens),
+            "response": self.result(self.generate_text(tokens), input_tokens, tokens, True),
+        }
+        return web.json_response(
+            {"id": operation_id, "description": "Async GPT Completion", "done": False}
+        )
+
+    async def operation(self, request: web.Request) -> web.Response:
+        operation_id = request.match_info["operation_id"]
+        operation = self.operations.get(operation_id)
+        if operation is None:
+            return web.json_response(
+                {"code": 5, "message": f"Operation {operation_id} not found"}, status=404
+            )
+
+        if time.monotonic() < operation["ready_at"]:
+            return web.json_response({"id": operation_id, "done": False})
+
+        self.operations.pop(operation_id)
+        return web.json_response(
+            {"id": operation_id, "done": True, "response": operation["response"]}
+        )
+
+    async def tokenize(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        self.stats["tokenize"] += 1
+        text = body.get("text", "")
+        tokens = [
+            {
+                "id": str(i),
+                "text": text[i * CHARS_PER_TOKEN:(i + 1) * CHARS_PER_TOKEN],
+                "special": False,
+            }
+            for i in range(self.count_tokens(text))
+        ]
+        return web.json_response({"tokens": tokens, "modelVersion": "fake"})
+
+    async def iam_token(self, request: web.Request) -> web.Response:
+        expires_at = datetime.now(timezone.utc) + timedelta(hours=12)
+        return web.json_response(
+            {
+                "iamToken": f"fake-iam-{uuid.uuid4().hex}",
+                "expiresAt": expires_at.strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
+            }
+        )
+
+    async def get_stats(self, request: web.Request) -> web.Response:
+        return web.json_response({**self.stats, "pending_operations": len(self.operations)})
+
+    def build_app(self) -> web.Application:
+        app = web.Application(middlewares=[self.count_requests])
+        app.router.add_post("/foundationModels/v1/completion", self.completion)
+        app.router.add_post("/foundationModels/v1/completionAsync", self.completion_async)
+        app.router.add_get("/operations/{operation_id}", self.operation)
+        app.router.add_post("/foundationModels/v1/tokenize", self.tokenize)
+        app.router.add_post("/iam/v1/tokens", self.iam_token)
+        app.router.add_get("/stats", self.get_stats)
+        return app
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="fake-yandex", description="Фейковый Yandex Foundation Models API"
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.3, help="Среднее время до первого токена, с")
+    parser.add_argument(
+        "--latency-distribution",
+        choices=["fixed", "uniform", "exponential", "lognormal"],
+        default="lognormal",
+    )
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="sigma для lognormal")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0, help="Скорость генерации (0 - мгновенно)")
+    parser.add_argument("--completion-tokens", type=int, default=100, help="Токенов в ответе (не больше maxTokens)")
+    parser.add_argument("--completion-tokens-jitter", type=int, default=0, help="Разброс токенов ответа, +-")
+    parser.add_argument("--chunk-tokens", type=int, default=10, help="Токенов в одном фрагменте потока")
+    parser.add_argument(
+        "--chunk-interval",
+        type=float,
+        default=-1.0,
+        help="Пауза между фрагментами, с (по умолчанию - по скорости генерации)",
+    )
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Доля ответов 5xx")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Доля ответов 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After для 429, с")
+    parser.add_argument("--async-slowdown", type=float, default=3.0, help="Во сколько раз асинхронный режим медленнее")
+    parser.add_argument("--seed", type=int, default=None)
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    Запуск фейкового Yandex API (команда fake-yandex)
+    """
+    config = parse_args(argv)
+    base_url = f"http://{config.host}:{config.port}"
+    print(f"🤖 Фейковый Yandex API: {base_url}")
+    print(f"   YANDEX_API_URL={base_url}/foundationModels/v1/completion")
+    print(f"   YANDEX_ASYNC_API_URL={base_url}/foundationModels/v1/completionAsync")
+    print(f"   YANDEX_OPERATIONS_URL={base_url}/operations")
+    print(f"   YANDEX_TOKENIZE_URL={base_url}/foundationModels/v1/tokenize")
+    print(f"   YANDEX_IAM_URL={base_url}/iam/v1/tokens", flush=True)
+    web.run_app(
+        FakeYandex(config).build_app(), host=config.host, port=config.port, print=None
+    )
+
+
+if __name__ == "__main__":
+    main()
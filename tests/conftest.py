@@ -0,0 +1,28 @@
+import os
+
+import pytest
+import pytest_asyncio
+
+# Обязательные настройки без значений по умолчанию: тесты не обращаются
+# к внешним сервисам, но Settings должны загрузиться
+for name, value in {
+    "TOKEN_SECRET_KEY": "test",
+    "POSTGRES_USER": "test",
+    "POSTGRES_PASSWORD": "test",
+    "POSTGRES_DB": "test",
+    "YANDEX_API_KEY": "test",
+    "YANDEX_PRIVATE_KEY": "test",
+    "YANDEX_KEY_ID": "test",
+    "YANDEX_FOLDER_ID": "test",
+    "REDIS_PASSWORD": "test",
+}.items():
+    os.environ.setdefault(name, value)
+
+
+@pytest_asyncio.fixture
+async def redis():
+    """Асинхронный клиент fakeredis (со скриптами Lua); без fakeredis тест пропускается"""
+    fakeredis = pytest.importorskip("fakeredis")
+    client = fakeredis.aioredis.FakeRedis()
+    yield client
+    await client.aclose()
@@ -0,0 +1,70 @@
+import asyncio
+import json
+
+import pytest
+
+from scripts.bulk_complete import Checkpoint, read_input
+
+
+@pytest.fixture
+def input_path(tmp_path):
+    path = tmp_path / "prompts.jsonl"
+    lines = [json.dumps({"message": f"q{i}", "id": i}) for i in range(6)]
+    lines[4] = ""
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return path
+
+
+async def read_lines(input_path, checkpoint):
+    """Строки, которые read_input отдает воркерам"""
+    queue = asyncio.Queue()
+    await read_input(input_path, checkpoint, queue, workers=1)
+    lines = []
+    while (entry := queue.get_nowait()) is not None:
+        lines.append(entry)
+    return lines
+
+
+def test_watermark_advances_only_over_contiguous_lines():
+    checkpoint = Checkpoint(input="prompts.jsonl")
+    for line, end in enumerate([10, 20, 30]):
+        checkpoint.track(line, end)
+
+    checkpoint.mark_done(1)
+    assert (checkpoint.watermark, checkpoint.input_offset, checkpoint.done) == (0, 0, {1})
+
+    checkpoint.mark_done(0)
+    assert (checkpoint.watermark, checkpoint.input_offset, checkpoint.done) == (2, 20, set())
+
+
+@pytest.mark.asyncio
+async def test_resume_skips_processed_lines(tmp_path, input_path):
+    checkpoint_path = tmp_path / "results.jsonl.checkpoint"
+    checkpoint = Checkpoint(input=str(input_path))
+
+    first = await read_lines(input_path, checkpoint)
+    assert [line for line, _ in first] == [0, 1, 2, 3, 5]
+
+    # Сбой после того, как обработаны строки 0, 2 и 3 (пустая 4 - сразу)
+    for line in (0, 2, 3):
+        checkpoint.mark_done(line)
+    checkpoint.save(checkpoint_path, output_offset=123)
+
+    restored = Checkpoint.load(checkpoint_path, str(input_path))
+    assert (restored.watermark, restored.done, restored.output_offset) == (1, {2, 3, 4}, 123)
+
+    second = await read_lines(input_path, restored)
+    assert second == [(line, raw) for line, raw in first if line in (1, 5)]
+
+    for line in (1, 5):
+        restored.mark_done(line)
+    assert (restored.watermark, restored.done) == (6, set())
+    assert restored.input_offset == input_path.stat().st_size
+
+
+def test_load_rejects_checkpoint_of_another_input(tmp_path, input_path):
+    checkpoint_path = tmp_path / "results.jsonl.checkpoint"
+    Checkpoint(input="other.jsonl").save(checkpoint_path, output_offset=0)
+
+    with pytest.raises(SystemExit):
+        Checkpoint.load(checkpoint_path, str(input_path))
@@ -0,0 +1,56 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+
+from app.core.exceptions import ChatDeadlineExceededError
+from app.schemas import ChatRequest, Message
+from app.services.v1 import chat
+from app.services.v1.chat import ChatService
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setattr(chat.settings, "YANDEX_FALLBACK_ENABLED", True)
+    monkeypatch.setattr(chat.settings, "YANDEX_FALLBACK_DEADLINE", 0.05)
+    monkeypatch.setattr(chat.settings, "YANDEX_FALLBACK_MODELS", {"yandexgpt": "yandexgpt-lite"})
+    service = ChatService(None, None)
+    service.calls = 0
+
+    async def get_completion(request):
+        service.calls += 1
+        await asyncio.sleep(10)
+
+    monkeypatch.setattr(service.http_client, "get_completion", get_completion)
+    return service
+
+
+def make_request() -> ChatRequest:
+    return ChatRequest(
+        modelUri="gpt://folder/yandexgpt",
+        completionOptions={"maxTokens": "10"},
+        messages=[Message(role="user", text="hi")],
+    )
+
+
+@pytest.mark.asyncio
+async def test_deadline_bounds_rate_limiter_wait(service, monkeypatch):
+    @asynccontextmanager
+    async def slow_reserve(tokens):
+        await asyncio.sleep(10)
+        yield
+
+    monkeypatch.setattr(service.rate_limiter, "reserve", slow_reserve)
+
+    with pytest.raises(ChatDeadlineExceededError) as error:
+        await asyncio.wait_for(service._call_model(make_request()), timeout=1)
+
+    assert error.value.fallback_model == "yandexgpt-lite"
+    assert service.calls == 0
+
+
+@pytest.mark.asyncio
+async def test_deadline_bounds_model_call(service):
+    with pytest.raises(ChatDeadlineExceededError):
+        await asyncio.wait_for(service._call_model(make_request()), timeout=1)
+    assert service.calls == 1
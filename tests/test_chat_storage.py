@@ -0,0 +1,66 @@
+import json
+
+import pytest
+
+from app.core.cache import chat
+from app.core.cache.chat import ChatRedisStorage
+from app.schemas import Message
+
+
+@pytest.fixture
+def storage(redis, monkeypatch):
+    """Хранилище истории в режиме list поверх fakeredis (со скриптами Lua)"""
+    monkeypatch.setattr(chat.settings, "CHAT_HISTORY_STORAGE", "list")
+    monkeypatch.setattr(chat.settings, "CHAT_HISTORY_NEAR_CACHE_ENABLED", False)
+    return ChatRedisStorage(redis)
+
+
+@pytest.mark.asyncio
+async def test_append_persists_token_counts(storage):
+    await storage.append_messages(1, [Message(role="user", text="a")])
+    stored = await storage.get_chat_history(1)
+    counted = stored[0].model_copy(update={"tokens": 5, "tokens_model": "m"})
+
+    await storage.append_messages(1, [Message(role="user", text="b")], {0: (stored[0], counted)})
+
+    history = await storage.get_chat_history(1)
+    assert [m.text for m in history] == ["a", "b"]
+    assert (history[0].tokens, history[0].tokens_model) == (5, "m")
+
+
+@pytest.mark.asyncio
+async def test_append_skips_update_of_changed_message(storage):
+    await storage.append_messages(1, [Message(role="user", text="a")])
+    stale = Message(role="user", text="other")
+    counted = stale.model_copy(update={"tokens": 5})
+
+    await storage.append_messages(1, [Message(role="user", text="b")], {0: (stale, counted)})
+
+    history = await storage.get_chat_history(1)
+    assert [(m.text, m.tokens) for m in history] == [("a", None), ("b", None)]
+
+
+@pytest.mark.asyncio
+async def test_append_raises_if_blob_keeps_reappearing(storage, redis, monkeypatch):
+    blob = json.dumps([{"role": "user", "text": "old"}])
+    await redis.set(storage._blob_key(1), blob)
+
+    async def racing_migrate(user_id, history):
+        # Другой воркер успевает снова записать историю в формате blob
+        await redis.set(storage._blob_key(user_id), history)
+
+    monkeypatch.setattr(storage, "_migrate", racing_migrate)
+    with pytest.raises(RuntimeError):
+        await storage.append_messages(1, [Message(role="user", text="new")])
+
+
+@pytest.mark.asyncio
+async def test_unlock_compaction_keeps_lock_of_another_owner(storage, redis):
+    token = await storage.lock_compaction(1)
+    assert await storage.lock_compaction(1) is None
+    # Пересказ шел дольше TTL: блокировку захватил другой воркер
+    await redis.delete("chat_compaction:lock:1")
+    other = await storage.lock_compaction(1)
+
+    await storage.unlock_compaction(1, token)
+    assert await redis.get("chat_compaction:lock:1") == other.encode()
@@ -0,0 +1,18 @@
+import pytest
+
+from app.core.cache.coalescing import CoalescingRedisStorage
+
+
+@pytest.mark.asyncio
+async def test_release_keeps_lock_of_another_owner(redis):
+    storage = CoalescingRedisStorage(redis)
+    token = await storage.acquire("k")
+    # Наша блокировка истекла, ее захватил другой воркер
+    await redis.delete("singleflight:lock:k")
+    other = await storage.acquire("k")
+
+    await storage.release("k", token)
+    assert await redis.get("singleflight:lock:k") == other.encode()
+
+    await storage.release("k", other)
+    assert await redis.get("singleflight:lock:k") is None
@@ -0,0 +1,26 @@
+import asyncio
+
+import pytest
+
+from app.core.integrations import hedging
+from app.core.integrations.hedging import Hedger
+
+
+@pytest.mark.asyncio
+async def test_cancelled_loser_latency_is_recorded(monkeypatch):
+    monkeypatch.setattr(hedging.settings, "YANDEX_HEDGING_ENABLED", True)
+    hedger = Hedger("test", percentile=50, min_delay=0.01, max_rate=1.0, min_samples=1)
+    hedger.tracker.add(0.01)
+    hedger.budget.tokens = 1
+    delays = iter([0.2, 0.01])
+
+    async def call():
+        await asyncio.sleep(next(delays))
+        return "ok"
+
+    assert await hedger.call(call) == "ok"
+
+    assert hedger.total_hedge_wins == 1
+    # Замер победителя (~0.01) и отмененного основного вызова (не меньше ~0.02)
+    assert len(hedger.tracker) == 3
+    assert max(hedger.tracker.samples) >= 0.02
@@ -0,0 +1,23 @@
+from app.core.cache.near_cache import HistoryNearCache
+from app.schemas import Message
+
+
+def test_get_returns_independent_messages():
+    cache = HistoryNearCache(max_entries=10, max_bytes=1 << 20, ttl=60)
+    cache.activate()
+    cache.put(1, [Message(role="user", text="a")], cache.generation)
+
+    cache.get(1)[0].tokens = 5
+
+    assert cache.get(1)[0].tokens is None
+
+
+def test_put_does_not_keep_caller_messages():
+    cache = HistoryNearCache(max_entries=10, max_bytes=1 << 20, ttl=60)
+    cache.activate()
+    messages = [Message(role="user", text="a")]
+    cache.put(1, messages, cache.generation)
+
+    messages[0].tokens = 5
+
+    assert cache.get(1)[0].tokens is None
@@ -0,0 +1,60 @@
+import asyncio
+import time
+from collections import Counter
+
+import pytest
+
+from app.core.cache.operations import OperationRedisStorage
+from app.core.integrations.yandex_gpt.operations import OperationPoller
+from app.schemas import Message
+
+
+class FakeOperationsClient:
+    """Клиент операций: операции не завершаются, проверки считаются"""
+
+    def __init__(self):
+        self.checks = Counter()
+
+    async def get_operation(self, operation_id):
+        self.checks[operation_id] += 1
+        await asyncio.sleep(0.01)
+        return False, None, None
+
+
+def make_poller(redis, http_client):
+    return OperationPoller(
+        http_client=http_client,
+        storage=OperationRedisStorage(redis),
+        chat_storage=None,
+        min_interval=0.5,
+        batch_size=10,
+    )
+
+
+@pytest.mark.asyncio
+async def test_due_operation_is_polled_by_one_worker(redis, monkeypatch):
+    monkeypatch.setattr(
+        "app.core.cache.operations.settings.YANDEX_OPERATION_POLL_MIN_INTERVAL", 0.0
+    )
+    storage = OperationRedisStorage(redis)
+    for index in range(5):
+        await storage.add_pending(f"op{index}", 1, Message(role="user", text="hi"))
+
+    http_client = FakeOperationsClient()
+    pollers = [make_poller(redis, http_client) for _ in range(3)]
+    await asyncio.gather(*(poller._tick() for poller in pollers))
+
+    assert http_client.checks == {f"op{index}": 1 for index in range(5)}
+    # Проверки перенесены: сразу повторно их никто не захватит
+    due, _ = await storage.claim_due(time.time(), 10, 30.0)
+    assert due == []
+
+
+@pytest.mark.asyncio
+async def test_completed_operation_leaves_schedule(redis):
+    storage = OperationRedisStorage(redis)
+    await storage.add_pending("op", 1, Message(role="user", text="hi"))
+
+    assert await storage.complete_operation("op", error="failed") is not None
+    assert await storage.complete_operation("op", error="failed") is None
+    assert await redis.zcard(storage.SCHEDULE_KEY) == 0
@@ -0,0 +1,95 @@
+import time
+
+import pytest
+
+from app.core.cache.quota import QuotaRedisStorage
+from app.core.exceptions import ChatQuotaExceededError
+from app.core.integrations import quota
+from app.core.integrations.quota import UserQuota
+
+
+@pytest.fixture
+def storage(redis):
+    return QuotaRedisStorage(redis)
+
+
+@pytest.fixture
+def user_quota(storage, monkeypatch):
+    """Квоты: 1000 токенов и 10 запросов в день, 5 запросов в месяц"""
+    monkeypatch.setattr(quota.settings, "USER_QUOTA_ENABLED", True)
+    monkeypatch.setattr(quota.settings, "USER_QUOTA_DAILY_TOKENS", 1000)
+    monkeypatch.setattr(quota.settings, "USER_QUOTA_DAILY_REQUESTS", 10)
+    monkeypatch.setattr(quota.settings, "USER_QUOTA_MONTHLY_TOKENS", 0)
+    monkeypatch.setattr(quota.settings, "USER_QUOTA_MONTHLY_REQUESTS", 5)
+    return UserQuota(storage)
+
+
+async def usage(redis, key):
+    state = await redis.hgetall(key)
+    return {field.decode(): int(value) for field, value in state.items()}
+
+
+@pytest.mark.asyncio
+async def test_exhausted_window_rejects_without_partial_debit(redis, storage):
+    expire_at = int(time.time()) + 3600
+    await redis.hset("quota:1:month", mapping={"tokens": 0, "requests": 5})
+    windows = [("quota:1:day", 1000, 10, expire_at), ("quota:1:month", 0, 5, expire_at)]
+
+    assert await storage.try_reserve(windows, 300) == (1, "requests")
+
+    assert await redis.exists("quota:1:day") == 0
+    assert await usage(redis, "quota:1:month") == {"tokens": 0, "requests": 5}
+
+
+@pytest.mark.asyncio
+async def test_token_limit_is_checked_against_the_reserve(redis, storage):
+    windows = [("quota:1:day", 1000, 0, int(time.time()) + 3600)]
+
+    assert await storage.try_reserve(windows, 600) is None
+    assert await storage.try_reserve(windows, 600) == (0, "tokens")
+    assert await usage(redis, "quota:1:day") == {"tokens": 600, "requests": 1}
+
+
+@pytest.mark.asyncio
+async def test_charge_does_not_resurrect_expired_window(redis, storage):
+    await redis.hset("quota:1:day", mapping={"tokens": 300, "requests": 1})
+
+    await storage.charge(["quota:1:day", "quota:1:month"], -100)
+
+    assert await usage(redis, "quota:1:day") == {"tokens": 200, "requests": 1}
+    assert await redis.exists("quota:1:month") == 0
+
+
+@pytest.mark.asyncio
+async def test_reserve_refunds_tokens_on_failure(redis, user_quota):
+    with pytest.raises(RuntimeError):
+        async with user_quota.reserve(1, 300):
+            raise RuntimeError("upstream")
+
+    for key in await redis.keys("quota:1:*"):
+        assert await usage(redis, key) == {"tokens": 0, "requests": 1}
+
+
+@pytest.mark.asyncio
+async def test_reserve_charges_actual_usage(redis, user_quota):
+    async with user_quota.reserve(1, 300) as reservation:
+        reservation.used = 120
+
+    keys = await redis.keys("quota:1:*")
+    assert len(keys) == 2
+    for key in keys:
+        assert await usage(redis, key) == {"tokens": 120, "requests": 1}
+
+
+@pytest.mark.asyncio
+async def test_reserve_raises_when_monthly_requests_are_exhausted(redis, user_quota):
+    for _ in range(5):
+        async with user_quota.reserve(1, 10) as reservation:
+            reservation.used = 10
+
+    with pytest.raises(ChatQuotaExceededError):
+        async with user_quota.reserve(1, 10):
+            pass
+
+    for key in await redis.keys("quota:1:*"):
+        assert await usage(redis, key) == {"tokens": 50, "requests": 5}
@@ -0,0 +1,51 @@
+import pytest
+
+from app.core.cache.rate_limit import RateLimitRedisStorage
+
+# Скорость пополнения настолько мала, что за время теста корзины не пополняются
+REQUESTS = ("rate_limit:requests", 2, 0.001)
+TOKENS = ("rate_limit:tokens", 1000, 0.001)
+
+
+@pytest.fixture
+def storage(redis):
+    return RateLimitRedisStorage(redis)
+
+
+async def level(redis, key):
+    return float(await redis.hget(key, "tokens"))
+
+
+@pytest.mark.asyncio
+async def test_acquire_debits_every_bucket(redis, storage):
+    assert await storage.try_acquire([(REQUESTS, 1), (TOKENS, 300)]) == 0
+
+    assert await level(redis, REQUESTS[0]) == pytest.approx(1, abs=0.01)
+    assert await level(redis, TOKENS[0]) == pytest.approx(700, abs=0.01)
+
+
+@pytest.mark.asyncio
+async def test_acquire_is_all_or_nothing(redis, storage):
+    assert await storage.try_acquire([(REQUESTS, 1), (TOKENS, 800)]) == 0
+
+    wait = await storage.try_acquire([(REQUESTS, 1), (TOKENS, 800)])
+
+    # Ждать, пока в корзине токенов не наберется 600 недостающих
+    assert wait == pytest.approx(600 / TOKENS[2], rel=0.01)
+    assert await level(redis, REQUESTS[0]) == pytest.approx(1, abs=0.01)
+    assert await level(redis, TOKENS[0]) == pytest.approx(200, abs=0.01)
+
+
+@pytest.mark.asyncio
+async def test_charge_allows_debt_down_to_minus_capacity(redis, storage):
+    assert await storage.charge(TOKENS, 1500) == pytest.approx(-500, abs=0.01)
+    assert await storage.charge(TOKENS, 5000) == pytest.approx(-1000, abs=0.01)
+
+    assert await storage.try_acquire([(TOKENS, 1)]) > 0
+
+
+@pytest.mark.asyncio
+async def test_charge_refund_does_not_exceed_capacity(redis, storage):
+    assert await storage.try_acquire([(TOKENS, 300)]) == 0
+
+    assert await storage.charge(TOKENS, -500) == pytest.approx(1000, abs=0.01)
@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+
+from app.core.exceptions import ChatUpstreamUnavailableError
+from app.core.integrations import resilience
+from app.core.integrations.resilience import (CircuitBreaker, CircuitState,
+                                              call_with_resilience)
+
+
+@pytest.fixture
+def breaker(monkeypatch):
+    """Circuit breaker в состоянии half-open (время восстановления истекло)"""
+    breaker = CircuitBreaker("test", failure_threshold=1, recovery_timeout=0.0)
+    breaker.record_failure()
+    monkeypatch.setitem(resilience._circuit_breakers, "test", breaker)
+    return breaker
+
+
+@pytest.mark.asyncio
+async def test_cancelled_probe_releases_half_open_slot(breaker):
+    started = asyncio.Event()
+
+    async def hang():
+        started.set()
+        await asyncio.sleep(10)
+
+    task = asyncio.create_task(call_with_resilience("test", hang))
+    await started.wait()
+    assert breaker.state == CircuitState.HALF_OPEN
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    async def ok():
+        return "ok"
+
+    assert await call_with_resilience("test", ok) == "ok"
+    assert breaker.state == CircuitState.CLOSED
+
+
+@pytest.mark.asyncio
+async def test_deadline_on_probe_does_not_block_breaker(breaker):
+    async def hang():
+        await asyncio.sleep(10)
+
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(call_with_resilience("test", hang), timeout=0.01)
+
+    breaker.before_call()
+    assert breaker.state == CircuitState.HALF_OPEN
+
+
+@pytest.mark.asyncio
+async def test_half_open_rejects_while_probe_in_flight(breaker):
+    started = asyncio.Event()
+
+    async def hang():
+        started.set()
+        await asyncio.sleep(10)
+
+    task = asyncio.create_task(call_with_resilience("test", hang))
+    await started.wait()
+    with pytest.raises(ChatUpstreamUnavailableError):
+        breaker.before_call()
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
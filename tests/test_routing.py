@@ -0,0 +1,46 @@
+import asyncio
+
+import pytest
+
+from app.core.exceptions import ChatUpstreamUnavailableError
+from app.services.v1 import routing
+from app.services.v1.routing import ModelRouter
+
+
+@pytest.fixture
+def router(monkeypatch):
+    monkeypatch.setattr(routing.settings, "YANDEX_ROUTING_DEFAULT_CONCURRENCY", 1)
+    monkeypatch.setattr(routing.settings, "YANDEX_ROUTING_ACQUIRE_TIMEOUT", 0.01)
+    return ModelRouter()
+
+
+async def hold(router, started):
+    async with router.lease("yandexgpt-lite"):
+        started.set()
+        await asyncio.sleep(0.05)
+
+
+@pytest.mark.asyncio
+async def test_lease_is_not_limited_without_routing(router, monkeypatch):
+    monkeypatch.setattr(routing.settings, "YANDEX_ROUTING_ENABLED", False)
+    started = asyncio.Event()
+    task = asyncio.create_task(hold(router, started))
+    await started.wait()
+
+    async with router.lease("yandexgpt-lite") as stats:
+        assert stats.in_flight == 2
+    await task
+    assert router.get_stats("yandexgpt-lite").requests == 2
+
+
+@pytest.mark.asyncio
+async def test_lease_is_limited_with_routing(router, monkeypatch):
+    monkeypatch.setattr(routing.settings, "YANDEX_ROUTING_ENABLED", True)
+    started = asyncio.Event()
+    task = asyncio.create_task(hold(router, started))
+    await started.wait()
+
+    with pytest.raises(ChatUpstreamUnavailableError):
+        async with router.lease("yandexgpt-lite"):
+            pass
+    await task
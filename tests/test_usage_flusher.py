@@ -0,0 +1,67 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from app.schemas import TokenUsageRecord
+from app.services.v1 import usage
+from app.services.v1.usage import UsageFlusher
+
+
+class FakeUsageStorage:
+    """Буфер учета в памяти"""
+
+    def __init__(self, records):
+        self.records = list(records)
+
+    async def pop_batch(self, count):
+        batch, self.records = self.records[:count], self.records[count:]
+        return batch
+
+    async def restore(self, records):
+        self.records.extend(records)
+
+
+class FakeSession:
+    def __init__(self, close_error=None):
+        self.close_error = close_error
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        if self.close_error is not None:
+            raise self.close_error
+
+
+def make_flusher(monkeypatch, add_error=None, close_error=None):
+    async def add_records(self, records):
+        if add_error is not None:
+            raise add_error
+        return len(records)
+
+    monkeypatch.setattr(usage.UsageDataManager, "add_records", add_records)
+    record = TokenUsageRecord(
+        model="yandexgpt-lite",
+        input_tokens=1,
+        completion_tokens=1,
+        created_at=datetime.now(timezone.utc),
+    )
+    flusher = UsageFlusher(FakeUsageStorage([record]), batch_size=10)
+    flusher._session_factory = lambda: FakeSession(close_error)
+    return flusher
+
+
+@pytest.mark.asyncio
+async def test_failed_insert_restores_batch(monkeypatch):
+    flusher = make_flusher(monkeypatch, add_error=RuntimeError("db down"))
+    with pytest.raises(RuntimeError):
+        await flusher.flush()
+    assert len(flusher.storage.records) == 1
+
+
+@pytest.mark.asyncio
+async def test_error_after_commit_does_not_restore_batch(monkeypatch):
+    flusher = make_flusher(monkeypatch, close_error=RuntimeError("close failed"))
+    with pytest.raises(RuntimeError):
+        await flusher.flush()
+    assert flusher.storage.records == []